@@ -1,5 +1,7 @@
 import streamlit as st
 
+from provisioning.ui import kpidrift_home_html
+
 #st.set_page_config(page_title="KPI Drift Hunter", layout="wide")
 
 st.title("KPI Drift Hunter Agent")
@@ -34,28 +36,8 @@ def _inject_expander_h3_style_once():
         unsafe_allow_html=True,
     )
 
-# (Your cards/sections)
-left, right = st.columns(2)
-with left:
-    st.subheader("Problem Statement")
-    st.markdown(
-        "- Multiple teams, fragmented BI Platforms,Potentially different KPIs\n"
-        "- Lack of clear view of KPI Definition Drifts\n"
-        "- Compromised Single Version of Truth\n"
-
-        
-    )
-with right:
-    st.subheader("What This Tool Solves")
-    st.markdown(
-        "- One‑click Agentic AI that swims through BI ecosystems \n"
-        "- Need for a unified tool to track and manage KPI drifts across platforms"
-    )
-
-st.divider()
-c1, c2, c3 = st.columns(3)
-c1.markdown("### 🚀 Enterprise Grade\nAbility to connect to multiple BI Ecosystems")
-c2.markdown("### 🛡️ Single Stop to see KPIs and their Drifts among BI Products")
+# (Your cards/sections) — banners, divider and tiles as one pre-rendered grid block
+st.markdown(kpidrift_home_html(), unsafe_allow_html=True)
 
 st.divider()
 
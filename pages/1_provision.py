@@ -3,9 +3,11 @@ from __future__ import annotations
 
 import os
 import re
+import hmac
 import json
 import stat
 import shutil
+from collections import defaultdict
 from datetime import datetime, timezone
 from typing import List, Dict
 from pathlib import Path
@@ -72,9 +74,15 @@ def get_sb() -> Client:
 
 sb = get_sb()
 
-# Health check (DB)
+# Health check (DB): one probe per process every 5 min instead of a round trip on
+# every rerun; a failed probe raises, so it is not cached and runs again next time
+@st.cache_resource(ttl=300, show_spinner=False)
+def _db_ok() -> bool:
+    sb.table("environment").select("environment_id").limit(1).execute()
+    return True
+
 try:
-    sb.table("environment").select("*").limit(1).execute()
+    _db_ok()
     st.caption("✅ Connected to Supabase.")
 except Exception as e:
     st.error(f"DB check failed. Did you run the DDL? Error: {e}")
@@ -317,32 +325,68 @@ def next_unprovisioned_selection(team_id: int):
         "rt_label": (rt["target_runtime"] or "").upper(),
     }
 
+# Only what the session shows/uses, plus the stored secret for the check below
+_USER_COLS = "team_id,team_name,team_pointofcontact,team_distributionlist,username,pwd"
+
+try:
+    from argon2 import PasswordHasher  # optional: lets teams.pwd hold argon2 hashes
+    _PH = PasswordHasher()
+except ImportError:
+    _PH = None
+
+def _pwd_matches(stored: str, pwd: str) -> bool:
+    stored = stored or ""
+    if stored.startswith("$argon2"):
+        if _PH is None:
+            return False
+        try:
+            return _PH.verify(stored, pwd)
+        except Exception:
+            return False
+    # legacy plaintext rows; constant-time compare
+    return hmac.compare_digest(stored.encode("utf-8"), (pwd or "").encode("utf-8"))
+
 def authenticate(username: str, pwd: str):
-    resp = sb.table("teams").select("*").eq("username", username).eq("pwd", pwd).execute()
-    if resp.data:
-        return resp.data[0]
+    # username-only lookup (one row off its unique index); the password is checked
+    # here, never sent as a query filter
+    resp = sb.table("teams").select(_USER_COLS).eq("username", username).limit(1).execute()
+    row = (resp.data or [None])[0]
+    if row and _pwd_matches(row.pop("pwd", None), pwd):
+        return row
     return None
 
-@st.cache_data(ttl=60)
+# Reference data changes rarely. st.cache_data is process-wide, so one fetch
+# per LOOKUP_TTL seconds serves every session.
+LOOKUP_TTL = 300
+
+@st.cache_data(ttl=LOOKUP_TTL)
 def load_environments() -> List[Dict]:
     return sb.table("environment").select("*").order("environment_id").execute().data
 
-@st.cache_data(ttl=60)
+@st.cache_data(ttl=LOOKUP_TTL)
 def load_artifact_types() -> List[Dict]:
     return sb.table("artifact_type").select("*").order("artifact_type_id").execute().data
 
-@st.cache_data(ttl=60)
-def load_artifacts_by_type(artifact_type_id: int) -> List[Dict]:
-    return (
+@st.cache_data(ttl=LOOKUP_TTL)
+def load_all_artifacts_grouped() -> Dict[int, List[Dict]]:
+    """Every artifact in one query, grouped by artifact_type_id (name order kept)."""
+    rows = (
         sb.table("artifacts")
           .select("*")
-          .eq("artifact_type_id", artifact_type_id)
+          .order("artifact_type_id")
           .order("artifact_name")
           .execute()
           .data
-    )
+    ) or []
+    grouped: Dict[int, List[Dict]] = defaultdict(list)
+    for row in rows:
+        grouped[row["artifact_type_id"]].append(row)
+    return dict(grouped)
+
+def load_artifacts_by_type(artifact_type_id: int) -> List[Dict]:
+    return load_all_artifacts_grouped().get(artifact_type_id, [])
 
-@st.cache_data(ttl=60)
+@st.cache_data(ttl=LOOKUP_TTL)
 def load_target_runtimes() -> List[Dict]:
     return sb.table("target_runtime").select("*").order("target_runtime_id").execute().data
 
@@ -426,11 +470,12 @@ with card("Target"):
 # -----------------------------------------------------------------------------
 with card("Select Approved Artifacts (one from each)"):
     artifact_types = load_artifact_types()
+    all_arts = load_all_artifacts_grouped()   # one cached query for every type
     picks: Dict[int, int | None] = {}
     for at in artifact_types:
         at_id = at["artifact_type_id"]
         at_name = at["artifact_type"]
-        data = load_artifacts_by_type(at_id)
+        data = all_arts.get(at_id, [])
         options = {row["artifact_name"]: row["artifact_id"] for row in data}
         if not options:
             st.warning(f"No artifacts configured for **{at_name}** yet.")
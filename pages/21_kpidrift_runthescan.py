@@ -21,6 +21,7 @@ _bootstrap()
 # ...now the rest of your imports:
 import os, re, uuid, hashlib, traceback
 import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Tuple
 
@@ -29,6 +30,7 @@ from provisioning.theme import page_header
 from provisioning.ui import card
 from provisioning.a2_kpidrift_capture.a2_kpidrift_powerbi import capture_powerbi
 from provisioning.a2_kpidrift_capture.a2_kpidrift_tableau import capture_tableau
+from provisioning.a2_kpidrift_capture.a2_kpidrift_engine import run_on_browser_thread
 
 
 
@@ -39,6 +41,7 @@ from provisioning.a2_kpidrift_capture.a2_kpidrift_persist import (
     upsert_screengrab,
     insert_widgets,
     image_wh,
+    sha256_hex,
 )
 
 # ── Page setup ────────────────────────────────────────────────────────────────
@@ -145,14 +148,15 @@ def capture_url(url: str, session_id: str) -> dict:
     outdir = Path("screenshots")
     outdir.mkdir(parents=True, exist_ok=True)
 
+    # captures run on a long-lived browser thread so the pooled Chromium survives reruns
     provider = "powerbi" if "powerbi.com" in url.lower() else ("tableau" if "tableau.com" in url.lower() else "unknown")
     if provider == "powerbi":
-        result = capture_powerbi(url, outdir)
+        result = run_on_browser_thread(capture_powerbi, url, outdir)
     elif provider == "tableau":
-        result = capture_tableau(url, outdir)
+        result = run_on_browser_thread(capture_tableau, url, outdir)
     else:
         # default to tableau strategy for other public viz hosts
-        result = capture_tableau(url, outdir)
+        result = run_on_browser_thread(capture_tableau, url, outdir)
 
     if not result.artifacts.full.exists():
         raise RuntimeError("Capture produced no full image.")
@@ -161,18 +165,26 @@ def capture_url(url: str, session_id: str) -> dict:
     report_slug = slugify(url)
     prefix = day_prefix(session_id, report_slug)
 
-    full_png = result.artifacts.full.read_bytes()
+    full_png = result.artifacts.full_bytes or result.artifacts.full.read_bytes()
     full_key = f"{prefix}/full.png"
-    storage_upload_bytes(KDH_BUCKET, full_key, full_png)
-    full_signed = storage_signed_url(KDH_BUCKET, full_key)
 
-    crops_for_db: List[dict] = []
-    if result.artifacts.report and result.artifacts.report.exists():
-        crop_png = result.artifacts.report.read_bytes()
-        crop_key = f"{prefix}/widgets/report_crop.png"
-        storage_upload_bytes(KDH_BUCKET, crop_key, crop_png)
-        w, h = image_wh(crop_png)  # derive bbox if no DOM coords
-        crops_for_db.append({"bytes": crop_png, "path": crop_key, "bbox": [0, 0, w, h]})
+    # full + crop uploads go out concurrently; hashing overlaps with both
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        hash_fut = pool.submit(sha256_hex, full_png)
+        uploads = [pool.submit(storage_upload_bytes, KDH_BUCKET, full_key, full_png)]
+
+        crops_for_db: List[dict] = []
+        if result.artifacts.report and result.artifacts.report.exists():
+            crop_png = result.artifacts.report_bytes or result.artifacts.report.read_bytes()
+            crop_key = f"{prefix}/widgets/report_crop.png"
+            uploads.append(pool.submit(storage_upload_bytes, KDH_BUCKET, crop_key, crop_png))
+            w, h = image_wh(crop_png)  # derive bbox if no DOM coords
+            crops_for_db.append({"bytes": crop_png, "path": crop_key, "bbox": [0, 0, w, h]})
+
+        for fut in uploads:
+            fut.result()  # surface upload errors before touching the DB
+        full_signed = storage_signed_url(KDH_BUCKET, full_key)
+        full_hash = hash_fut.result()
 
     # 3) insert into DB (screengrab first, then widgets)
     sg_db = upsert_screengrab(
@@ -184,6 +196,7 @@ def capture_url(url: str, session_id: str) -> dict:
         storage_bucket=KDH_BUCKET,
         storage_path_full=full_key,
         user_id=None,
+        screengrab_hash=full_hash,
     )
 
     if crops_for_db:
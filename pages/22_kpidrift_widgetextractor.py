@@ -34,6 +34,7 @@ _bootstrap()
 # === provider dispatch imports (after bootstrap) ==============================
 from provisioning.a2_kpidrift_widgetextractor_power_bi import extract as extract_pbi
 from provisioning.a2_kpidrift_widgetextractor_tableau import extract as extract_tbl
+from provisioning.a2_kpidrift_capture.a2_kpidrift_engine import run_on_browser_thread
 
 # (optional) debug: intrial Tableau API helper (doesn't use Playwright)
 import inspect
@@ -180,12 +181,14 @@ if go_btn:
             session = f"{platform_hint if platform_hint!='unknown' else 'auto'}_{_nowstamp()}"
 
             st.subheader(f"Extracting → {url}")
-            manifest = _dispatch_extract(
+            # runs on a long-lived browser thread: its pooled Chromium outlives this rerun
+            manifest = run_on_browser_thread(
+                _dispatch_extract,
                 url=url,
                 platform_hint=platform_hint,
                 session_folder=session,
                 viewport=(1920,1080),
-                scale=2.0,
+                scale=2.0,   # crops go to the LLM value extractor: keep chart text legible
                 max_widgets=80,
             )
 
@@ -203,5 +206,7 @@ if go_btn:
             )
             st.code(f"{manifest.get('storage_prefix','')}", language="text")
 
-            # Path to local widgets folder (unchanged)
-            st.code(str(Path('./screenshots')/session/'widgets'), language="text")
+            # Path to local widgets folder (Power BI only keeps one with KDH_KEEP_LOCAL=1)
+            local_widgets = Path('./screenshots')/session/'widgets'
+            if local_widgets.exists():
+                st.code(str(local_widgets), language="text")
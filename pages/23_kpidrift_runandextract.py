@@ -21,6 +21,7 @@ except Exception:
 # --- Capture providers (RUN) -------------------------------------------------
 from provisioning.a2_kpidrift_capture.a2_kpidrift_powerbi import capture_powerbi
 from provisioning.a2_kpidrift_capture.a2_kpidrift_tableau import capture_tableau
+from provisioning.a2_kpidrift_capture.a2_kpidrift_engine import run_on_browser_thread
 import streamlit.components.v1 as components
 
 # --- Persist helpers (upload → DB) -------------------------------------------
@@ -172,19 +173,19 @@ def _run_public_powerbi(url: str, session_id: str) -> Dict:
         raise ValueError("Power BI public link must contain '/view?'.")
     outdir = Path("./screenshots"); outdir.mkdir(parents=True, exist_ok=True)
     _log("Launching browser & loading report…")
-    result = capture_powerbi(url, outdir)
+    result = run_on_browser_thread(capture_powerbi, url, outdir)   # warm pooled browser
 
     report_slug = _slugify_url(url); prefix = _day_prefix(session_id, report_slug)
 
     _log("Uploading full image…")
-    full_png = result.artifacts.full.read_bytes()
+    full_png = result.artifacts.full_bytes or result.artifacts.full.read_bytes()
     full_key = f"{prefix}/full.png"
     _storage_upload_bytes(KDH_BUCKET, full_key, full_png)
     full_signed = _storage_signed_url(KDH_BUCKET, full_key)
 
     crop_items: List[dict] = []
     if result.artifacts.report and result.artifacts.report.exists():
-        crop_png = result.artifacts.report.read_bytes()
+        crop_png = result.artifacts.report_bytes or result.artifacts.report.read_bytes()
         crop_key = f"{prefix}/widgets/report_crop.png"
         _storage_upload_bytes(KDH_BUCKET, crop_key, crop_png)
         w, h = image_wh(crop_png)
@@ -203,19 +204,19 @@ def _run_public_powerbi(url: str, session_id: str) -> Dict:
 def _run_public_tableau(url: str, session_id: str) -> Dict:
     outdir = Path("./screenshots"); outdir.mkdir(parents=True, exist_ok=True)
     _log("Launching browser & loading Tableau Public view…")
-    result = capture_tableau(url, outdir)
+    result = run_on_browser_thread(capture_tableau, url, outdir)
 
     report_slug = _slugify_url(url); prefix = _day_prefix(session_id, report_slug)
 
     _log("Uploading full image…")
-    full_png = result.artifacts.full.read_bytes()
+    full_png = result.artifacts.full_bytes or result.artifacts.full.read_bytes()
     full_key = f"{prefix}/full.png"
     _storage_upload_bytes(KDH_BUCKET, full_key, full_png)
     full_signed = _storage_signed_url(KDH_BUCKET, full_key)
 
     crop_items: List[dict] = []
     if result.artifacts.report and result.artifacts.report.exists():
-        crop_png = result.artifacts.report.read_bytes()
+        crop_png = result.artifacts.report_bytes or result.artifacts.report.read_bytes()
         crop_key = f"{prefix}/widgets/report_crop.png"
         _storage_upload_bytes(KDH_BUCKET, crop_key, crop_png)
         w, h = image_wh(crop_png)
@@ -231,15 +232,20 @@ def _run_public_tableau(url: str, session_id: str) -> Dict:
 
     return {"full_signed": full_signed, "storage_prefix": "/".join(full_key.split("/")[:-1]), "widgets": crop_items}
 
+# Extraction feeds the LLM value extractor, so it keeps 2x device scale
+# (plain captures use engine.SCREENSHOT_SCALE, 1x by default).
 def _extract_public_powerbi(url: str, session_prefix: str) -> Dict:
-    return extract_pbi(url=url, session_folder=session_prefix, viewport=(1920,1080), scale=2.0, max_widgets=80)
+    return run_on_browser_thread(extract_pbi, url=url, session_folder=session_prefix,
+                                 viewport=(1920,1080), scale=2.0, max_widgets=80)
 
 def _extract_public_tableau(url: str, session_prefix: str) -> Dict:
-    return extract_tbl(url=url, session_folder=session_prefix, viewport=(1920,1080), scale=2.0, max_widgets=80)
+    return run_on_browser_thread(extract_tbl, url=url, session_folder=session_prefix,
+                                 viewport=(1920,1080), scale=2.0, max_widgets=80)
 
 def _extract_cloud_tableau(url: str, session_prefix: str) -> Dict:
     # Same extractor; env tells it to use Server/Cloud
-    return extract_tbl(url=url, session_folder=session_prefix, viewport=(1920,1080), scale=2.0, max_widgets=80)
+    return run_on_browser_thread(extract_tbl, url=url, session_folder=session_prefix,
+                                 viewport=(1920,1080), scale=2.0, max_widgets=80)
 
 # ─────────── Temporary env injection (session-only creds; NOT stored) ───────────
 @contextlib.contextmanager
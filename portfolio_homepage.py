@@ -1,5 +1,5 @@
 import streamlit as st
-import sys, asyncio, platform
+import sys, asyncio, platform, logging
 
 # --- Page config: exactly once, before any UI calls ---
 st.set_page_config(page_title="GenAI Portfolio", page_icon="🧠", layout="wide", initial_sidebar_state="expanded")
@@ -24,6 +24,19 @@ if sys.platform.startswith("win"):
     except Exception:
         pass
 
+# KPI Drift capture progress (per-view export/upload lines) to stderr at INFO.
+# Loggers live for the process, so the handler is attached once, not per rerun.
+_kdh_log = logging.getLogger("provisioning.a2_kpidrift_capture")
+if not _kdh_log.handlers:
+    _kdh_h = logging.StreamHandler()
+    _kdh_h.setFormatter(logging.Formatter("[%(name)s] %(message)s"))
+    _kdh_log.addHandler(_kdh_h)
+    _kdh_log.setLevel(logging.INFO)
+
+# Heavy SDK imports on a background thread, once per process
+from provisioning.prewarm import prewarm
+prewarm()
+
 # ---- Landing page content for the portfolio home ----
 def landing():
     st.title("AI AGENTS")
@@ -148,4 +161,8 @@ nav = st.navigation(
     position="sidebar",
 )
 
+# Provider credentials check (on demand, cached 10 min)
+from provisioning.health import render_health_sidebar
+render_health_sidebar()
+
 nav.run()
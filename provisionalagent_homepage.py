@@ -1,5 +1,7 @@
 import streamlit as st
 
+from provisioning.ui import home_html
+
 # Walkthrough (safe if helper not present)
 try:
     from portfolio_walkthrough import mount, anchor
@@ -20,26 +22,8 @@ anchor("btn-provision-now")
 if st.button("Provision Now", use_container_width=False):
     st.switch_page("pages/1_provision.py")
 
-left, right = st.columns(2)
-with left:
-    st.subheader("Problem Statement")
-    st.markdown(
-        "- Multiple teams, fragmented stacks, manual provisioning\n"
-        "- Lack of standardized governance and audit gaps\n"
-        "- “It’s all in Docker” visibility needing a human-readable map"
-    )
-with right:
-    st.subheader("What This Tool Solves")
-    st.markdown(
-        "- One-click standardized envs with pre-approved options\n"
-        "- Built-in governance: policy packs, RBAC, audit trails"
-    )
-
-st.divider()
-c1, c2, c3 = st.columns(3)
-c1.markdown("### 🚀 Rapid Deployment\nFrom request to production in minutes.")
-c2.markdown("### 🛡️ Governance-Ready\nApprovals, policy packs, auditability.")
-c3.markdown("### 🌿 Full Visibility\nTrack deployments by lean app status.")
+# Problem/solution + feature tiles: static HTML composed once per process
+st.markdown(home_html(), unsafe_allow_html=True)
 
 st.divider()
 
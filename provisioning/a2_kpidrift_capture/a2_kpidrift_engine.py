@@ -1,7 +1,7 @@
 # provisioning/a2_kpidrift_capture/a2_kpidrift_engine.py
 
 # --- MUST RUN BEFORE PLAYWRIGHT IS IMPORTED (fixes Windows asyncio subprocess) ---
-import sys, asyncio
+import os, sys, asyncio, atexit, threading
 import platform
 
 print(type(asyncio.get_event_loop_policy()).__name__)
@@ -9,9 +9,11 @@ print(type(asyncio.get_event_loop_policy()).__name__)
 if platform.system() == "Windows":
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import List, Callable, Any, Tuple, Optional, Dict, Union
+from typing import List, Callable, Any, Tuple, Optional, Dict, Union, Iterator
 
 from playwright.sync_api import sync_playwright, Page
 
@@ -72,11 +74,155 @@ def assert_headers_are_strings(h: HeadersType, label: str = "headers") -> None:
             print(f"[BAD HEADER in {label}] {k} = {v!r} (type={type(v).__name__})")
 
 
+# ────────────────────────── Browser pool ─────────────────────────
+
+# Device scale for capture contexts. 1x is enough for quality scoring and drift
+# comparison; raise it (or pass scale=) only where OCR/LLM reads chart text.
+SCREENSHOT_SCALE = float(os.getenv("KDH_SCREENSHOT_SCALE", "1"))
+
+def _launch_args() -> List[str]:
+    # Platform-aware Chromium flags (needed in many Linux/CI/cloud envs)
+    if sys.platform.startswith("linux"):
+        return ["--no-sandbox", "--disable-dev-shm-usage"]
+    return []
+
+
+# Name prefix of the long-lived threads behind run_on_browser_thread()
+BROWSER_THREAD_PREFIX = "kdh-browser"
+
+def _on_browser_thread() -> bool:
+    return threading.current_thread().name.startswith(BROWSER_THREAD_PREFIX)
+
+
+class BrowserPool:
+    """
+    One Chromium per (browser thread, headless) — launched lazily, reused across
+    captures. Each capture gets its own fresh BrowserContext (cheap) via `context()`.
+    Sync Playwright objects are bound to the thread that created them, so the
+    cache is thread-local, and only the long-lived browser threads use it: any
+    other thread (a Streamlit rerun, a worker pool) gets a one-off Chromium that
+    is closed with its context instead of outliving the thread.
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._all: List[Tuple[Any, Any]] = []   # (playwright, browser) for atexit
+        self._lock = threading.Lock()
+
+    def browser(self, headless: bool = True):
+        cache: Dict[bool, Tuple[Any, Any]] = getattr(self._local, "cache", None)
+        if cache is None:
+            cache = self._local.cache = {}
+        entry = cache.get(headless)
+        if entry:
+            if entry[1].is_connected():
+                return entry[1]
+            self._discard(entry)   # crashed/closed: stop its driver before relaunching
+            cache.pop(headless, None)
+        pw = sync_playwright().start()
+        browser = pw.chromium.launch(headless=headless, args=_launch_args())
+        cache[headless] = (pw, browser)
+        with self._lock:
+            self._all.append((pw, browser))
+        return browser
+
+    def _discard(self, entry: Tuple[Any, Any]) -> None:
+        """Forget a dead (playwright, browser) pair and stop its driver process."""
+        with self._lock:
+            try:
+                self._all.remove(entry)
+            except ValueError:
+                pass
+        self._stop(entry)
+
+    @staticmethod
+    def _stop(entry: Tuple[Any, Any]) -> None:
+        pw, browser = entry
+        try:
+            browser.close()
+        except Exception:
+            pass
+        try:
+            pw.stop()
+        except Exception:
+            pass
+
+    @contextmanager
+    def context(
+        self,
+        viewport: Tuple[int, int] = (1920, 1080),
+        scale: float = SCREENSHOT_SCALE,
+        headless: bool = True,
+        extra_http_headers: HeadersType = None,
+    ) -> Iterator[Any]:
+        # Clean & validate headers once here so all pages inherit them
+        if extra_http_headers:
+            assert_headers_are_strings(extra_http_headers, "extra_http_headers (pre-clean)")
+        cleaned_headers = clean_headers(extra_http_headers)
+
+        pooled = _on_browser_thread()
+        if pooled:
+            browser, own = self.browser(headless), None
+        else:
+            pw = sync_playwright().start()
+            try:
+                browser = pw.chromium.launch(headless=headless, args=_launch_args())
+            except Exception:
+                pw.stop()
+                raise
+            own = (pw, browser)
+        try:
+            ctx = browser.new_context(
+                viewport={"width": viewport[0], "height": viewport[1]},
+                device_scale_factor=scale,
+                locale="en-US",
+                extra_http_headers=cleaned_headers or None,
+            )
+            try:
+                yield ctx
+            finally:
+                try:
+                    ctx.close()
+                except Exception:
+                    pass
+        finally:
+            if own:
+                self._stop(own)
+
+    def close(self) -> None:
+        with self._lock:
+            entries, self._all = self._all, []
+        for entry in entries:
+            self._stop(entry)
+
+
+BROWSER_POOL = BrowserPool()
+atexit.register(BROWSER_POOL.close)
+
+# Streamlit reruns are short-lived threads, so a browser cached on one is never
+# seen again. Browser work submitted here runs on a few long-lived threads whose
+# pooled Chromium stays warm across reruns and sessions.
+BROWSER_THREADS = int(os.getenv("KDH_BROWSER_THREADS", "2"))
+_browser_executor: Optional[ThreadPoolExecutor] = None
+_browser_executor_lock = threading.Lock()
+
+def run_on_browser_thread(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Call fn(*args, **kwargs) on a long-lived browser thread; blocks, re-raises."""
+    global _browser_executor
+    if _on_browser_thread():
+        return fn(*args, **kwargs)   # already on one (nested call)
+    with _browser_executor_lock:
+        if _browser_executor is None:
+            _browser_executor = ThreadPoolExecutor(max_workers=BROWSER_THREADS,
+                                                   thread_name_prefix=BROWSER_THREAD_PREFIX)
+    return _browser_executor.submit(fn, *args, **kwargs).result()
+
+
 # ───────────────────────── Browser decorator ─────────────────────
 
 def with_browser(
     viewport: Tuple[int, int] = (1920, 1080),
-    scale: float = 2.0,
+    scale: float = SCREENSHOT_SCALE,
     headless: bool = True,
     extra_http_headers: HeadersType = None,
 ) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
@@ -84,6 +230,8 @@ def with_browser(
     Cross-platform Playwright context manager as a decorator.
       - Windows: event-loop policy is already set above
       - Linux (e.g., Streamlit Community Cloud): add no-sandbox/dev-shm flags
+      - Runs on a long-lived browser thread, so the pooled Chromium stays warm;
+        only the context is per call
     Usage:
         @with_browser(extra_http_headers={"User-Agent": "...", "DNT": True})
         def run(ctx, ...):
@@ -91,31 +239,17 @@ def with_browser(
             ...
     """
     def _wrap(fn: Callable[..., Any]) -> Callable[..., Any]:
+        def _run(*args, **kwargs) -> Any:
+            # Shared browser, fresh context per call
+            with BROWSER_POOL.context(
+                viewport=viewport,
+                scale=scale,
+                headless=headless,
+                extra_http_headers=extra_http_headers,
+            ) as ctx:
+                return fn(ctx, *args, **kwargs)
+
         def _inner(*args, **kwargs) -> Any:
-            # Platform-aware Chromium flags (needed in many Linux/CI/cloud envs)
-            launch_args = []
-            if sys.platform.startswith("linux"):
-                launch_args = ["--no-sandbox", "--disable-dev-shm-usage"]
-
-            # Clean & validate headers once here so all pages inherit them
-            if extra_http_headers:
-                assert_headers_are_strings(extra_http_headers, "extra_http_headers (pre-clean)")
-            cleaned_headers = clean_headers(extra_http_headers)
-
-            with sync_playwright() as pw:
-                browser = pw.chromium.launch(headless=headless, args=launch_args)
-                ctx = browser.new_context(
-                    viewport={"width": viewport[0], "height": viewport[1]},
-                    device_scale_factor=scale,
-                    locale="en-US",
-                    extra_http_headers=cleaned_headers or None,
-                )
-                try:
-                    return fn(ctx, *args, **kwargs)
-                finally:
-                    try:
-                        ctx.close()
-                    finally:
-                        browser.close()
+            return run_on_browser_thread(_run, *args, **kwargs)
         return _inner
     return _wrap
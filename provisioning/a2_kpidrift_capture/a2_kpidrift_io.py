@@ -4,12 +4,20 @@ from pathlib import Path
 from .a2_kpidrift_types import CaptureResult
 
 def _sha256(p: Path) -> str:
-    h = hashlib.sha256()
     with p.open("rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
+        if hasattr(hashlib, "file_digest"):  # py3.11+: readinto a reused buffer, GIL released
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        h = hashlib.sha256()
+        for chunk in iter(lambda: f.read(1 << 20), b""):
             h.update(chunk)
     return h.hexdigest()
 
+def _digest(p: Path, data=None):
+    """sha256 of the in-memory PNG when the capture kept it, else of the file."""
+    if data is not None:
+        return hashlib.sha256(data).hexdigest()
+    return _sha256(p) if p.exists() else None
+
 def write_sidecar(result: CaptureResult) -> Path:
     sidecar = result.outdir / f"{result.provider}_capture_{result.artifacts.full.stem[-14:]}.json"
     payload = {
@@ -23,8 +31,8 @@ def write_sidecar(result: CaptureResult) -> Path:
             "log": str(result.artifacts.log) if result.artifacts.log else None,
         },
         "hashes": {
-            "full_sha256": _sha256(result.artifacts.full) if result.artifacts.full.exists() else None,
-            "report_sha256": _sha256(result.artifacts.report) if result.artifacts.report.exists() else None,
+            "full_sha256": _digest(result.artifacts.full, result.artifacts.full_bytes),
+            "report_sha256": _digest(result.artifacts.report, result.artifacts.report_bytes),
         },
         "meta": result.meta,
     }
@@ -1,16 +1,25 @@
 # provisioning/a2_kpidriftcapture/a2_kpidrift_pair_compare.py
 from __future__ import annotations
 
+import hashlib
 import json
 import os
-import re
-import uuid
+import threading
+from collections import OrderedDict
 from datetime import datetime, timezone
+from functools import lru_cache
 from typing import Dict, Optional, Any, Tuple
 
 from postgrest.exceptions import APIError
 from mistralai import Mistral
 
+from provisioning.a2_kpidrift_capture.a2_kpidrift_pg import pg_available, pg_conn
+
+try:  # optional fast JSON (C extension); stdlib json is the fallback
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+
 
 # ----------------------------- Utilities -------------------------------------
 
@@ -26,8 +35,18 @@ def _sget(secrets: dict, *keys, default=None):
 def _now_iso_z() -> str:
     return datetime.now(timezone.utc).isoformat()
 
+def _json_dumps_compact(obj: Any) -> str:
+    if _orjson is not None:
+        try:
+            return _orjson.dumps(obj).decode("utf-8")
+        except TypeError:
+            pass  # e.g. non-str keys / big ints → let stdlib handle it
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
 def _safe_json_loads(s: str) -> dict:
     try:
+        if _orjson is not None:
+            return _orjson.loads(s)
         return json.loads(s)
     except Exception:
         # ultra-robust: slice first balanced JSON block
@@ -37,6 +56,44 @@ def _safe_json_loads(s: str) -> dict:
             return json.loads(s[start:end+1])
         raise
 
+# Keys the comparator actually needs; everything else (titles, axis labels,
+# styling, notes) is dropped before prompting to keep the request small.
+_PAYLOAD_KEEP_KEYS = {"value", "unit", "points", "data_points", "x", "y", "series", "label"}
+_PAYLOAD_MAX_POINTS = 100
+
+def _strip_number(v: Any) -> Any:
+    if isinstance(v, bool) or v is None:
+        return v
+    if isinstance(v, (int, float)):
+        return float(v)
+    return v
+
+def _strip_payload(obj: Any) -> Any:
+    """
+    Reduce an extract payload to the numeric essentials (values/units/series points).
+    Lists are capped at _PAYLOAD_MAX_POINTS items with a "truncated" marker.
+    """
+    if isinstance(obj, dict):
+        out = {}
+        for k, v in obj.items():
+            if k not in _PAYLOAD_KEEP_KEYS:
+                continue
+            out[k] = _strip_payload(v)
+        return out
+    if isinstance(obj, list):
+        items = [_strip_payload(v) for v in obj[:_PAYLOAD_MAX_POINTS]]
+        if len(obj) > _PAYLOAD_MAX_POINTS:
+            items.append({"truncated": len(obj) - _PAYLOAD_MAX_POINTS})
+        return items
+    return _strip_number(obj)
+
+def _compact_payload_json(obj: Any) -> str:
+    stripped = _strip_payload(obj)
+    # nothing recognisable left → send the original rather than an empty object
+    if not stripped:
+        stripped = obj
+    return _json_dumps_compact(stripped)
+
 
 # ----------------------------- LLM Comparator --------------------------------
 
@@ -68,6 +125,47 @@ LLM_COMPARE_USER_TEMPLATE = (
     "JSON B:\n{json_b}\n"
 )
 
+# built once; reused as messages[0] on every compare call
+_SYSTEM_MSG = {"role": "system", "content": LLM_COMPARE_SYSTEM}
+
+
+@lru_cache(maxsize=8)
+def _mistral_client(api_key: str) -> Mistral:
+    """One client (and connection pool) per API key instead of one per compare."""
+    return Mistral(api_key=api_key)
+
+# Raw compare answers memoized per process on (content sha, model) only: the key
+# stays small and neither the JSON payloads nor the API key are retained.
+# Temperature is 0.0, so identical inputs (retries/backfills) reuse the answer.
+_COMPARE_CACHE: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+_COMPARE_CACHE_MAX = 4096
+_COMPARE_CACHE_LOCK = threading.Lock()
+
+def _llm_compare_cached(client: Mistral, json_a_s: str, json_b_s: str, model: str) -> str:
+    """Raw LLM compare (JSON text), served from the process cache when seen before."""
+    key = (hashlib.sha256((json_a_s + "\x00" + json_b_s).encode("utf-8")).hexdigest(), model)
+    with _COMPARE_CACHE_LOCK:
+        hit = _COMPARE_CACHE.get(key)
+        if hit is not None:
+            _COMPARE_CACHE.move_to_end(key)
+            return hit
+    user = LLM_COMPARE_USER_TEMPLATE.format(json_a=json_a_s, json_b=json_b_s)
+    resp = client.chat.complete(
+        model=model,
+        messages=[
+            _SYSTEM_MSG,
+            {"role": "user", "content": user},
+        ],
+        temperature=0.0,
+        response_format={"type": "json_object"},
+    )
+    raw = resp.choices[0].message.content or "{}"
+    with _COMPARE_CACHE_LOCK:
+        _COMPARE_CACHE[key] = raw
+        if len(_COMPARE_CACHE) > _COMPARE_CACHE_MAX:
+            _COMPARE_CACHE.popitem(last=False)
+    return raw
+
 
 class PairCompareLLM:
     """
@@ -149,21 +247,9 @@ class PairCompareLLM:
     # ----------------------------- LLM call -----------------------------------
 
     def _call_llm_compare(self, json_a: Dict, json_b: Dict) -> Dict:
-        client = Mistral(api_key=self.api_key)
-        user = LLM_COMPARE_USER_TEMPLATE.format(
-            json_a=json.dumps(json_a, ensure_ascii=False),
-            json_b=json.dumps(json_b, ensure_ascii=False),
-        )
-        resp = client.chat.complete(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": LLM_COMPARE_SYSTEM},
-                {"role": "user",   "content": user},
-            ],
-            temperature=0.0,
-            response_format={"type": "json_object"},
-        )
-        raw = resp.choices[0].message.content or "{}"
+        json_a_s = _compact_payload_json(json_a)
+        json_b_s = _compact_payload_json(json_b)
+        raw = _llm_compare_cached(_mistral_client(self.api_key), json_a_s, json_b_s, self.model)
         out = _safe_json_loads(raw)
 
         # Minimal normalization
@@ -181,6 +267,27 @@ class PairCompareLLM:
 
     # ------------------------- SCD2 upsert compare ----------------------------
 
+    def _end_date_current_pg(self, now_iso: str, pair_id, left_ext_id, right_ext_id, model_name) -> None:
+        # same predicate as the PostgREST path; plain parameterized UPDATE (no
+        # PREPARE: server-side statements don't survive Supabase's transaction pooler)
+        sql = (
+            f"UPDATE {self.TBL_COMPARE} SET curr_rec_ind = FALSE, rec_eff_end_dt = %s "
+            "WHERE pair_id = %s AND left_extraction_id = %s AND right_extraction_id = %s "
+            "AND model_name = %s AND curr_rec_ind = TRUE"
+        )
+        with pg_conn() as conn, conn.cursor() as cur:
+            cur.execute(sql, (now_iso, pair_id, left_ext_id, right_ext_id, model_name))
+
+    def _end_date_current_rest(self, now_iso: str, pair_id, left_ext_id, right_ext_id, model_name) -> None:
+        self.sb.table(self.TBL_COMPARE).update(
+            {"curr_rec_ind": False, "rec_eff_end_dt": now_iso}
+        ).eq("pair_id", pair_id)\
+         .eq("left_extraction_id", left_ext_id)\
+         .eq("right_extraction_id", right_ext_id)\
+         .eq("model_name", model_name)\
+         .eq("curr_rec_ind", True)\
+         .execute()
+
     def scd2_upsert_compare(
         self,
         *,
@@ -201,17 +308,21 @@ class PairCompareLLM:
         model_name = model_name or self.model
 
         # End-date current row for same natural key (pair + left_ext + right_ext + model), then insert
-        try:
-            self.sb.table(self.TBL_COMPARE).update(
-                {"curr_rec_ind": False, "rec_eff_end_dt": now_iso}
-            ).eq("pair_id", pair_id)\
-             .eq("left_extraction_id", left_extraction_id)\
-             .eq("right_extraction_id", right_extraction_id)\
-             .eq("model_name", model_name)\
-             .eq("curr_rec_ind", True)\
-             .execute()
-        except APIError:
-            pass
+        # (a failed direct-PG update falls back to PostgREST, so the insert below
+        # never leaves two current rows for the same key)
+        args = (now_iso, pair_id, left_extraction_id, right_extraction_id, model_name)
+        ended = False
+        if pg_available():
+            try:
+                self._end_date_current_pg(*args)
+                ended = True
+            except Exception:
+                pass
+        if not ended:
+            try:
+                self._end_date_current_rest(*args)
+            except APIError:
+                pass
 
         payload = {
             "pair_id": pair_id,
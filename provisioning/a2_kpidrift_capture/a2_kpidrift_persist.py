@@ -1,18 +1,81 @@
 # provisioning/2_kpidrift_capture/2_kpidrift_persist.py
-import uuid, datetime as dt, hashlib
+import os, uuid, datetime as dt, hashlib, logging, struct
 from io import BytesIO
 from urllib.parse import urlparse
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Union, BinaryIO
 
 from PIL import Image  # pip install pillow
 
-def sha256_hex(b: bytes) -> str:
-    return hashlib.sha256(b).hexdigest()  # 64-char lowercase hex
+from provisioning.a2_kpidrift_capture.a2_kpidrift_pg import pg_available, pg_conn
+
+WIDGET_COLUMNS = (
+    "widget_id", "screengrab_id", "bbox_xywh", "storage_bucket", "storage_path_crop",
+    "extraction_stage", "extraction_notes", "widget_type", "widget_title", "unit", "agg",
+    "ocr_confidence", "classification_confidence", "parsed_to_fact",
+    "insrt_dttm", "rec_eff_strt_dt", "curr_rec_ind",
+)
+
+logger = logging.getLogger(__name__)
+
+def sha256_hex(b: Union[bytes, bytearray, memoryview, BinaryIO]) -> str:
+    """
+    64-char lowercase hex. Accepts bytes-like objects (hashed via a memoryview,
+    no copy) or a binary file object (streamed). hashlib uses OpenSSL, so the
+    SHA-NI / ARMv8 SHA instructions are used where the CPU has them.
+    """
+    if hasattr(b, "read"):
+        if hasattr(hashlib, "file_digest"):  # py3.11+
+            return hashlib.file_digest(b, "sha256").hexdigest()
+        h = hashlib.sha256()
+        for chunk in iter(lambda: b.read(1 << 20), b""):
+            h.update(chunk)
+        return h.hexdigest()
+    h = hashlib.sha256()
+    h.update(memoryview(b))
+    return h.hexdigest()
+
+_PNG_SIG = b"\x89PNG\r\n\x1a\n"
+
+# JPEG start-of-frame markers (baseline/progressive/...); C4, C8, CC are not frames
+_JPEG_SOF = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+def _jpeg_wh(b: bytes) -> Optional[Tuple[int, int]]:
+    """Walk JPEG segment headers up to the first SOFn; None if not found."""
+    i, n = 2, len(b)
+    while i + 9 <= n:
+        if b[i] != 0xFF:
+            return None
+        marker = b[i + 1]
+        if marker == 0xFF:          # fill byte
+            i += 1
+            continue
+        if marker in _JPEG_SOF:
+            h, w = struct.unpack(">HH", b[i + 5:i + 9])
+            return int(w), int(h)
+        i += 2 + struct.unpack(">H", b[i + 2:i + 4])[0]
+    return None
 
 def image_wh(png_bytes: bytes) -> Tuple[int, int]:
+    # PNG: width/height are the first two fields of the IHDR chunk (bytes 16..24)
+    if png_bytes[:8] == _PNG_SIG and png_bytes[12:16] == b"IHDR":
+        w, h = struct.unpack(">II", png_bytes[16:24])
+        return int(w), int(h)
+    if png_bytes[:2] == b"\xff\xd8":
+        wh = _jpeg_wh(png_bytes)
+        if wh:
+            return wh
     with Image.open(BytesIO(png_bytes)) as im:
         return int(im.width), int(im.height)
 
+def _uuid_batch(n: int) -> List[str]:
+    """n random (v4) UUID strings from a single os.urandom read."""
+    raw = os.urandom(16 * n)
+    return [str(uuid.UUID(bytes=raw[i * 16:(i + 1) * 16], version=4)) for i in range(n)]
+
+def _utc_now_iso() -> str:
+    # tz-aware (utcnow() is deprecated and its isoformat() carries no offset)
+    return dt.datetime.now(dt.timezone.utc).isoformat()
+
 def url_host(url: str) -> Optional[str]:
     try:
         return urlparse(url).hostname
@@ -24,16 +87,19 @@ def upsert_screengrab(
     session_id: str,
     url: str,
     platform: str,
-    full_png_bytes: bytes,
+    full_png_bytes: Union[bytes, memoryview],   # BytesIO.getbuffer() is fine; not copied
     storage_bucket: str,
     storage_path_full: str,
     user_id: Optional[str] = None,
+    screengrab_hash: Optional[str] = None,
 ) -> Dict:
     """
     Insert or fetch screengrab by content hash (kdh_screengrab_dim).
     Matches your table's constraints: char(64) hash, not-null fields, etc.
+    Pass `screengrab_hash` if the caller already hashed the PNG (e.g. overlapped
+    with the Storage upload) to skip re-hashing here.
     """
-    now = dt.datetime.utcnow()
+    now_iso = _utc_now_iso()
     row = {
         "screengrab_id": str(uuid.uuid4()),
         "capture_session_id": session_id,
@@ -41,13 +107,13 @@ def upsert_screengrab(
         "platform": platform or "unknown",
         "detected_via": "url",
         "platform_confidence": 0.990 if platform in ("powerbi", "tableau") else 0.500,
-        "screengrab_hashvalue": sha256_hex(full_png_bytes),
+        "screengrab_hashvalue": screengrab_hash or sha256_hex(full_png_bytes),
         "storage_bucket": storage_bucket,
         "storage_path_full": storage_path_full,
         "wrapper_host": url_host(url),
         "user_id": user_id,
-        "captured_at": now.isoformat(),
-        "rec_eff_strt_dt": now.isoformat(),
+        "captured_at": now_iso,
+        "rec_eff_strt_dt": now_iso,
         "curr_rec_ind": True,
     }
     try:
@@ -61,27 +127,20 @@ def upsert_screengrab(
                .limit(1).execute())
         return res.data[0] if res.data else row
 
-def insert_widgets(
-    sb,
-    *,
-    screengrab_id: str,
-    storage_bucket: str,
-    crops: List[Dict],   # each: {"path": ".../widgets/w_0.png", "bytes": b"...", "bbox": [x,y,w,h] | None}
-) -> None:
-    """
-    Insert widget crops (kdh_widget_dim). Ensures bbox_xywh meets CHECK (w>0,h>0).
-    """
-    now = dt.datetime.utcnow().isoformat()
+def _widget_rows(screengrab_id: str, storage_bucket: str, crops: List[Dict],
+                 now_iso: Optional[str] = None) -> List[Dict]:
+    now = now_iso or _utc_now_iso()   # one timestamp stamped on the whole batch
     rows = []
+    ids = _uuid_batch(len(crops))
 
-    for c in crops:
+    for i, c in enumerate(crops):
         if c.get("bbox"):
             x, y, w, h = c["bbox"]
         else:
             w, h = image_wh(c["bytes"])
             x, y = 0, 0
         rows.append({
-            "widget_id": str(uuid.uuid4()),
+            "widget_id": ids[i],
             "screengrab_id": screengrab_id,
             "bbox_xywh": [int(x), int(y), int(w), int(h)],
             "storage_bucket": storage_bucket,
@@ -99,6 +158,35 @@ def insert_widgets(
             "rec_eff_strt_dt": now,
             "curr_rec_ind": True,
         })
+    return rows
 
-    if rows:
-        sb.table("kdh_widget_dim").insert(rows).execute()
+def _pg_insert_widget_rows(rows: List[Dict]) -> None:
+    from psycopg2.extras import execute_values
+    sql = f"INSERT INTO kdh_widget_dim ({', '.join(WIDGET_COLUMNS)}) VALUES %s"
+    with pg_conn() as conn, conn.cursor() as cur:
+        execute_values(cur, sql, [tuple(r[c] for c in WIDGET_COLUMNS) for r in rows], page_size=500)
+
+def _write_widget_rows(sb, rows: List[Dict]) -> None:
+    if not rows:
+        return
+    if pg_available():
+        try:
+            _pg_insert_widget_rows(rows)
+            return
+        except Exception as e:
+            # pg_conn rolled the batch back, so PostgREST can write it whole
+            logger.warning("direct Postgres widget insert failed (%d rows), using PostgREST: %s", len(rows), e)
+    sb.table("kdh_widget_dim").insert(rows).execute()
+
+def insert_widgets(
+    sb,
+    *,
+    screengrab_id: str,
+    storage_bucket: str,
+    crops: List[Dict],   # each: {"path": ".../widgets/w_0.png", "bytes": b"...", "bbox": [x,y,w,h] | None}
+) -> None:
+    """
+    Insert widget crops (kdh_widget_dim). Ensures bbox_xywh meets CHECK (w>0,h>0).
+    Uses the pooled direct-Postgres path when configured, else PostgREST.
+    """
+    _write_widget_rows(sb, _widget_rows(screengrab_id, storage_bucket, crops))
@@ -0,0 +1,115 @@
+# provisioning/a2_kpidrift_capture/a2_kpidrift_pg.py
+"""
+Optional direct-Postgres path for hot KPI Drift writes.
+
+PostgREST (supabase-py) stays the default. If a Postgres DSN is configured
+(KDH_PG_DSN / SUPABASE_DB_URL) and psycopg2 is importable, bulk writes go
+through one shared, process-wide connection pool instead of one HTTP request
+per call. Everything here returns None / False when the path is unavailable so
+callers can fall back to `sb.table(...)`.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+try:
+    import psycopg2
+    from psycopg2.pool import ThreadedConnectionPool
+except ImportError:  # psycopg2-binary is in requirements, but keep it optional
+    psycopg2 = None
+    ThreadedConnectionPool = None
+
+# ── Config ───────────────────────────────────────────────────────────────────
+def _sget(*keys, default=None):
+    for k in keys:
+        v = os.getenv(k)
+        if v:
+            return v
+    try:
+        import streamlit as st  # optional
+        for k in keys:
+            if k in st.secrets:
+                return st.secrets[k]
+    except Exception:
+        pass
+    return default
+
+PG_POOL_MIN = int(_sget("KDH_PG_POOL_MIN", default="1"))
+PG_POOL_MAX = int(_sget("KDH_PG_POOL_MAX", default="10"))
+# after a failed connect, the direct path is off (callers use PostgREST) for this long
+PG_RETRY_S  = float(_sget("KDH_PG_RETRY_S", default="300"))
+
+logger = logging.getLogger(__name__)
+
+# ── Pool ─────────────────────────────────────────────────────────────────────
+_pool = None
+_pool_lock = threading.Lock()
+_pool_down_until = 0.0   # monotonic deadline of the current failure backoff
+
+def get_pg_pool():
+    """
+    Lazy, shared ThreadedConnectionPool; None if no DSN, psycopg2 missing, or the
+    DSN failed to connect within the last PG_RETRY_S (logged once per failure).
+    """
+    global _pool, _pool_down_until
+    if _pool is not None:
+        return _pool
+    if ThreadedConnectionPool is None or time.monotonic() < _pool_down_until:
+        return None
+    dsn = _sget("KDH_PG_DSN", "SUPABASE_DB_URL", "SUPABASE__DB_URL")
+    if not dsn:
+        return None
+    with _pool_lock:
+        if _pool is None and time.monotonic() >= _pool_down_until:
+            try:
+                _pool = ThreadedConnectionPool(PG_POOL_MIN, PG_POOL_MAX, dsn=dsn)
+            except Exception as e:
+                _pool_down_until = time.monotonic() + PG_RETRY_S
+                logger.warning("direct Postgres unavailable, using PostgREST for %.0fs: %s", PG_RETRY_S, e)
+    return _pool
+
+def pg_available() -> bool:
+    try:
+        return get_pg_pool() is not None
+    except Exception:
+        return False
+
+@contextmanager
+def pg_conn() -> Iterator:
+    """Borrow a pooled connection; commit on success, rollback on error."""
+    pool = get_pg_pool()
+    if pool is None:
+        raise RuntimeError("Direct Postgres path not configured (KDH_PG_DSN / SUPABASE_DB_URL).")
+    conn = pool.getconn()
+    broken = False
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            broken = True
+        raise
+    finally:
+        pool.putconn(conn, close=broken or bool(conn.closed))
+
+def close_pg_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            try:
+                _pool.closeall()
+            except Exception:
+                pass
+            _pool = None
+
+atexit.register(close_pg_pool)
+
+__all__ = ["get_pg_pool", "pg_available", "pg_conn", "close_pg_pool"]
@@ -1,9 +1,11 @@
+import base64
 from pathlib import Path
+from contextlib import ExitStack
 from typing import Dict
-from playwright.sync_api import TimeoutError as PWTimeout, sync_playwright
+from playwright.sync_api import TimeoutError as PWTimeout
 
 from provisioning.bootstrap import ensure_playwright_ready
-from .a2_kpidrift_engine import nowstamp, ensure_outdir, setup_logs
+from .a2_kpidrift_engine import nowstamp, ensure_outdir, setup_logs, BROWSER_POOL, SCREENSHOT_SCALE
 from .a2_kpidrift_types import CaptureResult, Artifacts
 
 PBI_SELECTORS = [
@@ -15,7 +17,41 @@ PBI_SELECTORS = [
     "canvas",
 ]
 
-def capture_powerbi(url: str, outdir: Path) -> CaptureResult:
+# One in-frame pass over PBI_SELECTORS (native querySelector) instead of a
+# wait_for round-trip per selector; returns the first big-enough match.
+_PROBE_JS = """
+(sels) => {
+  for (const s of sels) {
+    const el = document.querySelector(s);
+    if (!el) continue;
+    const b = el.getBoundingClientRect();
+    if (b.width > 300 && b.height > 200) return s;
+  }
+  return null;
+}
+"""
+
+def _cdp_clip_png(ctx, page, box: Dict) -> bytes:
+    """Screenshot just `box` (page CSS px) via CDP Page.captureScreenshot — no relayout of the whole doc."""
+    cdp = ctx.new_cdp_session(page)
+    try:
+        res = cdp.send("Page.captureScreenshot", {
+            "format": "png",
+            "clip": {"x": box["x"], "y": box["y"], "width": box["width"], "height": box["height"], "scale": 1},
+        })
+        return base64.b64decode(res["data"])
+    finally:
+        try:
+            cdp.detach()
+        except Exception:
+            pass
+
+def capture_powerbi(url: str, outdir: Path, ctx=None, need_full_page: bool = False) -> CaptureResult:
+    """
+    Pass `ctx` to reuse a caller-owned context; otherwise one is taken from BROWSER_POOL.
+    `full` is a viewport shot unless need_full_page=True (Power BI embeds fill the
+    viewport, so the full-page relayout rarely adds anything).
+    """
     ensure_playwright_ready()
 
     outdir = ensure_outdir(outdir)
@@ -27,11 +63,12 @@ def capture_powerbi(url: str, outdir: Path) -> CaptureResult:
         "log":    outdir / f"powerbi_log_{ts}.txt",
     }
 
-    with sync_playwright() as pw:
-        browser = pw.chromium.launch(headless=True, args=["--no-sandbox", "--disable-dev-shm-usage"])
-        ctx = browser.new_context(viewport={"width": 1920, "height": 1080}, device_scale_factor=2.0)
+    with ExitStack() as stack:
+        if ctx is None:
+            ctx = stack.enter_context(BROWSER_POOL.context(viewport=(1920, 1080), scale=SCREENSHOT_SCALE))
         page = ctx.new_page()
         logs = setup_logs(page)
+        shots: Dict[str, bytes] = {}   # PNGs kept in memory alongside the files
 
         try:
             page.goto(url, wait_until="domcontentloaded", timeout=60_000)
@@ -39,26 +76,43 @@ def capture_powerbi(url: str, outdir: Path) -> CaptureResult:
             page.locator("iframe").first.wait_for(timeout=20000)
             fl = page.frame_locator("iframe").first
 
-            target = None
-            for sel in PBI_SELECTORS:
+            target, target_box = None, None
+            try:
+                frame = page.locator("iframe").first.element_handle().content_frame()
+                hit = frame.evaluate(_PROBE_JS, PBI_SELECTORS) if frame else None
+            except Exception:
+                hit = None
+            if hit:
+                loc = fl.locator(hit).first
+                box = loc.bounding_box()
+                if box and box["width"] > 300 and box["height"] > 200:
+                    target, target_box = loc, box
+
+            # slow path: per-selector waits (content still rendering)
+            for sel in ([] if target else PBI_SELECTORS):
                 try:
                     loc = fl.locator(sel).first
                     loc.wait_for(timeout=8000)
                     box = loc.bounding_box()
                     if box and box["width"] > 300 and box["height"] > 200:
-                        target = loc
+                        target, target_box = loc, box
                         break
                 except PWTimeout:
                     continue
 
             page.evaluate("window.scrollTo(0,0)")
             page.wait_for_timeout(800)
-            page.screenshot(path=str(paths["full"]), full_page=True)
+            shots["full"] = page.screenshot(full_page=need_full_page)
+            paths["full"].write_bytes(shots["full"])
 
             if target:
-                target.screenshot(path=str(paths["report"]))
+                try:
+                    shots["report"] = _cdp_clip_png(ctx, page, target.bounding_box() or target_box)
+                except Exception:
+                    shots["report"] = target.screenshot()
             else:
-                page.locator("iframe").first.screenshot(path=str(paths["report"]))
+                shots["report"] = page.locator("iframe").first.screenshot()
+            paths["report"].write_bytes(shots["report"])
 
         except Exception:
             try:
@@ -69,15 +123,14 @@ def capture_powerbi(url: str, outdir: Path) -> CaptureResult:
             if logs:
                 paths["log"].write_text("\n".join(logs), encoding="utf-8")
             page.close()
-            ctx.close()
-            browser.close()
 
     return CaptureResult(
         provider="powerbi",
         url=url,
         outdir=outdir,
         artifacts=Artifacts(
-            full=paths["full"], report=paths["report"], html=paths["html"], log=paths["log"]
+            full=paths["full"], report=paths["report"], html=paths["html"], log=paths["log"],
+            full_bytes=shots.get("full"), report_bytes=shots.get("report"),
         ),
         meta={"selectors_tried": ",".join(PBI_SELECTORS)},
     )
@@ -1,6 +1,11 @@
 from __future__ import annotations
 from typing import Dict, List, Tuple
 
+try:  # numpy ships with streamlit/pandas; scalar fallbacks below if missing
+    import numpy as np
+except ImportError:
+    np = None
+
 # Base detection gates
 MIN_W, MIN_H = 150, 100
 
@@ -128,7 +133,27 @@ def iou(a: Tuple[int,int,int,int], b: Tuple[int,int,int,int]) -> float:
     ua = aw*ah + bw*bh - inter
     return inter / max(1, ua)
 
+def iou_matrix(boxes_xywh):
+    """
+    Pairwise IoU for N boxes [x,y,w,h] in one NumPy pass → (N, N) float array.
+    Same semantics as iou(): union is floored at 1.
+    """
+    if np is None:
+        boxes = [tuple(bx) for bx in boxes_xywh]
+        return [[iou(a, b) for b in boxes] for a in boxes]
+    b = np.asarray(boxes_xywh, dtype=np.float64).reshape(-1, 4)
+    x1, y1 = b[:, 0], b[:, 1]
+    x2, y2 = x1 + b[:, 2], y1 + b[:, 3]
+    xx1 = np.maximum(x1[:, None], x1[None, :])
+    yy1 = np.maximum(y1[:, None], y1[None, :])
+    xx2 = np.minimum(x2[:, None], x2[None, :])
+    yy2 = np.minimum(y2[:, None], y2[None, :])
+    inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+    areas = b[:, 2] * b[:, 3]
+    union = areas[:, None] + areas[None, :] - inter
+    return inter / np.maximum(union, 1)
+
 __all__ = [
     "MIN_W", "MIN_H", "QUALITY_THRESHOLD", "IOU_DROP_SAME_KIND",
-    "score_widget", "append_quality_suffix", "iou",
+    "score_widget", "append_quality_suffix", "iou", "iou_matrix",
 ]
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from typing import Dict
 
@@ -8,8 +9,23 @@ from .a2_kpidrift_types import CaptureResult, Artifacts
 # Optional selectors to try if there's no iframe
 TABLEAU_CANDIDATES = "canvas, svg, div[role='img'], div.tabToolbar, div.tab-widget, div.tab-content"
 
+# Painted-viz probe *inside* the embed frame (the iframe element itself is
+# "visible" as soon as it's laid out, long before the viz renders)
+FRAME_READY = "canvas, .tab-content"
+
+# Short settle after scrolling back to the top (repaint of the embed)
+POST_SCROLL_MS = 300
+
+# Full-page (scroll-length) capture of the host page; viewport-only unless enabled
+SAVE_FULL_PAGE = os.getenv("KDH_SAVE_FULL_PAGE", "0").lower() in ("1", "true", "yes")
+
 @with_browser(headless=True)
-def capture_tableau(ctx, url: str, outdir: Path) -> CaptureResult:
+def capture_tableau(ctx, url: str, outdir: Path, need_full_page: bool = SAVE_FULL_PAGE) -> CaptureResult:
+    """
+    `full` is a viewport shot unless need_full_page=True (or KDH_SAVE_FULL_PAGE=1):
+    the viz fills the viewport, and a full-page capture re-lays-out and encodes the
+    whole scroll length at device scale on every run.
+    """
     outdir = ensure_outdir(outdir)
     ts = nowstamp()
     paths: Dict[str, Path] = {
@@ -21,34 +37,43 @@ def capture_tableau(ctx, url: str, outdir: Path) -> CaptureResult:
 
     page = ctx.new_page()
     logs = setup_logs(page)
+    shots: Dict[str, bytes] = {}   # PNGs kept in memory alongside the files
 
     try:
         # Navigate & settle
         page.goto(url, wait_until="domcontentloaded", timeout=60_000)
-        page.wait_for_timeout(6000)  # lightweight settle
-
-        # Try to ensure iframe is present (many public Tableau embeds use one)
+        # no networkidle / fixed settle: Tableau's websocket keeps the network busy,
+        # so a visible viz element inside the embed is the readiness signal
+        try:
+            page.wait_for_selector("iframe", state="attached", timeout=5000)  # embeds inject it late
+        except PWTimeout:
+            pass
         try:
-            ifr = page.locator("iframe").first
-            if ifr.count():
-                ifr.wait_for(timeout=20_000)
+            if page.locator("iframe").count():
+                (page.frame_locator("iframe").first
+                     .locator(FRAME_READY).first
+                     .wait_for(state="visible", timeout=20_000))
+            else:
+                page.locator(TABLEAU_CANDIDATES).first.wait_for(state="visible", timeout=8000)
         except PWTimeout:
             pass
 
         # Top-left anchor for consistent full-page captures
         page.evaluate("window.scrollTo(0,0)")
-        page.wait_for_timeout(800)
+        page.wait_for_timeout(POST_SCROLL_MS)
 
-        # Full-page shot
-        page.screenshot(path=str(paths["full"]), full_page=True)
+        # Full shot (viewport unless asked for the whole page)
+        shots["full"] = page.screenshot(full_page=need_full_page)
+        paths["full"].write_bytes(shots["full"])
 
         # Widget-sized shot (iframe first; otherwise best visual candidate)
         if page.locator("iframe").count():
-            page.locator("iframe").first.screenshot(path=str(paths["report"]))
+            shots["report"] = page.locator("iframe").first.screenshot()
         else:
             cand = page.locator(TABLEAU_CANDIDATES).first
             cand.wait_for(timeout=8000)
-            cand.screenshot(path=str(paths["report"]))
+            shots["report"] = cand.screenshot()
+        paths["report"].write_bytes(shots["report"])
 
     except Exception:
         # Best-effort HTML dump for debugging
@@ -67,7 +92,8 @@ def capture_tableau(ctx, url: str, outdir: Path) -> CaptureResult:
         outdir=outdir,
         artifacts=Artifacts(
             full=paths["full"], report=paths["report"],
-            html=paths["html"],  log=paths["log"]
+            html=paths["html"],  log=paths["log"],
+            full_bytes=shots.get("full"), report_bytes=shots.get("report"),
         ),
         meta={}
     )
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Optional, Dict
 
@@ -8,6 +8,9 @@ class Artifacts:
     report: Path
     html: Optional[Path] = None
     log: Optional[Path] = None
+    # the same PNGs in memory, so uploaders don't read back what was just written
+    full_bytes: Optional[bytes] = field(default=None, repr=False)
+    report_bytes: Optional[bytes] = field(default=None, repr=False)
 
 @dataclass
 class CaptureResult:
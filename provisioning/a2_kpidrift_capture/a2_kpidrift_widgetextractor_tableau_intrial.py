@@ -19,43 +19,62 @@ from __future__ import annotations
 # ╔═══════════════════════════════════════════════════════════════════════════╗
 # ║ Imports & typing                                                          ║
 # ╚═══════════════════════════════════════════════════════════════════════════╝
+import atexit
 import os
-import io
 import re
+import logging
+import random
+import queue
+import threading
+import time
 import uuid 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
-import  hashlib
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, List, Literal, Optional, Tuple, Union
 from datetime import datetime, timezone
 from urllib.parse import urlparse
-from provisioning.bootstrap import ensure_playwright_installed
-ensure_playwright_installed()
 
-import tableauserverclient as TSC
-from PIL import Image
-from supabase import create_client, Client
+# tableauserverclient / supabase are imported on first use (importing this module
+# from the orchestrator shouldn't pay for them); annotations only need the names.
+if TYPE_CHECKING:
+    import tableauserverclient as TSC
+    from supabase import Client
 
 # DB helpers reused from your persist layer (Power BI uses these)
 from provisioning.a2_kpidrift_capture.a2_kpidrift_persist import (
     upsert_screengrab,  # Step 4 (parent)
     insert_widgets,     # Step 7 (children)
+    image_wh,           # PNG IHDR size read (Pillow only for non-PNG)
+    sha256_hex,         # same hash the Power BI path stores in screengrab_hashvalue
 )
 
 # ╔═══════════════════════════════════════════════════════════════════════════╗
 # ║ Config / secrets helpers                                                  ║
 # ╚═══════════════════════════════════════════════════════════════════════════╝
+_ST_SECRETS: Optional[Dict] = None
+
+def _st_secrets() -> Dict:
+    """Top-level st.secrets, read once per process ({} outside Streamlit)."""
+    global _ST_SECRETS
+    if _ST_SECRETS is None:
+        try:
+            import streamlit as st  # optional
+            _ST_SECRETS = {k: st.secrets[k] for k in st.secrets}
+        except Exception:
+            _ST_SECRETS = {}
+    return _ST_SECRETS
+
 def _sget(*keys: str, default=None):
+    # env stays live (pages inject temporary creds via os.environ); secrets are cached
     for k in keys:
         v = os.getenv(k)
         if v:
             return v
-    try:
-        import streamlit as st  # optional
-        for k in keys:
-            if k in st.secrets:
-                return st.secrets[k]
-    except Exception:
-        pass
+    secrets = _st_secrets()
+    for k in keys:
+        if k in secrets:
+            return secrets[k]
     return default
 
 SUPABASE_URL  = _sget("SUPABASE_URL", "SUPABASE__URL")
@@ -71,12 +90,82 @@ TABLEAU_SITE_ID    = _sget("TABLEAU_SITE_ID")
 TABLEAU_USERNAME   = _sget("TABLEAU_USERNAME")
 TABLEAU_PASSWORD   = _sget("TABLEAU_PASSWORD")
 
-sb: Optional[Client] = None
-if SUPABASE_URL and SUPABASE_KEY:
+# Views are exported + uploaded concurrently (both legs are network-bound).
+# Export workers feed a bounded queue drained by the upload workers.
+TABLEAU_EXPORT_WORKERS = int(_sget("TABLEAU_EXPORT_WORKERS", default="8"))
+TABLEAU_UPLOAD_WORKERS = int(_sget("TABLEAU_UPLOAD_WORKERS", default="4"))
+UPLOAD_QUEUE_MAX       = 4
+
+# Storage upload retries (429 / 5xx / network): exponential backoff + full jitter
+UPLOAD_MAX_ATTEMPTS  = 5
+UPLOAD_BACKOFF_BASE  = 0.2    # seconds
+UPLOAD_BACKOFF_MAX   = 4.0
+
+# Project/workbook listings are cached per (server, site) for this many seconds
+TABLEAU_LIST_CACHE_TTL = 60.0
+
+# Per-run upload index: sha256 of PNG bytes → storage key already uploaded in
+# *this* run (so every key stays under the run's own session folder). The same
+# sheet on several dashboards reuses the stored object. Only widget uploads go
+# in: the full image uploads concurrently, so letting widget 01 reuse its key
+# would make widget 01's storage_path_crop depend on which finished first.
+def _uploaded_key(uploaded: Dict[str, str], lock: threading.Lock, digest: str) -> Optional[str]:
+    with lock:
+        return uploaded.get(digest)
+
+def _remember_upload(uploaded: Dict[str, str], lock: threading.Lock, digest: str, key: str) -> None:
+    with lock:
+        uploaded[digest] = key
+
+# Seconds per TSC HTTP request (sign-in, listings, image exports)
+TABLEAU_HTTP_TIMEOUT = float(_sget("TABLEAU_HTTP_TIMEOUT", default="60"))
+
+# A signed-in server is reused across runs for this long (Tableau Cloud's default
+# session timeout is longer), so back-to-back extractions skip the sign-in round-trip
+TABLEAU_SESSION_TTL = float(_sget("TABLEAU_SESSION_TTL", default="3500"))
+
+def _tuned_http_client():
+    """
+    Shared httpx client for PostgREST + Storage: explicit keep-alive pool sized for
+    the parallel uploaders, HTTP/2 when `h2` is installed (one TLS connection,
+    many multiplexed uploads). None → let supabase-py build its default client.
+    """
     try:
-        sb = create_client(SUPABASE_URL, SUPABASE_KEY)
+        import httpx
+    except ImportError:
+        return None
+    try:
+        import h2  # noqa: F401
+        http2 = True
+    except ImportError:
+        http2 = False
+    return httpx.Client(
+        http2=http2,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=40, keepalive_expiry=30),
+        timeout=httpx.Timeout(60.0, connect=10.0),
+        follow_redirects=True,
+    )
+
+def _create_sb() -> Optional[Client]:
+    from supabase import create_client
+    http_client = _tuned_http_client()
+    if http_client is not None:
+        try:
+            from supabase import ClientOptions
+            return create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(httpx_client=http_client))
+        except TypeError:
+            http_client.close()   # supabase-py without httpx_client injection
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
+
+@lru_cache(maxsize=1)
+def _get_sb() -> Optional[Client]:
+    """Process-wide Supabase client, created on first use; None if not configured."""
+    if not (SUPABASE_URL and SUPABASE_KEY):
+        return None
+    try:
+        return _create_sb()
     except Exception:
-        sb = None
+        return None
 
 # ╔═══════════════════════════════════════════════════════════════════════════╗
 # ║ Local FS + naming utilities (same behavior as your working code)          ║
@@ -89,26 +178,34 @@ def _ensure_dir(p: Path) -> Path:
     p.mkdir(parents=True, exist_ok=True)
     return p
 
+_SANITIZE_RE1 = re.compile(r"[^\w\-. ]+")
+_SANITIZE_RE2 = re.compile(r"\s+")
+_SLUG_RE1     = re.compile(r"[^\w\-]+")
+_SLUG_RE2     = re.compile(r"-{2,}")
+_NORM_RE      = re.compile(r"[^a-z0-9]+")
+
 def _sanitize(s: str, max_len: int = 120) -> str:
     s = (s or "").strip()
-    s = re.sub(r"[^\w\-. ]+", "_", s)
-    s = re.sub(r"\s+", "_", s)
+    s = _SANITIZE_RE1.sub("_", s)
+    s = _SANITIZE_RE2.sub("_", s)
     return (s[:max_len] or "untitled").rstrip("._-")
 
 def _slugify(s: str) -> str:
     s = (s or "").lower().strip()
-    s = re.sub(r"[^\w\-]+", "-", s)
-    s = re.sub(r"-{2,}", "-", s).strip("-")
+    s = _SLUG_RE1.sub("-", s)
+    s = _SLUG_RE2.sub("-", s).strip("-")
     return s or "tableau_report"
 
 def _norm(s: str) -> str:
-    return re.sub(r"[^a-z0-9]+", "", (s or "").lower())
+    return _NORM_RE.sub("", (s or "").lower())
+
+# Module logger; handlers and levels are the application's business (the app
+# entry point turns the capture package on at INFO)
+logger = logging.getLogger(__name__)
 
-def _log(msg: str):
-    print(f"[TABLEAU-INTRIAL] {msg}")
+_log = logger.info
 
-def _sha256_hex(b: bytes) -> str:
-    return hashlib.sha256(b).hexdigest()
+_sha256_hex = sha256_hex   # hashes a memoryview of the bytes, no copy
 
 def _host(u: str) -> str | None:
     try:
@@ -119,24 +216,93 @@ def _host(u: str) -> str | None:
 # ╔═══════════════════════════════════════════════════════════════════════════╗
 # ║ Supabase storage helper (identical semantics to Power BI)                 ║
 # ╚═══════════════════════════════════════════════════════════════════════════╝
-def _storage_upload_bytes(bucket: str, key: str, data: bytes, content_type="image/png") -> Dict[str, str]:
+def _err_status(e: Exception) -> Optional[int]:
+    """Best-effort HTTP status from storage3 / httpx exceptions."""
+    for cand in (getattr(e, "status", None),
+                 getattr(getattr(e, "response", None), "status_code", None)):
+        try:
+            if cand is not None:
+                return int(cand)
+        except (TypeError, ValueError):
+            pass
+    for a in getattr(e, "args", ()):   # older storage3: {'statusCode': ..., ...}
+        if isinstance(a, dict):
+            try:
+                return int(a.get("statusCode") or a.get("status"))
+            except (TypeError, ValueError):
+                pass
+    return None
+
+def _is_transient(e: Exception) -> bool:
+    if isinstance(e, (TimeoutError, ConnectionError)):
+        return True
+    if type(e).__module__.startswith("httpx") and "Status" not in type(e).__name__:
+        return True   # httpx transport/timeout errors
+    st = _err_status(e)
+    return st == 429 or (st is not None and 500 <= st < 600)
+
+def _retry_after_s(e: Exception) -> Optional[float]:
+    try:
+        return float(e.response.headers.get("Retry-After"))
+    except Exception:
+        return None
+
+def _with_backoff(fn, what: str):
+    for attempt in range(1, UPLOAD_MAX_ATTEMPTS + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == UPLOAD_MAX_ATTEMPTS or not _is_transient(e):
+                raise
+            delay = _retry_after_s(e)
+            if delay is None:
+                delay = random.uniform(0, min(UPLOAD_BACKOFF_MAX, UPLOAD_BACKOFF_BASE * (2 ** (attempt - 1))))
+            _log(f"{what}: transient error ({e!r}); retry {attempt}/{UPLOAD_MAX_ATTEMPTS - 1} in {delay:.2f}s")
+            time.sleep(delay)
+
+def _storage_upload_bytes(bucket: str, key: str, data: Union[bytes, Path], content_type="image/png") -> Dict[str, str]:
     """
     Upload bytes to Supabase Storage; return {'key', 'public_url'}.
     Key must NOT include bucket name; mirrors Power BI helper behavior.
+    `data` may be a local file Path: it is streamed from disk (reopened per attempt)
+    instead of being held in memory.
+    Transient failures (429/5xx/network) back off and retry; anything else
+    (e.g. 409 on buckets that ignore upsert) goes to replace-and-retry.
     """
+    sb = _get_sb()
     if not sb:
         raise RuntimeError("Supabase client not initialized (check SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY).")
     key = key.lstrip("/")
+    # one bucket proxy per call; sb.storage keeps a single httpx client, so all
+    # uploads (incl. the parallel uploader threads) share keep-alive connections
+    bucket_api = sb.storage.from_(bucket)
+
+    def _put(file_options: Dict):
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            return bucket_api.upload(path=key, file=bytes(data), file_options=file_options)
+        with open(data, "rb") as fh:
+            return bucket_api.upload(path=key, file=fh, file_options=file_options)
+
     try:
-        sb.storage.from_(bucket).upload(path=key, file=data, file_options={"content-type": content_type, "upsert": True})
-    except Exception:
+        _with_backoff(
+            # string, not bool: storage3 forwards it as the x-upsert header and httpx
+            # rejects non-str header values (which used to force remove+reupload)
+            lambda: _put({"content-type": content_type, "upsert": "true", "cache-control": "3600"}),
+            f"upload {key}",
+        )
+    except Exception as e:
+        if _is_transient(e):
+            raise
         try:  # replace-and-retry path for immutable storage configs
-            sb.storage.from_(bucket).remove([key])
+            bucket_api.remove([key])
         except Exception:
             pass
-        sb.storage.from_(bucket).upload(path=key, file=data, file_options={"content-type": content_type})
+        _with_backoff(
+            lambda: _put({"content-type": content_type}),
+            f"re-upload {key}",
+        )
     try:
-        url = sb.storage.from_(bucket).get_public_url(key)
+        url = bucket_api.get_public_url(key)
     except Exception:
         url = ""
     return {"key": key, "public_url": url}
@@ -145,17 +311,133 @@ def _storage_upload_bytes(bucket: str, key: str, data: bytes, content_type="imag
 # ║ Tableau (TSC) utilities                                                    ║
 # ╚═══════════════════════════════════════════════════════════════════════════╝
 def _sign_in() -> Tuple[TSC.Server, TSC.TableauAuth]:
+    import tableauserverclient as TSC
     server = TSC.Server(TABLEAU_SERVER_URL, use_server_version=True)
+    # per-request cap so a stuck image render fails over instead of stalling the run
+    server.add_http_options({"timeout": TABLEAU_HTTP_TIMEOUT})
     auth = TSC.TableauAuth(TABLEAU_USERNAME, TABLEAU_PASSWORD, site_id=TABLEAU_SITE_ID)
     server.auth.sign_in(auth)
     return server, auth
 
-def _find_project_id(server: TSC.Server, project_name: Optional[str]) -> Optional[str]:
+_SESSION: Dict[str, object] = {"server": None, "auth": None, "expires_at": 0.0}
+_SESSION_LOCK = threading.Lock()
+_HOLDERS: Dict[int, int] = {}           # id(server) → runs currently using it
+_RETIRED: Dict[int, "TSC.Server"] = {}  # no longer handed out; signed out once unheld
+
+def _sign_out(server: "TSC.Server") -> None:
+    try:
+        server.auth.sign_out()
+    except Exception:
+        pass
+
+def _retire_locked(server: "TSC.Server") -> Optional["TSC.Server"]:
+    """Stop handing `server` out; returns it if nobody holds it (caller signs it out)."""
+    if _SESSION["server"] is server:
+        _SESSION.update(server=None, auth=None, expires_at=0.0)
+    if _HOLDERS.get(id(server)):
+        _RETIRED[id(server)] = server
+        return None
+    return server
+
+def _get_session() -> Tuple[TSC.Server, TSC.TableauAuth]:
+    """
+    Signed-in server shared across runs until TABLEAU_SESSION_TTL runs out.
+    Every call must be paired with _release_session(server).
+    """
+    stale = None
+    with _SESSION_LOCK:
+        if _SESSION["server"] is None or time.monotonic() >= _SESSION["expires_at"]:
+            if _SESSION["server"] is not None:
+                stale = _retire_locked(_SESSION["server"])
+            server, auth = _sign_in()
+            _SESSION.update(server=server, auth=auth, expires_at=time.monotonic() + TABLEAU_SESSION_TTL)
+        server, auth = _SESSION["server"], _SESSION["auth"]
+        _HOLDERS[id(server)] = _HOLDERS.get(id(server), 0) + 1
+    if stale is not None:
+        _sign_out(stale)
+    return server, auth
+
+def _release_session(server: TSC.Server) -> None:
+    """A run is done with `server`; a retired one is signed out by its last holder."""
+    with _SESSION_LOCK:
+        n = _HOLDERS.get(id(server), 0) - 1
+        if n > 0:
+            _HOLDERS[id(server)] = n
+            return
+        _HOLDERS.pop(id(server), None)
+        retired = _RETIRED.pop(id(server), None)
+    if retired is not None:
+        _sign_out(retired)
+
+def _drop_session(server: TSC.Server) -> None:
+    """
+    Forget `server` after an auth failure (expired/revoked token) so the next run
+    signs in again. Runs still holding it finish first; the last one signs it out.
+    """
+    with _SESSION_LOCK:
+        free = _retire_locked(server)
+    if free is not None:
+        _sign_out(free)
+
+def _is_auth_error(e: Exception) -> bool:
+    """401 / NotSignedInError from TSC: the cached token is no longer usable."""
+    if type(e).__name__ == "NotSignedInError":
+        return True
+    return str(getattr(e, "code", "")).startswith("401") or _err_status(e) == 401
+
+def _close_sessions() -> None:
+    with _SESSION_LOCK:
+        servers = list(_RETIRED.values())
+        if _SESSION["server"] is not None:
+            servers.append(_SESSION["server"])
+        _RETIRED.clear()
+        _SESSION.update(server=None, auth=None, expires_at=0.0)
+    for server in servers:
+        _sign_out(server)
+
+atexit.register(_close_sessions)
+
+_PROJ_CACHE: Dict[tuple, Tuple[float, list]] = {}
+_WB_CACHE: Dict[tuple, Tuple[float, list]] = {}
+_LIST_CACHE_LOCK = threading.Lock()
+
+def _cache_key(server: TSC.Server) -> tuple:
+    # not keyed on the auth token: a re-sign-in sees the same listing
+    return (getattr(server, "server_address", TABLEAU_SERVER_URL), TABLEAU_SITE_ID)
+
+def _cached_list(cache: Dict[tuple, Tuple[float, list]], key: tuple, loader, refresh: bool) -> list:
+    now = time.monotonic()
+    if not refresh:
+        with _LIST_CACHE_LOCK:
+            hit = cache.get(key)
+        if hit and now - hit[0] < TABLEAU_LIST_CACHE_TTL:
+            return hit[1]
+    items = loader()
+    with _LIST_CACHE_LOCK:
+        cache[key] = (now, items)
+    return items
+
+def _list_projects(server: TSC.Server, refresh: bool = False) -> list:
+    def _load():
+        projs, _ = server.projects.get()
+        return list(projs)
+    return _cached_list(_PROJ_CACHE, _cache_key(server), _load, refresh)
+
+def _list_workbooks(server: TSC.Server, refresh: bool = False) -> list:
+    def _load():
+        import tableauserverclient as TSC
+        try:
+            return list(TSC.Pager(server.workbooks))
+        except Exception:
+            wbs, _ = server.workbooks.get()
+            return list(wbs)
+    return _cached_list(_WB_CACHE, _cache_key(server), _load, refresh)
+
+def _find_project_id(server: TSC.Server, project_name: Optional[str], refresh: bool = False) -> Optional[str]:
     if not project_name:
         return None
     try:
-        projs, _ = server.projects.get()
-        for p in projs:
+        for p in _list_projects(server, refresh):
             if p.name.lower() == project_name.lower():
                 return p.id
     except Exception:
@@ -165,13 +447,11 @@ def _find_project_id(server: TSC.Server, project_name: Optional[str]) -> Optiona
 def _find_workbook(server: TSC.Server,
                    name: Optional[str],
                    slug: Optional[str],
-                   project_name: Optional[str]) -> Optional[TSC.WorkbookItem]:
-    desired_project_id = _find_project_id(server, project_name)
+                   project_name: Optional[str],
+                   refresh: bool = False) -> Optional[TSC.WorkbookItem]:
+    desired_project_id = _find_project_id(server, project_name, refresh)
 
-    try:
-        wbs = list(TSC.Pager(server.workbooks))
-    except Exception:
-        wbs, _ = server.workbooks.get()
+    wbs = _list_workbooks(server, refresh)
 
     if desired_project_id:
         wbs = [wb for wb in wbs if getattr(wb, "project_id", None) == desired_project_id]
@@ -179,18 +459,19 @@ def _find_workbook(server: TSC.Server,
     n_slug = _norm(slug or "")
     n_name = _norm(name or "")
 
-    if n_slug:
-        for wb in wbs:
-            if _norm(getattr(wb, "content_url", "")) == n_slug:
-                return wb
-    if n_name:
-        for wb in wbs:
-            if _norm(wb.name) == n_name:
-                return wb
-    if n_slug:
-        for wb in wbs:
-            if _norm(wb.name) == n_slug:
-                return wb
+    # normalize each workbook once; first occurrence wins (same as the old linear scans)
+    by_curl: Dict[str, TSC.WorkbookItem] = {}
+    by_name: Dict[str, TSC.WorkbookItem] = {}
+    for wb in wbs:
+        by_curl.setdefault(_norm(getattr(wb, "content_url", "")), wb)
+        by_name.setdefault(_norm(wb.name), wb)
+
+    if n_slug and n_slug in by_curl:
+        return by_curl[n_slug]
+    if n_name and n_name in by_name:
+        return by_name[n_name]
+    if n_slug and n_slug in by_name:
+        return by_name[n_slug]
     return None
 
 def _populate_workbook_views(server: TSC.Server, wb: TSC.WorkbookItem):
@@ -205,56 +486,157 @@ def _populate_workbook_views(server: TSC.Server, wb: TSC.WorkbookItem):
             pass
     _log("Warning: could not populate workbook views; proceeding anyway.")
 
-def _export_view_png(server: TSC.Server, v: TSC.ViewItem, out_path: Path) -> Tuple[int, int, bytes]:
+def _populate_image_hi(server: TSC.Server, v: TSC.ViewItem) -> Optional[bytes]:
+    import tableauserverclient as TSC
+    req = TSC.ImageRequestOptions(imageresolution=TSC.ImageRequestOptions.Resolution.High)
+    server.views.populate_image(v, req)
+    return getattr(v, "image", None)
+
+def _populate_preview(server: TSC.Server, v: TSC.ViewItem) -> Optional[bytes]:
+    server.views.populate_preview_image(v)
+    return getattr(v, "preview_image", None)
+
+def _populate_legacy(server: TSC.Server, v: TSC.ViewItem) -> Optional[bytes]:
+    server.views.populate(v)
+    return getattr(v, "image", None) or getattr(v, "preview_image", None)
+
+_EXPORT_STRATEGIES = (
+    # (views endpoint method, label, fn, is high-res)
+    ("populate_image",         "populate_image",         _populate_image_hi, True),
+    ("populate_preview_image", "populate_preview_image", _populate_preview,  False),
+    ("populate",               "legacy populate",        _populate_legacy,   False),
+)
+
+@lru_cache(maxsize=None)
+def _export_chain(views_cls: type, image_resolution: str) -> tuple:
+    """Strategies this TSC version actually has, best first (resolved once per version)."""
+    return tuple(
+        (label, fn) for meth, label, fn, hi_res in _EXPORT_STRATEGIES
+        if hasattr(views_cls, meth) and not (hi_res and image_resolution == "preview")
+    )
+
+@lru_cache(maxsize=1)
+def _export_fallback_errors() -> tuple:
+    """Errors that mean "try the next strategy"; anything else is a real failure."""
+    import tableauserverclient as TSC
+    errs = [TSC.ServerResponseError]
+    try:
+        import requests
+        errs.append(requests.exceptions.Timeout)   # high-res render too slow → thumbnail
+    except ImportError:
+        pass
+    return tuple(errs)
+
+def _export_view_png(server: TSC.Server, v: TSC.ViewItem, out_path: Path,
+                     image_resolution: Literal["high", "preview"] = "high") -> Tuple[int, int, bytes]:
     """
     Export a view image (prefer high-res) and write to out_path.
+    image_resolution="preview" skips the high-res request and goes straight to the
+    (much smaller) preview thumbnail.
     Returns (w, h, png_bytes).
     """
+    chain = _export_chain(type(server.views), image_resolution)
+    fallback_errors = _export_fallback_errors()
     img_bytes = None
-    try:
-        req = TSC.ImageRequestOptions(imageresolution=TSC.ImageRequestOptions.Resolution.High)
-        server.views.populate_image(v, req)
-        img_bytes = getattr(v, "image", None)
-        if img_bytes:
-            _log(f"Export via populate_image: {v.name}")
-    except Exception:
-        pass
-
-    if not img_bytes:
-        try:
-            server.views.populate_preview_image(v)
-            img_bytes = getattr(v, "preview_image", None)
-            if img_bytes:
-                _log(f"Export via populate_preview_image: {v.name}")
-        except Exception:
-            pass
-
-    if not img_bytes:
+    last_err: Optional[Exception] = None
+    for label, fn in chain:
         try:
-            server.views.populate(v)
-            img_bytes = getattr(v, "image", None) or getattr(v, "preview_image", None)
-            if img_bytes:
-                _log(f"Export via legacy populate: {v.name}")
-        except Exception:
-            pass
+            img_bytes = fn(server, v)
+        except fallback_errors as e:
+            last_err = e
+            continue
+        if img_bytes:
+            _log("Export via %s: %s", label, v.name)
+            break
 
     if not img_bytes:
-        raise RuntimeError("Could not obtain image for view (no supported populate method)")
+        raise RuntimeError(
+            "Could not obtain image for view "
+            f"({last_err if last_err else 'no supported populate method'})"
+        )
 
     out_path.write_bytes(img_bytes)
-    with Image.open(io.BytesIO(img_bytes)) as im:
-        w, h = int(im.width), int(im.height)
+    w, h = image_wh(img_bytes)
     return w, h, img_bytes
 
 
-def _db_insert(table: str, row: Dict) -> Dict:
-            if not sb:
-                return {"ok": False, "error": "no supabase client"}
-            try:
-                res = sb.table(table).insert(row).execute()
-                return {"ok": True, "data": getattr(res, "data", None)}
-            except Exception as e:
-                return {"ok": False, "error": str(e)}
+def _export_view_to_queue(server: TSC.Server, idx: int, v: TSC.ViewItem,
+                          widgets_local: Path, widgets_prefix: str, q: "queue.Queue",
+                          image_resolution: Literal["high", "preview"] = "high") -> None:
+    """
+    Producer: export one view → local file, then hand the bytes to the uploaders.
+    Runs on a worker thread; the signed-in `server` (one requests.Session) is shared.
+    """
+    title = v.name or f"View_{idx}"                 # preserve your working naming
+    base = f"{_sanitize(title)}_{idx:02d}.png"
+    local_path = widgets_local / base
+
+    w, h, png = _export_view_png(server, v, local_path, image_resolution)
+    digest = _sha256_hex(png)
+    del png
+
+    # only the path is queued; the uploader streams the PNG back from disk so
+    # queued/in-flight views don't each keep a copy of the bytes in memory
+    key = widgets_prefix + base    # widgetextractor/<session_folder>/widgets/<...>.png
+    q.put({"idx": idx, "view_id": v.id, "title": title, "key": key, "file": local_path,
+           "w": w, "h": h, "sha256": digest})
+
+def _uploader(q: "queue.Queue", results: List[Dict], lock: threading.Lock,
+              uploaded: Dict[str, str], cancel: Optional[threading.Event] = None) -> None:
+    """
+    Consumer: upload queued PNGs until a None sentinel arrives (`uploaded` is the
+    run's index). Once `cancel` is set, queued items are drained without uploading.
+    """
+    while True:
+        item = q.get()
+        if item is None:
+            return
+        if cancel is not None and cancel.is_set():
+            continue
+        try:
+            key = _uploaded_key(uploaded, lock, item["sha256"])
+            if key:
+                _log("Skip upload (unchanged image): %s -> %s", item["title"], key)
+            else:
+                key = _storage_upload_bytes(KDH_BUCKET, item["key"], item["file"])["key"]
+                _remember_upload(uploaded, lock, item["sha256"], key)
+            w, h = item["w"], item["h"]
+            with lock:
+                results.append({
+                    "idx": item["idx"],
+                    "exported": {"view_id": item["view_id"], "view_name": item["title"],
+                                 "path": key, "w": w, "h": h},
+                    "crop": {"path": key, "bbox": [0, 0, int(w), int(h)]},
+                })
+        except Exception as e:
+            _log(f"Failed uploading view '{item['title']}': {e}")
+
+
+def _db_insert(table: str, row: Union[Dict, List[Dict]]) -> Dict:
+    """Insert one row, or a list of rows as a single multi-row PostgREST request."""
+    sb = _get_sb()
+    if not sb:
+        return {"ok": False, "error": "no supabase client"}
+    if isinstance(row, list) and not row:
+        return {"ok": True, "data": []}
+    try:
+        res = sb.table(table).insert(row).execute()
+        return {"ok": True, "data": getattr(res, "data", None)}
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+
+def _db_insert_many(table: str, rows: List[Dict]) -> Dict:
+    return _db_insert(table, list(rows))
+
+def _store_full_screengrab(sb: "Client", full_key: str, full_bytes: bytes,
+                           screengrab_row: Dict) -> Tuple[Dict[str, str], str]:
+    """Steps 3–4: upload the full PNG, insert the screengrab row → (upload info, DB screengrab_id)."""
+    uploaded_full = _storage_upload_bytes(KDH_BUCKET, full_key, full_bytes)
+    #res = _db_insert(KDH_TABLE_SCREENGRABS, screengrab_row)
+    res = sb.table("kdh_screengrab_dim").insert(screengrab_row, returning="representation").execute()
+    if not res.data:
+        raise RuntimeError(f"Insert returned no data: {res.data}")
+    return uploaded_full, res.data[0]["screengrab_id"]
 
 # ╔═══════════════════════════════════════════════════════════════════════════╗
 # ║ PUBLIC ENTRY — mirrors Power BI flow                                      ║
@@ -268,14 +650,20 @@ def capture_tableau_api(
     workbook_slug: Optional[str] = None,  # content_url-ish
     project_name: Optional[str] = None,
     limit_views: Optional[int] = None,
+    refresh: bool = False,                # bypass the cached project/workbook listing
+    image_resolution: Literal["high", "preview"] = "high",   # "preview" = thumbnails only
+    cancel: Optional[threading.Event] = None,   # set by a caller that no longer wants the result
 ) -> Dict:
     """
     Capture full + widgets for a Tableau workbook via TSC with Power BI parity.
     Uses ONE session folder for the entire run (no internal timestamping).
+    A set `cancel` stops further uploads and skips the widget insert; the run
+    then returns with no exports.
     """
     # Basic config guards
     if not all([TABLEAU_SERVER_URL, TABLEAU_SITE_ID, TABLEAU_USERNAME, TABLEAU_PASSWORD]):
         raise RuntimeError("Tableau Cloud credentials are not configured.")
+    sb = _get_sb()
     if not sb:
         raise RuntimeError("Supabase client not initialized (check SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY).")
 
@@ -285,12 +673,13 @@ def capture_tableau_api(
 
     # Storage prefix mirrors Power BI's: widgetextractor/<session_folder>/...
     session_prefix = f"{KDH_FOLDER_ROOT}/{session_folder}"
+    widgets_prefix = f"{session_prefix}/widgets/"
 
     # ── Sign-in & resolve workbook ───────────────────────────────────────────
-    server, auth = _sign_in()
+    server, auth = _get_session()
     try:
         _log("Signed in. Looking for workbook...")
-        wb = _find_workbook(server, workbook_name, workbook_slug, project_name)
+        wb = _find_workbook(server, workbook_name, workbook_slug, project_name, refresh=refresh)
         if not wb:
             raise RuntimeError(
                 f"Workbook not found (name={workbook_name!r} slug={workbook_slug!r} project={project_name!r})"
@@ -318,10 +707,9 @@ def capture_tableau_api(
         full_fname_local = f"{wb_slug_eff}_full.png"  # ./screenshots/<session_folder>/<workbook_slug>_full.png
         full_local_path = base_local / full_fname_local
 
-        w0, h0, full_bytes = _export_view_png(server, v0, full_local_path)
+        w0, h0, full_bytes = _export_view_png(server, v0, full_local_path, image_resolution)
 
         full_key = f"{session_prefix}/{full_fname_local}"  # widgetextractor/<session_folder>/<workbook_slug>_full.png
-        uploaded_full = _storage_upload_bytes(KDH_BUCKET, full_key, full_bytes)
 
         # Build traceable URL (prefer raw content_url; fallback to slugified title)
         base_url = (TABLEAU_SERVER_URL or "").rstrip("/")
@@ -329,9 +717,7 @@ def capture_tableau_api(
         wb_content_url = getattr(wb, "content_url", None)
         wb_slug_raw = wb_content_url if wb_content_url else wb_slug_eff
         tableau_url = f"{base_url}/#/site/{site}/workbooks/{wb_slug_raw}" if site else f"{base_url}/#/workbooks/{wb_slug_raw}"
-        screengrab_id = str(uuid.uuid4())
-        ts = _nowstamp()
-        screengrab_id = str(uuid.uuid4())
+        screengrab_id = str(uuid.uuid4())       # client-side id; the DB-confirmed one replaces it below
         capture_session_id = str(uuid.uuid4())   # one per run; keep this if you want to query by session
         ts_utc = datetime.now(timezone.utc)      # timestamptz
 
@@ -346,60 +732,73 @@ def capture_tableau_api(
             "platform_confidence": 0.990,
             "screengrab_hashvalue": sg_hash,
             "storage_bucket": KDH_BUCKET,
-            "storage_path_full": uploaded_full.get("key", full_key),
+            "storage_path_full": full_key.lstrip("/"),
             "wrapper_host": "test",
             "user_id": None,
             "captured_at": ts_utc.isoformat(),
             }
         
-        #res = _db_insert(KDH_TABLE_SCREENGRABS, screengrab_row)
-        res = sb.table("kdh_screengrab_dim").insert(screengrab_row, returning="representation").execute()
-        '''
-        try:
-            res = (
-        sb.table("kdh_screengrab_dim")
-          .insert(screengrab_row)
-          .select("screengrab_id")
-          .single()
-                  .execute()
-                 )
-            if not getattr(res, "data", None) or not res.data.get("screengrab_id"):
-                raise RuntimeError(f"Insert returned no data: {getattr(res, 'data', None)}")
-        except Exception as e:
-            raise RuntimeError(f"Failed to insert screengrab row into kdh_screengrab_dim: {e}")
-        '''
-        if not res.data:
-            raise RuntimeError(f"Insert returned no data: {res.data}")
-            screengrab_id = res.data[0]["screengrab_id"]
+        def _cancelled_result() -> Dict:
+            _log("Run cancelled; skipping remaining uploads and the widget insert.")
+            return {"workbook": wb_title, "exported": [], "session_folder": session_folder,
+                    "session_prefix": session_prefix, "cancelled": True}
+
+        if cancel is not None and cancel.is_set():
+            return _cancelled_result()
+
+        # full upload + screengrab insert only gate Step 7, so they run alongside
+        # the widget exports instead of in front of them
+        results_lock = threading.Lock()
+        uploaded: Dict[str, str] = {}   # this run's sha256 → storage key index
+        full_ex = ThreadPoolExecutor(max_workers=1)
+        full_fut = full_ex.submit(_store_full_screengrab, sb, full_key, full_bytes, screengrab_row)
+        full_ex.shutdown(wait=False)
         # ╔═══════════════════════════════════════════════════════════════════╗
         # ║ Step 5–6: Widgets → local ./screenshots/<session>/widgets/*.png  ║
         # ╚═══════════════════════════════════════════════════════════════════╝
-        for idx, v in enumerate(views, start=1):
-            title = v.name or f"View_{idx}"                 # preserve your working naming
-            base = f"{_sanitize(title)}_{idx:02d}.png"
-            local_path = widgets_local / base
-
-            try:
-                w, h, png_bytes = _export_view_png(server, v, local_path)
-
-                key = f"{session_prefix}/widgets/{base}"    # widgetextractor/<session_folder>/widgets/<...>.png
-                _ = _storage_upload_bytes(KDH_BUCKET, key, png_bytes)
-
-                exported.append({
-                    "view_id": v.id,
-                    "view_name": title,
-                    "path": key,
-                    "w": w, "h": h
-                })
-                crops_payload.append({"path": key, "bbox": [0, 0, int(w), int(h)]})
-
-            except Exception as e:
-                _log(f"Failed exporting view '{title}': {e}")
+        results: List[Dict] = []
+        upload_q: "queue.Queue" = queue.Queue(maxsize=UPLOAD_QUEUE_MAX)
+        uploaders = [
+            threading.Thread(target=_uploader, args=(upload_q, results, results_lock, uploaded, cancel),
+                             daemon=True)
+            for _ in range(max(1, TABLEAU_UPLOAD_WORKERS))
+        ]
+        for t in uploaders:
+            t.start()
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, min(TABLEAU_EXPORT_WORKERS, len(views)))) as ex:
+                futs = {
+                    ex.submit(_export_view_to_queue, server, idx, v, widgets_local, widgets_prefix, upload_q,
+                              image_resolution):
+                        (v.name or f"View_{idx}")
+                    for idx, v in enumerate(views, start=1)
+                }
+                for fut in as_completed(futs):
+                    try:
+                        fut.result()
+                    except Exception as e:
+                        _log(f"Failed exporting view '{futs[fut]}': {e}")
+        finally:
+            for _ in uploaders:
+                upload_q.put(None)
+            for t in uploaders:
+                t.join()
+
+        if cancel is not None and cancel.is_set():
+            return _cancelled_result()
+
+        uploaded_full, screengrab_id = full_fut.result()
+
+        # keep workbook view order regardless of completion order
+        for r in sorted(results, key=lambda r: r["idx"]):
+            exported.append(r["exported"])
+            crops_payload.append(r["crop"])
 
         # ╔═══════════════════════════════════════════════════════════════════╗
         # ║ Step 7: Insert widgets with FK to screengrab_id                  ║
         # ╚═══════════════════════════════════════════════════════════════════╝
         if crops_payload:
+            # one bulk PostgREST insert for all widget rows (see persist.insert_widgets)
             insert_widgets(
                 sb=sb,
                 screengrab_id=screengrab_id,               # REAL FK from Step 4
@@ -415,10 +814,13 @@ def capture_tableau_api(
             "full_local_path": str(full_local_path),
             "full_storage_key": uploaded_full.get("key", full_key),
             "screengrab_id": screengrab_id,
+            "capture_session_id": capture_session_id,   # correlate runs without a DB lookup
         }
 
+    except Exception as e:
+        # the shared session stays up for other runs unless its token is dead
+        if _is_auth_error(e):
+            _drop_session(server)
+        raise
     finally:
-        try:
-            server.auth.sign_out()
-        except Exception:
-            pass
+        _release_session(server)
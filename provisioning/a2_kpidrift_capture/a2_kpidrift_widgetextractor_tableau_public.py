@@ -1,12 +1,18 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
-import os, io, base64, re
+import os, base64, re, threading, time, urllib.request
+from urllib.parse import urlparse, unquote
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
-from PIL import Image
-from playwright.sync_api import sync_playwright, TimeoutError as PWTimeout
+from provisioning.a2_kpidrift_capture.a2_kpidrift_engine import (
+    BROWSER_POOL, BROWSER_THREAD_PREFIX, SCREENSHOT_SCALE,
+)
+from provisioning.a2_kpidrift_capture.a2_kpidrift_persist import image_wh  # PNG/JPEG header read
 from provisioning.a2_kpidrift_capture.a2_kpidrift_quality import (
     score_widget, append_quality_suffix
 )
@@ -22,15 +28,19 @@ def _ensure_dir(p: Path) -> Path:
     p.mkdir(parents=True, exist_ok=True)
     return p
 
+_RE_BAD = re.compile(r"[^\w\-. ]+")
+_RE_WS  = re.compile(r"\s+")
+
+@lru_cache(maxsize=1024)
 def _sanitize(s: str, max_len: int = 120) -> str:
     s = (s or "").strip()
-    s = re.sub(r"[^\w\-. ]+", "_", s)
-    s = re.sub(r"\s+", "_", s)
+    s = _RE_BAD.sub("_", s)
+    s = _RE_WS.sub("_", s)
     return (s[:max_len] or "untitled").rstrip("._-")
 
+@lru_cache(maxsize=1024)
 def _best_report_name_from_url(url: str) -> str:
     try:
-        from urllib.parse import urlparse, unquote
         p = urlparse(url or "")
         segs = [s for s in (p.path or "").split("/") if s]
         if segs:
@@ -39,6 +49,108 @@ def _best_report_name_from_url(url: str) -> str:
         pass
     return "tableau_report"
 
+# Widget assets stay PNG by default: the value extractor and the `_good.png`
+# filters downstream expect it. KDH_TABLEAU_SHOT_FORMAT=jpeg trades that for speed.
+SHOT_FORMAT  = (os.getenv("KDH_TABLEAU_SHOT_FORMAT") or "png").lower()
+SHOT_QUALITY = int(os.getenv("KDH_TABLEAU_SHOT_QUALITY", "85"))
+
+# URLs captured in parallel by extract_tableau_public_batch: the size of its one
+# worker pool, and so the number of Chromiums it keeps warm (one per worker thread)
+BATCH_CONCURRENCY = int(os.getenv("KDH_TABLEAU_CONCURRENCY", "3"))
+# Threads writing widget files (shared by all extractions)
+IO_WORKERS = int(os.getenv("KDH_TABLEAU_IO_WORKERS", "8"))
+
+def _shot_ext() -> str:
+    return "jpg" if SHOT_FORMAT in ("jpg", "jpeg") else "png"
+
+# Lossless PNG re-compression before storing (pip install pyoxipng); off by default
+OPTIMIZE_PNG = os.getenv("KDH_OPTIMIZE_PNG", "0").lower() in ("1", "true", "yes")
+
+try:
+    import oxipng  # optional (pyoxipng)
+except ImportError:
+    oxipng = None
+
+def _optimize_png(b: bytes) -> bytes:
+    """oxipng -o 2 with safe chunk stripping; returns the input if disabled/unavailable/failed."""
+    if not OPTIMIZE_PNG or oxipng is None or b[:8] != b"\x89PNG\r\n\x1a\n":
+        return b
+    try:
+        out = oxipng.optimize_from_memory(b, level=2, strip=oxipng.StripChunks.safe())
+        return out if len(out) < len(b) else b
+    except Exception:
+        return b
+
+def _cdp_shot(ctx, page, clip: Optional[Dict] = None) -> bytes:
+    """
+    Page.captureScreenshot over a raw CDP session with optimizeForSpeed (fast
+    zlib level for PNG, or JPEG). `clip` is a viewport-relative bounding box.
+    """
+    params: Dict = {"optimizeForSpeed": True}
+    if _shot_ext() == "jpg":
+        params.update({"format": "jpeg", "quality": SHOT_QUALITY})
+    else:
+        params["format"] = "png"
+    if clip:
+        # CDP clips are in document coordinates; bounding_box() is viewport-relative
+        sx, sy = page.evaluate("() => [window.scrollX, window.scrollY]")
+        params["clip"] = {"x": clip["x"] + sx, "y": clip["y"] + sy,
+                          "width": clip["width"], "height": clip["height"], "scale": 1}
+    cdp = ctx.new_cdp_session(page)
+    try:
+        return base64.b64decode(cdp.send("Page.captureScreenshot", params)["data"])
+    finally:
+        try:
+            cdp.detach()
+        except Exception:
+            pass
+
+# tableau-2.min.js (~300 KB) is fetched once per process and served to every
+# wrapper page from memory via page.route; refreshed after TABLEAU_JS_TTL seconds.
+TABLEAU_JS_URL = "https://public.tableau.com/javascripts/api/tableau-2.min.js"
+TABLEAU_JS_TTL = float(os.getenv("KDH_TABLEAU_JS_TTL", str(24 * 3600)))
+_JS_CACHE: Dict[str, Tuple[float, bytes]] = {}
+_JS_LOCK = threading.Lock()
+
+def _tableau_js() -> Optional[bytes]:
+    """
+    Cached JS API bytes; a stale copy beats none if the refresh fails. The fetch
+    runs outside the lock, so a slow refresh never blocks readers of the cache
+    (two threads may both refetch an expired copy; the later one wins).
+    """
+    with _JS_LOCK:
+        hit = _JS_CACHE.get(TABLEAU_JS_URL)
+    if hit and time.monotonic() - hit[0] < TABLEAU_JS_TTL:
+        return hit[1]
+    try:
+        with urllib.request.urlopen(TABLEAU_JS_URL, timeout=15) as resp:
+            body = resp.read()
+    except Exception:
+        return hit[1] if hit else None
+    with _JS_LOCK:
+        _JS_CACHE[TABLEAU_JS_URL] = (time.monotonic(), body)
+    return body
+
+def _route_cached_js(page) -> None:
+    js = _tableau_js()
+    if not js:
+        return  # let the page fetch it normally
+    page.route("**/javascripts/api/tableau-2.min.js",
+               lambda route: route.fulfill(status=200, body=js, content_type="application/javascript"))
+
+# Fonts and audio/video never reach our captures (getImageAsync renders server
+# side; the fallback shot only needs the viz canvas), so they are aborted. The
+# URL pattern keeps every other request off the Python route handler.
+BLOCK_ASSETS = os.getenv("KDH_TABLEAU_BLOCK_ASSETS", "1").lower() in ("1", "true", "yes")
+_RE_HEAVY_ASSET = re.compile(r"\.(woff2?|ttf|otf|eot|mp4|webm|m4a|mp3|ogg|wav)(\?|#|$)", re.I)
+
+def _route_block_assets(page) -> None:
+    if not BLOCK_ASSETS:
+        return
+    page.route(_RE_HEAVY_ASSET,
+               lambda route: route.abort() if route.request.resource_type in ("font", "media")
+               else route.fallback())
+
 # Simple wrapper to load Tableau JS API and call ws.getImageAsync()
 _WRAPPER_HTML = """<!DOCTYPE html>
 <html>
@@ -67,50 +179,70 @@ window.__initViz = function(vizUrl, opts){
 """
 
 # ───────── public extractor (Power BI–style paths) ─────────
-def extract_tableau_public(
+def _extract_tableau_public(
     url: str,
     session_folder: Optional[str] = None,
     viewport: Tuple[int,int] = (1920,1080),
-    scale: float = 2.0,
+    scale: float = SCREENSHOT_SCALE,
     max_widgets: int = 80,
+    save_local: bool = True,
+    cancel: Optional[threading.Event] = None,
 ) -> Dict:
-    """
-    Writes to:
-      screenshots/tableau_<YYYYMMDDTHHMMSSZ>/widgets/
-        tableau_<workbook>_<view>_<NN>[_good|_junk].png
-
-    Returns:
-      {
-        "workbook": "<wb title>",
-        "exported": [
-          {"view_name","path","local_path","w","h"}, ...
-        ],
-        "session_prefix": "tableau_<YYYYMMDDTHHMMSSZ>"
-      }
-    """
+    """Uncached extraction (see extract_tableau_public)."""
     ts = _nowstamp_z()
     session_prefix = session_folder or f"tableau_{ts}"  # mirror powerbi_<ts>
 
-    base_dir    = _ensure_dir(Path("screenshots") / session_prefix)
-    widgets_dir = _ensure_dir(base_dir / "widgets")
+    widgets_dir = _ensure_dir(Path("screenshots") / session_prefix / "widgets") if save_local else None
     exported: List[Dict] = []
+    pending_writes: List = []
+    key_prefix = f"{session_prefix}/widgets/"
+
+    def _cancelled() -> bool:
+        return cancel is not None and cancel.is_set()
 
-    with sync_playwright() as pw:
-        browser = pw.chromium.launch(headless=True)
-        ctx = browser.new_context(
-            viewport={"width": viewport[0], "height": viewport[1]},
-            device_scale_factor=scale
-        )
+    def _emit(view_name: str, fname: str, img: bytes, w: int, h: int) -> None:
+        if _cancelled():
+            return
+        item = {"view_name": view_name, "path": key_prefix + fname, "w": w, "h": h}
+        img = _optimize_png(img)
+        if save_local:
+            out_path = widgets_dir / fname
+            # file writes overlap with decoding/scoring the next panel
+            pending_writes.append(_io_pool().submit(out_path.write_bytes, img))
+            item["local_path"] = str(out_path)
+        else:
+            item["local_path"] = None
+            item["bytes"] = img
+        exported.append(item)
+
+    # Chromium is launched once per thread and reused (engine.BROWSER_POOL);
+    # each extraction only pays for a fresh context, closed on exit.
+    with BROWSER_POOL.context(viewport=viewport, scale=scale) as ctx:
         page = ctx.new_page()
 
         # Try JS API path first (per-worksheet images)
         workbook_name = None
         js_panels: List[Dict] = []
         try:
+            _route_block_assets(page)
+            _route_cached_js(page)
             page.set_content(_WRAPPER_HTML, wait_until="domcontentloaded")
             page.evaluate("""async (vizUrl) => { window.__viz = await window.__initViz(vizUrl, {}); }""", url)
 
-            result = page.evaluate("""async () => {
+            result = page.evaluate("""async (opts) => {
+                // getImageAsync always yields a PNG data URL; for JPEG, re-encode in the
+                // page so ~1/4 of the bytes cross the CDP socket and get base64-decoded
+                const toJpeg = async (dataUrl) => {
+                    const img = new Image();
+                    img.src = dataUrl;
+                    await img.decode();
+                    const c = document.createElement('canvas');
+                    c.width = img.naturalWidth; c.height = img.naturalHeight;
+                    const g = c.getContext('2d');
+                    g.fillStyle = '#fff'; g.fillRect(0, 0, c.width, c.height);  // no alpha in JPEG
+                    g.drawImage(img, 0, 0);
+                    return c.toDataURL('image/jpeg', opts.quality);
+                };
                 try{
                     const viz = window.__viz;
                     const wb  = viz.getWorkbook();
@@ -120,22 +252,24 @@ def extract_tableau_public(
                     const sheets = (active.getSheetType && active.getSheetType() === 'dashboard')
                         ? active.getWorksheets()
                         : [active];
-                    const out = [];
-                    for (const ws of sheets){
-                        const name = (ws.getName && ws.getName()) || 'Worksheet';
-                        const dataUrl = await ws.getImageAsync(); // data:image/png;base64,...
-                        out.push({name, dataUrl});
-                    }
+                    // render all worksheets concurrently; order follows `sheets`
+                    const out = await Promise.all(sheets.slice(0, opts.max).map(async (ws) => {
+                        const png = await ws.getImageAsync(); // data:image/png;base64,...
+                        return {
+                            name: (ws.getName && ws.getName()) || 'Worksheet',
+                            dataUrl: opts.jpeg ? await toJpeg(png) : png,
+                        };
+                    }));
                     return {reportName, panels: out};
                 }catch(e){ return {error:String(e)}; }
-            }""")
+            }""", {"jpeg": _shot_ext() == "jpg", "quality": SHOT_QUALITY / 100.0, "max": max_widgets})
 
             if result and not result.get("error"):
                 workbook_name = (result.get("reportName") or "").strip() or None
                 for p in (result.get("panels") or [])[:max_widgets]:
                     dn = p.get("dataUrl") or ""
                     nm = (p.get("name") or "Worksheet").strip() or "Worksheet"
-                    if dn.startswith("data:image/png;base64,"):
+                    if dn.startswith(("data:image/png;base64,", "data:image/jpeg;base64,")):
                         b64 = dn.split(",", 1)[1]
                         png_bytes = base64.b64decode(b64)
                         js_panels.append({"name": nm, "bytes": png_bytes})
@@ -145,45 +279,33 @@ def extract_tableau_public(
         # If JS API succeeded, export all worksheet images
         if js_panels:
             wb = workbook_name or _best_report_name_from_url(url)
-            wb_safe = _sanitize(wb)
+            name_prefix = f"tableau_{_sanitize(wb)}_"
+            ext = _shot_ext()
             for idx, panel in enumerate(js_panels, start=1):
                 title = panel["name"] or f"Worksheet_{idx}"
-                fname_base = f"tableau_{wb_safe}_{_sanitize(title)}_{idx:02d}.png"
+                fname_base = f"{name_prefix}{_sanitize(title)}_{idx:02d}.{ext}"
 
                 png_bytes = panel["bytes"]
                 try:
-                    with Image.open(io.BytesIO(png_bytes)) as im:
-                        w, h = im.size
+                    w, h = image_wh(png_bytes)
                 except Exception:
                     w, h = (1200, 800)
 
                 q = score_widget("tableau_jsapi", (0,0,w,h), title_present=True)
                 fname = append_quality_suffix(fname_base, q["quality"])
+                _emit(title, fname, png_bytes, w, h)
 
-                out_path = widgets_dir / fname
-                out_path.write_bytes(png_bytes)
-
-                exported.append({
-                    "view_name": title,
-                    "path": f"{session_prefix}/widgets/{fname}",
-                    "local_path": str(out_path),
-                    "w": w, "h": h
-                })
+            return _finish(wb, exported, pending_writes, session_prefix, _cancelled())
 
-            ctx.close(); browser.close()
-            return {
-                "workbook": wb,
-                "exported": exported,
-                "session_prefix": session_prefix,
-            }
+        if _cancelled():
+            return _finish(workbook_name or _best_report_name_from_url(url), exported, pending_writes,
+                           session_prefix, True)
 
         # ── Fallback: screenshot the embedded iframe (single widget) ──
         try:
-            page.goto(url, wait_until="domcontentloaded", timeout=60_000)
-            try:
-                page.wait_for_load_state("networkidle", timeout=6_000)
-            except PWTimeout:
-                pass
+            # return on commit, no networkidle wait: Tableau's telemetry keeps the
+            # network busy, and the selector wait below is the real readiness signal
+            page.goto(url, wait_until="commit", timeout=20_000)
 
             OUTER_SELECTORS = [
                 "iframe[src*='public.tableau.com']",
@@ -191,46 +313,160 @@ def extract_tableau_public(
                 ".tableauPlaceholder",
                 "[aria-label*='Tableau']",
             ]
+            # one wait on the union (worst case 8s from commit), then keep
+            # the highest-priority match; .tableauPlaceholder usually wraps the iframe,
+            # so plain document order would pick the outer div
             el = None
-            for sel in OUTER_SELECTORS:
-                try:
-                    page.locator(sel).first.wait_for(state="visible", timeout=4000)
-                    el = page.locator(sel).first
-                    break
-                except Exception:
-                    continue
+            try:
+                page.locator(", ".join(OUTER_SELECTORS)).first.wait_for(state="visible", timeout=8000)
+                for sel in OUTER_SELECTORS:
+                    loc = page.locator(sel).first
+                    if loc.is_visible():
+                        el = loc
+                        break
+            except Exception:
+                pass
 
             wb = workbook_name or _best_report_name_from_url(url)
             wb_safe = _sanitize(wb)
 
             if el is not None:
-                png_bytes = el.screenshot(type="png")
                 try:
-                    with Image.open(io.BytesIO(png_bytes)) as im:
-                        w, h = im.size
+                    el.scroll_into_view_if_needed(timeout=2000)
+                    box = el.bounding_box()
+                    if not box:
+                        raise RuntimeError("element has no box")
+                    png_bytes = _cdp_shot(ctx, page, box)
+                except Exception:
+                    png_bytes = el.screenshot(type="jpeg" if _shot_ext() == "jpg" else "png")
+                try:
+                    w, h = image_wh(png_bytes)
                 except Exception:
                     w, h = (1600, 900)
 
-                fname_base = f"tableau_{wb_safe}_Widget_01.png"
+                fname_base = f"tableau_{wb_safe}_Widget_01.{_shot_ext()}"
                 q = score_widget("tableau", (0,0,w,h), title_present=False)
                 fname = append_quality_suffix(fname_base, q["quality"])
-
-                out_path = widgets_dir / fname
-                out_path.write_bytes(png_bytes)
-
-                exported.append({
-                    "view_name": "Widget",
-                    "path": f"{session_prefix}/widgets/{fname}",
-                    "local_path": str(out_path),
-                    "w": w, "h": h
-                })
+                _emit("Widget", fname, png_bytes, w, h)
         except Exception:
             pass
-        finally:
-            ctx.close(); browser.close()
 
+    return _finish(workbook_name or _best_report_name_from_url(url), exported, pending_writes,
+                   session_prefix, _cancelled())
+
+def _finish(workbook: str, exported: List[Dict], pending_writes: List, session_prefix: str,
+            cancelled: bool) -> Dict:
+    """Wait for the file writes; a cancelled run deletes what it wrote and exports nothing."""
+    for f in pending_writes:
+        f.result()
+    if cancelled:
+        for e in exported:
+            if e.get("local_path"):
+                Path(e["local_path"]).unlink(missing_ok=True)
+        exported = []
     return {
-        "workbook": workbook_name or _best_report_name_from_url(url),
+        "workbook": workbook,
         "exported": exported,
         "session_prefix": session_prefix,
+        **({"cancelled": True} if cancelled else {}),
     }
+
+
+# ───────── result cache ─────────
+# Re-extracting the same URL seconds later yields the same images; serve the
+# previous result instead of driving Chromium again. Only local-file results are
+# cached (in-memory ones carry every image's bytes), keyed on the session folder
+# too since the returned paths point into it.
+EXTRACT_TTL = float(os.getenv("KDH_EXTRACT_TTL", "300"))
+EXTRACT_CACHE_MAX = 128
+_EXTRACT_CACHE: "OrderedDict[tuple, Tuple[float, Dict]]" = OrderedDict()
+_EXTRACT_LOCK = threading.Lock()
+
+def extract_tableau_public(
+    url: str,
+    session_folder: Optional[str] = None,
+    viewport: Tuple[int,int] = (1920,1080),
+    scale: float = SCREENSHOT_SCALE,
+    max_widgets: int = 80,
+    save_local: bool = True,
+    force_refresh: bool = False,
+    cancel: Optional[threading.Event] = None,
+) -> Dict:
+    """
+    force_refresh=True bypasses the short-lived per-URL result cache (KDH_EXTRACT_TTL s).
+    Setting `cancel` stops a running extraction before its next write; it then
+    removes the files it already wrote and returns no exports.
+    save_local=False keeps every image in memory: nothing is written under
+    screenshots/, each exported item carries "bytes" and "local_path" is None.
+
+    Writes to:
+      screenshots/tableau_<YYYYMMDDTHHMMSSZ>/widgets/
+        tableau_<workbook>_<view>_<NN>[_good|_junk].png   (.jpg when KDH_TABLEAU_SHOT_FORMAT=jpeg)
+
+    Returns:
+      {
+        "workbook": "<wb title>",
+        "exported": [
+          {"view_name","path","local_path","w","h"}, ...
+        ],
+        "session_prefix": "tableau_<YYYYMMDDTHHMMSSZ>"
+      }
+    """
+    key = (url, session_folder, tuple(viewport), scale, max_widgets)
+    cacheable = save_local and EXTRACT_TTL > 0
+    if cacheable and not force_refresh:
+        with _EXTRACT_LOCK:
+            hit = _EXTRACT_CACHE.get(key)
+        if (hit and time.monotonic() - hit[0] < EXTRACT_TTL
+                and all(os.path.exists(e["local_path"]) for e in hit[1]["exported"])):
+            return {**hit[1], "exported": [dict(e) for e in hit[1]["exported"]]}
+
+    res = _extract_tableau_public(url, session_folder=session_folder, viewport=viewport, scale=scale,
+                                  max_widgets=max_widgets, save_local=save_local, cancel=cancel)
+
+    if cacheable and res.get("exported"):
+        with _EXTRACT_LOCK:
+            _EXTRACT_CACHE[key] = (time.monotonic(), {**res, "exported": [dict(e) for e in res["exported"]]})
+            _EXTRACT_CACHE.move_to_end(key)
+            while len(_EXTRACT_CACHE) > EXTRACT_CACHE_MAX:
+                _EXTRACT_CACHE.popitem(last=False)
+    return res
+
+@lru_cache(maxsize=1)
+def _io_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="kdh-tableau-io")
+
+@lru_cache(maxsize=1)
+def _batch_executor() -> ThreadPoolExecutor:
+    # one fixed-size pool for every batch; its long-lived workers count as browser
+    # threads (name prefix), so each keeps one pooled Chromium between batches
+    return ThreadPoolExecutor(max_workers=max(1, BATCH_CONCURRENCY),
+                              thread_name_prefix=f"{BROWSER_THREAD_PREFIX}-tableau-public")
+
+def extract_tableau_public_batch(
+    urls: List[str],
+    concurrency: Optional[int] = None,
+    session_folder: Optional[str] = None,
+    viewport: Tuple[int,int] = (1920,1080),
+    scale: float = SCREENSHOT_SCALE,
+    max_widgets: int = 80,
+    save_local: bool = True,
+) -> List[Dict]:
+    """
+    Run extract_tableau_public over many URLs on the shared batch pool
+    (KDH_TABLEAU_CONCURRENCY workers; `concurrency` can only lower that for this
+    call). Sync Playwright objects are thread-bound, so each worker reuses its own
+    pooled browser and opens one context per URL. Results come back in `urls`
+    order; a failed URL yields {"url", "error"} instead of raising.
+    """
+    slots = threading.BoundedSemaphore(max(1, min(concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY)))
+
+    def _one(u: str) -> Dict:
+        try:
+            with slots:
+                return extract_tableau_public(u, session_folder=session_folder, viewport=viewport,
+                                              scale=scale, max_widgets=max_widgets, save_local=save_local)
+        except Exception as e:
+            return {"url": u, "error": str(e), "exported": []}
+
+    return list(_batch_executor().map(_one, urls))
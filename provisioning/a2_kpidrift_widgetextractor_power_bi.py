@@ -1,20 +1,32 @@
 # provisioning/a2_kpidrift_widgetextractor_power_bi.py
 from __future__ import annotations
 
-import os, re, json, uuid
+import io, logging, os, re, string, uuid
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
-from playwright.sync_api import sync_playwright, TimeoutError as PWTimeout, Error as PWError
+from PIL import Image
+try:  # numpy ships with streamlit/pandas; scalar fallback in _dedupe_candidates
+    import numpy as np
+except ImportError:
+    np = None
 from supabase import create_client, Client
 from provisioning.bootstrap import ensure_playwright_ready  # no call at import time
+# playwright (and the engine's BROWSER_POOL, which pulls it in) is imported inside
+# extract(): pages that only import this module don't pay for it
+from provisioning.a2_kpidrift_capture.a2_kpidrift_persist import sha256_hex
 
 # Quality helpers (shared)
 from provisioning.a2_kpidrift_capture.a2_kpidrift_quality import (
     MIN_W, MIN_H, QUALITY_THRESHOLD,
-    score_widget, append_quality_suffix,
+    score_widget, append_quality_suffix, iou_matrix,
 )
 
+logger = logging.getLogger(__name__)
+
 # ── Config & Secrets ─────────────────────────────────────────────────────────
 def _sget(*keys, default=None):
     for k in keys:
@@ -42,10 +54,49 @@ KDH_FOLDER_ROOT        = _sget("KDH_FOLDER_ROOT", default="widgetextractor")
 KDH_TABLE_SCREENGRABS  = _sget("KDH_TABLE_SCREENGRABS", default="kdh_screengrab_dim")
 KDH_TABLE_WIDGETS      = _sget("KDH_TABLE_WIDGETS", default="kdh_widget_dim")
 
+# Concurrent widget uploads; capped so a run can't exhaust Supabase connections
+PBI_UPLOAD_WORKERS     = int(_sget("KDH_PBI_UPLOAD_WORKERS", default="10"))
+
+# Device scale when the caller doesn't pass one (see engine.SCREENSHOT_SCALE)
+SCREENSHOT_SCALE       = float(_sget("KDH_SCREENSHOT_SCALE", default="1"))
+
+# Tallest viewport used for the full-page shot (CSS px); longer pages are cut off
+FULL_SHOT_MAX_H        = 8000
+
+# Images are uploaded straight from memory; local copies under ./screenshots are
+# only written for debugging (KDH_KEEP_LOCAL=1)
+KEEP_LOCAL             = str(_sget("KDH_KEEP_LOCAL", default="0")).lower() in ("1", "true", "yes")
+
+def _tuned_http_client():
+    """
+    httpx client kept alive for the whole process, pooled for the parallel widget
+    uploads (no fresh TCP+TLS per call). None → supabase-py's default client.
+    """
+    try:
+        import httpx
+    except ImportError:
+        return None
+    return httpx.Client(
+        limits=httpx.Limits(max_connections=2 * PBI_UPLOAD_WORKERS,
+                            max_keepalive_connections=PBI_UPLOAD_WORKERS, keepalive_expiry=30),
+        timeout=httpx.Timeout(30.0, connect=10.0),
+        follow_redirects=True,
+    )
+
+def _create_sb() -> Client:
+    http_client = _tuned_http_client()
+    if http_client is not None:
+        try:
+            from supabase import ClientOptions
+            return create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(httpx_client=http_client))
+        except TypeError:
+            http_client.close()   # supabase-py without httpx_client injection
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
+
 sb: Optional[Client] = None
 if SUPABASE_URL and SUPABASE_KEY:
     try:
-        sb = create_client(SUPABASE_URL, SUPABASE_KEY)
+        sb = _create_sb()
     except Exception:
         sb = None
 
@@ -58,10 +109,21 @@ def _ensure_outdir(p: Path) -> Path:
     p.mkdir(parents=True, exist_ok=True)
     return p
 
+# ASCII chars outside [\w\-. ] -> NUL; runs of NUL then collapse to one "_",
+# which is what re.sub(r"[^\w\-. ]+", "_") does, minus the regex engine
+_SAFE_CHARS = frozenset(string.ascii_letters + string.digits + "_-. ")
+_UNSAFE_TRANS = str.maketrans({chr(i): "\0" for i in range(128) if chr(i) not in _SAFE_CHARS})
+
 def _sanitize_filename(s: str, max_len: int = 120) -> str:
     s = (s or "").strip()
-    s = re.sub(r"[^\w\-. ]+", "_", s)
-    s = re.sub(r"\s+", "_", s)
+    if s.isascii():
+        s = s.translate(_UNSAFE_TRANS)
+        while "\0\0" in s:
+            s = s.replace("\0\0", "\0")
+        s = "_".join(s.replace("\0", "_").split())   # only spaces are left as whitespace
+    else:  # unicode \w / \s semantics
+        s = re.sub(r"[^\w\-. ]+", "_", s)
+        s = re.sub(r"\s+", "_", s)
     return (s[:max_len] or "untitled").rstrip("._-")
 
 def _slugify(s: str) -> str:
@@ -73,7 +135,7 @@ def _storage_upload_bytes(bucket: str, key: str, data: bytes, content_type="imag
         return {"key": "", "public_url": ""}
     key = key.lstrip("/")
     try:
-        sb.storage.from_(bucket).upload(path=key, file=data, file_options={"content-type": content_type, "upsert": True})
+        sb.storage.from_(bucket).upload(path=key, file=data, file_options={"content-type": content_type, "upsert": "true", "cache-control": "3600"})
     except Exception:
         try:
             sb.storage.from_(bucket).remove([key])
@@ -86,6 +148,13 @@ def _storage_upload_bytes(bucket: str, key: str, data: bytes, content_type="imag
         url = ""
     return {"key": key, "public_url": url}
 
+def _upload_widget(key: str, data: bytes, widget_row: Dict) -> Dict:
+    """Upload one widget PNG and fill the row's storage fields (inserted later, in bulk)."""
+    uploaded_w = _storage_upload_bytes(KDH_BUCKET, key, data)
+    widget_row["storage_path_widget"] = uploaded_w.get("key", "")
+    widget_row["public_url_widget"] = uploaded_w.get("public_url", "")
+    return widget_row
+
 def _db_insert(table: str, row: Dict) -> Dict:
     if not sb:
         return {"ok": False, "error": "no supabase client"}
@@ -95,23 +164,67 @@ def _db_insert(table: str, row: Dict) -> Dict:
     except Exception as e:
         return {"ok": False, "error": str(e)}
 
+def _find_screengrab_by_hash(hashvalue: str) -> Optional[Dict]:
+    """
+    The screengrab row holding these exact full-page bytes, if any. The table is
+    unique on the hash, so a re-capture must reuse it. Lookup errors → None, logged.
+    """
+    if not sb:
+        return None
+    try:
+        res = (sb.table(KDH_TABLE_SCREENGRABS)
+                 .select("screengrab_id, url, storage_path_full, public_url_full")
+                 .eq("screengrab_hashvalue", hashvalue)
+                 .limit(1).execute())
+        return (res.data or [None])[0]
+    except Exception as e:
+        logger.warning("screengrab hash lookup failed: %s", e)
+        return None
+
+DB_INSERT_CHUNK = 500   # rows per PostgREST request; keeps payloads bounded
+
+def _db_insert_many(table: str, rows: List[Dict]) -> Dict:
+    """
+    Rows in as few PostgREST requests as possible (one per DB_INSERT_CHUNK rows).
+    A failed chunk is reported without dropping the chunks after it.
+    """
+    if not rows:
+        return {"ok": True, "data": []}
+    if not sb:
+        return {"ok": False, "error": "no supabase client"}
+    data, errors = [], []
+    for i in range(0, len(rows), DB_INSERT_CHUNK):
+        try:
+            res = sb.table(table).insert(rows[i:i + DB_INSERT_CHUNK]).execute()
+            data.extend(getattr(res, "data", None) or [])
+        except Exception as e:
+            errors.append(str(e))
+    if errors:
+        return {"ok": False, "error": "; ".join(errors), "data": data}
+    return {"ok": True, "data": data}
+
 # ── Power BI specific helpers ────────────────────────────────────────────────
+VISUAL_SELECTORS = ".visualContainer, .visualContainerHost, [role='figure']"  # "report is interactive"
 _BAD_EXACT = {
     "microsoft power bi","power bi","view report","report","dashboard","sign in",
     "home","sheet","show filters","navigating to visual","use ctrl","press ctrl",
     "press enter","skip to report","skip to main content"
 }
 _BAD_SUBSTR = ["navigating to visual","use ctrl","press ctrl","keyboard shortcut","skip to report","skip to main content","aria-live"]
+_BAD_EXACT_SET = frozenset(_BAD_EXACT)
+_BAD_SUBSTR_RE = re.compile("|".join(re.escape(s) for s in _BAD_SUBSTR))
+_RE_VENDOR_MS = re.compile(r"\s*[-|]\s*Microsoft\s*Power\s*BI.*$", re.I)
+_RE_VENDOR_PBI = re.compile(r"\s*-\s*Power\s*BI.*$", re.I)
 
+@lru_cache(maxsize=4096)
 def _non_generic(txt: str) -> bool:
+    # same texts come back for every candidate/style node; cache the verdict
     low = (txt or "").strip().lower()
-    if not low or low in _BAD_EXACT: return False
-    if any(sub in low for sub in _BAD_SUBSTR): return False
-    return True
+    return bool(low) and low not in _BAD_EXACT_SET and _BAD_SUBSTR_RE.search(low) is None
 
 def _sanitize_vendor_title(s: str) -> str:
-    s = re.sub(r"\s*[-|]\s*Microsoft\s*Power\s*BI.*$", "", s, flags=re.I)
-    s = re.sub(r"\s*-\s*Power\s*BI.*$", "", s, flags=re.I)
+    s = _RE_VENDOR_MS.sub("", s)
+    s = _RE_VENDOR_PBI.sub("", s)
     return s.strip()
 
 def _pick_best_text(cands: List[str]) -> Optional[str]:
@@ -130,21 +243,23 @@ def _guess_title_by_style(frame, top_px: int = 380) -> Optional[str]:
     try:
         nodes = frame.evaluate(
             """(topLimit) => {
+              // only title-ish nodes, not a walk over every element on the page;
+              // computed style is read for the few that pass the geometry check
               const take = [];
-              const w = document.createTreeWalker(document.body, NodeFilter.SHOW_ELEMENT);
-              while (w.nextNode()) {
-                const el = w.currentNode;
-                if (!el) continue;
-                const cs = getComputedStyle(el);
-                if (cs.visibility==='hidden'||cs.display==='none'||parseFloat(cs.opacity||'1')<0.1) continue;
+              const els = document.querySelectorAll(
+                "h1,h2,h3,h4,h5,h6,[role='heading'],.visualTitle,.reportTitle,.vcHeaderTitle");
+              for (const el of els) {
                 const r = el.getBoundingClientRect();
                 if (!r || !r.width || !r.height) continue;
                 if (r.top > topLimit) continue;
                 const text = (el.innerText||'').trim();
                 if (!text || text.length < 4) continue;
+                const cs = getComputedStyle(el);
+                if (cs.visibility==='hidden'||parseFloat(cs.opacity||'1')<0.1) continue;
                 const size = parseFloat(cs.fontSize||'0');
-                const weight = (cs.fontWeight||'').toString();
-                take.push({ text, size: isNaN(size)?0:size, weight: /^(700|800|900|bold)$/i.test(weight)?1:0, top:r.top });
+                // bold proxy: top-level heading tags / explicit heading role
+                const bold = /^H[1-3]$/.test(el.tagName) || el.getAttribute('role') === 'heading';
+                take.push({ text, size: isNaN(size)?0:size, weight: bold?1:0, top:r.top });
               }
               return take;
             }""",
@@ -245,64 +360,141 @@ def _detect_report_name(page, frame) -> Tuple[str, Dict]:
     except Exception:
         return "report", {"picked":{"source":"exception","text":"report"}}
 
-def _find_title_near(frame, box: Tuple[int,int,int,int]) -> Optional[str]:
+# One round-trip per query instead of count() + bounding_box()/inner_text() per
+# element. Boxes are frame-relative getBoundingClientRect values.
+# [x, y, w, h, inline title]: containers carry their own header title element
+_BOXES_JS = """(args) => args.sels.map(sel =>
+    Array.from(document.querySelectorAll(sel)).slice(0, args.limit).map(el => {
+        const r = el.getBoundingClientRect();
+        const t = el.querySelector('.visualHeaderTitleText, .visualTitle');
+        return [r.x, r.y, r.width, r.height, ((t && t.innerText) || '').trim()];
+    }))"""
+
+_HEADINGS_JS = """(args) =>
+    Array.from(document.querySelectorAll(args.sel)).slice(0, args.limit).map(el => {
+        const r = el.getBoundingClientRect();
+        return {x: r.x, y: r.y, w: r.width, h: r.height, text: el.innerText || ''};
+    })"""
+
+_TITLE_SEL = ".visualTitle, .visualHeaderTitleText, [role='heading'], h1, h2, h3, h4, h5, h6"
+
+def _dedupe_candidates(candidates: List[Tuple[str, Tuple[int,int,int,int], str, str]]):
+    """
+    Greedy TL->BR dedupe by IoU, preferring containers over primitive/role boxes.
+    Pairwise IoU comes from one vectorized iou_matrix() pass; each candidate is
+    then checked against every kept box at once.
+    """
+    ordered = sorted(candidates, key=lambda c: (c[1][1], c[1][0]))
+    if not ordered:
+        return []
+    ious = iou_matrix([c[1] for c in ordered])
+    kept_idx: List[int] = []
+    if np is not None:
+        kinds = np.asarray([c[2] for c in ordered], dtype=object)
+        is_container = kinds == "container"
+        for i, c in enumerate(ordered):
+            kind = c[2]
+            if kept_idx:
+                row = ious[i, kept_idx]
+                drop = (row > 0.72) & (kinds[kept_idx] == kind)
+                if kind in ("primitive", "role"):
+                    drop |= (row > 0.65) & is_container[kept_idx]
+                if drop.any():
+                    continue
+            kept_idx.append(i)
+    else:
+        for i, c in enumerate(ordered):
+            kind = c[2]
+            drop = False
+            for j in kept_idx:
+                overlap, k_kind = ious[i][j], ordered[j][2]
+                if overlap > 0.65 and k_kind == "container" and kind in ("primitive","role"):
+                    drop = True; break
+                if overlap > 0.72 and k_kind == kind:
+                    drop = True; break
+            if not drop:
+                kept_idx.append(i)
+    return [ordered[i] for i in kept_idx]
+
+def _frame_offset(frame) -> Tuple[float, float]:
+    """Top-left of `frame`'s content in main-page coordinates ((0, 0) for the main frame)."""
     try:
-        bx, by, bw, bh = box
-        sel = ".visualTitle, .visualHeaderTitleText, [role='heading'], h1, h2, h3, h4, h5, h6"
-        loc = frame.locator(sel)
-        n = min(20, loc.count())
-        closest, best_dy = None, 99999
-        for i in range(n):
-            t = loc.nth(i)
-            tb = t.bounding_box()
-            if not tb: continue
-            tx, ty, tw, th = int(tb["x"]), int(tb["y"]), int(tb["width"]), int(tb["height"])
-            if ty < by and (tx < (bx + bw) and (tx + tw) > bx):
-                dy = by - ty
-                if 0 < dy < 220 and dy < best_dy:
-                    label = (t.inner_text() or "").strip()
-                    if label:
-                        best_dy = dy; closest = label
-        return closest
+        fe = frame.frame_element()
     except Exception:
-        return None
+        return 0.0, 0.0
+    try:
+        bb = fe.bounding_box() or {"x": 0.0, "y": 0.0}
+        cl, ct = fe.evaluate("e => [e.clientLeft, e.clientTop]")
+        return float(bb["x"]) + float(cl), float(bb["y"]) + float(ct)
+    except Exception:
+        return 0.0, 0.0
+
+def _collect_headings(frame) -> Tuple[List[int], List[Tuple[int,int,int,str]]]:
+    """
+    Heading boxes fetched once per page, sorted by y (document order on ties).
+    Returns (ys, [(x, y, w, label), ...]) with ys parallel for bisect.
+    """
+    try:
+        heads = frame.evaluate(_HEADINGS_JS, {"sel": _TITLE_SEL, "limit": 20})
+    except Exception:
+        return [], []
+    rows = []
+    for i, t in enumerate(heads or []):
+        if not t["w"] and not t["h"]: continue   # not rendered (bounding_box() would be None)
+        label = (t.get("text") or "").strip()
+        if label:
+            rows.append((int(t["y"]), -i, int(t["x"]), int(t["w"]), label))
+    rows.sort()
+    return [r[0] for r in rows], [(r[2], r[0], r[3], r[4]) for r in rows]
+
+def _find_title_near(box: Tuple[int,int,int,int], headings) -> Optional[str]:
+    """Closest heading above `box` (within 220px) that overlaps it horizontally."""
+    ys, heads = headings
+    bx, by, bw, bh = box
+    # walk up from the last heading strictly above the box; first hit is the closest
+    for k in range(bisect_left(ys, by) - 1, -1, -1):
+        tx, ty, tw, label = heads[k]
+        if by - ty >= 220:
+            break
+        if tx < (bx + bw) and (tx + tw) > bx:
+            return label
+    return None
 
 # ── Public API ────────────────────────────────────────────────────────────────
-def extract(url: str, session_folder: str, viewport=(1920,1080), scale=2.0, max_widgets=80) -> Dict:
+def extract(url: str, session_folder: str, viewport=(1920,1080), scale=SCREENSHOT_SCALE, max_widgets=80) -> Dict:
     """
     Power BI extractor.
-    Writes locally under ./screenshots/<session>/widgets/
+    Writes locally under ./screenshots/<session>/widgets/ only when KDH_KEEP_LOCAL=1
+    (local paths in the manifest are None otherwise)
     Uploads to Storage at widgetextractor/<session>/...
     Inserts rows into kdh_screengrab_dim and kdh_widget_dim.
     Returns manifest (compatible with the page's current expectations).
     """
+    from playwright.sync_api import TimeoutError as PWTimeout, Error as PWError
+    from provisioning.a2_kpidrift_capture.a2_kpidrift_engine import BROWSER_POOL
+
     # Ensure Playwright browser is available (Cloud-safe)
     ensure_playwright_ready()
 
-    base_local = _ensure_outdir(Path("./screenshots") / session_folder)
-    outdir_widgets = _ensure_outdir(base_local / "widgets")
+    base_local = Path("./screenshots") / session_folder
+    outdir_widgets = _ensure_outdir(base_local / "widgets") if KEEP_LOCAL else None
 
     platform = "powerbi"
     ts = _nowstamp()
 
-    with sync_playwright() as pw:
-        browser = pw.chromium.launch(
-            headless=True,
-            args=["--no-sandbox", "--disable-dev-shm-usage"]
-        )
-        ctx = browser.new_context(
-            viewport={"width": viewport[0], "height": viewport[1]},
-            device_scale_factor=scale
-        )
+    # Chromium comes from the shared per-thread pool (launched once, reused across
+    # extractions); only the context is created and closed per call, sized with
+    # the same viewport/scale the crop math below uses.
+    with BROWSER_POOL.context(viewport=viewport, scale=scale) as ctx:
         page = ctx.new_page()
 
-        # Navigate
-        page.goto(url, wait_until="domcontentloaded", timeout=60_000)
+        # Navigate: return on commit and wait for the first real visual instead of
+        # networkidle + a fixed sleep (Power BI keeps polling, so idle rarely comes)
+        page.goto(url, wait_until="commit", timeout=20_000)
         try:
-            page.wait_for_load_state("networkidle", timeout=6_000)
-        except PWTimeout:
+            page.wait_for_selector(f"{VISUAL_SELECTORS}, iframe", timeout=8_000)
+        except (PWTimeout, PWError):
             pass
-        page.wait_for_timeout(1000)
 
         # pick content frame if present
         frame = page.main_frame
@@ -312,6 +504,11 @@ def extract(url: str, session_folder: str, viewport=(1920,1080), scale=2.0, max_
                 if cf: frame = cf
         except Exception:
             pass
+        if frame is not page.main_frame:
+            try:
+                frame.wait_for_selector(VISUAL_SELECTORS, timeout=8_000)
+            except (PWTimeout, PWError):
+                pass
 
         # report name + slug
         report_name, _dbg = _detect_report_name(page, frame)
@@ -320,24 +517,53 @@ def extract(url: str, session_folder: str, viewport=(1920,1080), scale=2.0, max_
         # ── Full page screenshot
         full_filename = f"{platform}_full_{ts}.png"
         full_local_path = base_local / full_filename
-        page.screenshot(path=str(full_local_path), full_page=True)
-
-        # Upload full page
-        full_key = f"{KDH_FOLDER_ROOT}/{session_folder}/{full_filename}"
-        uploaded_full = _storage_upload_bytes(KDH_BUCKET, full_key, full_local_path.read_bytes())
-
-        # Insert screengrab row
-        screengrab_row = {
-            "screengrab_id": str(uuid.uuid4()),
-            "url": url,
-            "platform": platform,
-            "report_name": report_name,
-            "report_slug": report_slug,
-            "storage_path_full": uploaded_full.get("key",""),
-            "public_url_full": uploaded_full.get("public_url",""),
-            "captured_at": ts,
-        }
-        _db_insert(KDH_TABLE_SCREENGRABS, screengrab_row)
+        # Grow the viewport to the document height once and take a plain viewport
+        # shot: no full_page tile-and-stitch pass. Boxes are collected after this,
+        # so crops match the resized layout.
+        try:
+            doc_h = int(page.evaluate("document.documentElement.scrollHeight") or 0)
+        except PWError:
+            doc_h = 0
+        if doc_h > viewport[1]:
+            page.set_viewport_size({"width": viewport[0], "height": min(FULL_SHOT_MAX_H, doc_h)})
+            page.evaluate("() => new Promise(r => requestAnimationFrame(() => requestAnimationFrame(r)))")
+        full_png = page.screenshot(full_page=False)
+        if KEEP_LOCAL:
+            full_local_path.write_bytes(full_png)
+
+        # kdh_screengrab_dim is unique on the full-page hash: an unchanged
+        # re-capture reuses that row (and its stored image) instead of uploading
+        # the same bytes again and tripping the constraint on insert.
+        full_hash = sha256_hex(full_png)
+        existing = _find_screengrab_by_hash(full_hash)
+        if existing:
+            if existing.get("url") != url:
+                logger.info("full page identical to a capture of %s; reusing its screengrab row",
+                            existing.get("url"))
+            screengrab_row = existing
+        else:
+            full_key = f"{KDH_FOLDER_ROOT}/{session_folder}/{full_filename}"
+            uploaded_full = _storage_upload_bytes(KDH_BUCKET, full_key, full_png)
+            screengrab_row = {
+                "screengrab_id": str(uuid.uuid4()),
+                "url": url,
+                "platform": platform,
+                "report_name": report_name,
+                "report_slug": report_slug,
+                "screengrab_hashvalue": full_hash,
+                "storage_path_full": uploaded_full.get("key",""),
+                "public_url_full": uploaded_full.get("public_url",""),
+                "captured_at": ts,
+            }
+            ins = _db_insert(KDH_TABLE_SCREENGRABS, screengrab_row)
+            if not ins["ok"]:
+                # a concurrent run may have stored the same bytes first
+                existing = _find_screengrab_by_hash(full_hash)
+                if existing:
+                    screengrab_row = existing
+                else:
+                    logger.error("screengrab insert failed for %s: %s", url, ins.get("error"))
+                    screengrab_row = {"screengrab_id": None}
 
         # ── Collect candidate elements to crop (Power BI selectors)
         selectors = [
@@ -346,7 +572,7 @@ def extract(url: str, session_folder: str, viewport=(1920,1080), scale=2.0, max_
             "svg, canvas",
         ]
         PAD = 12
-        candidates: List[Tuple[str, Tuple[int,int,int,int], str]] = []  # (sel, box, kind)
+        candidates: List[Tuple[str, Tuple[int,int,int,int], str, str]] = []  # (sel, box, kind, title)
 
         def _kind_of(sel: str) -> str:
             if (".visualContainer" in sel) or (".modernVisualOverlay" in sel):
@@ -355,113 +581,111 @@ def extract(url: str, session_folder: str, viewport=(1920,1080), scale=2.0, max_
                 return "role"
             return "primitive"
 
-        for sel in selectors:
-            try:
-                loc = frame.locator(sel)
-                n = min(60, loc.count())
-                for i in range(n):
-                    el = loc.nth(i)
-                    try:
-                        bb = el.bounding_box()
-                        if not bb: continue
-                        x, y = int(bb["x"]), int(bb["y"]); w, h = int(bb["width"]), int(bb["height"])
-                        if w < MIN_W or h < MIN_H: continue
-                        candidates.append((sel, (x, y, w, h), _kind_of(sel)))
-                    except Exception:
-                        pass
-            except PWError:
-                pass
+        # boxes are frame-relative (titles are matched in the same space);
+        # crops add the frame's offset in the page
+        try:
+            boxes_per_sel = frame.evaluate(_BOXES_JS, {"sels": selectors, "limit": 60})
+        except PWError:
+            boxes_per_sel = [[] for _ in selectors]
+        for sel, boxes in zip(selectors, boxes_per_sel or []):
+            kind = _kind_of(sel)
+            for bx, by, bw, bh, inline_title in boxes:
+                x, y = int(bx), int(by); w, h = int(bw), int(bh)
+                if w < MIN_W or h < MIN_H: continue
+                candidates.append((sel, (x, y, w, h), kind, inline_title))
+        off_x, off_y = _frame_offset(frame)
 
         # dedupe by IoU with preference for container over primitive/role
-        kept: List[Tuple[str, Tuple[int,int,int,int], str]] = []
-        def _iou_local(a, b):
-            ax, ay, aw, ah = a; bx, by, bw, bh = b
-            x1, y1 = max(ax, bx), max(ay, by)
-            x2, y2 = min(ax+aw, bx+bw), min(ay+ah, by+bh)
-            inter = max(0, x2-x1) * max(0, y2-y1)
-            if inter == 0: return 0.0
-            ua = aw*ah + bw*bh - inter
-            return inter / max(1, ua)
-
-        for sel, box, kind in sorted(candidates, key=lambda c: (c[1][1], c[1][0])):  # TL->BR
-            drop = False
-            for _, k_box, k_kind in kept:
-                overlap = _iou_local(box, k_box)
-                if overlap > 0.65 and k_kind == "container" and kind in ("primitive","role"):
-                    drop = True; break
-                if overlap > 0.72 and k_kind == kind:
-                    drop = True; break
-            if not drop:
-                kept.append((sel, box, kind))
+        kept = _dedupe_candidates(candidates)
+
+        # headings are read once; each widget's title is a local lookup
+        headings = _collect_headings(frame)
 
         # ── Save & upload widget crops
+        # Crops are cut from the full-page screenshot already in memory (device
+        # pixels = CSS px * scale) instead of re-rasterizing the page per widget.
+        full_img = Image.open(io.BytesIO(full_png))
+        full_img.load()
         widgets_saved = []
-        for idx, (sel, (x, y, w, h), kind) in enumerate(kept[:max_widgets], start=1):
-            px, py = max(0, x-PAD), max(0, y-PAD)
-            pw_, ph_ = max(1, w+2*PAD), max(1, h+2*PAD)
-
-            title = _find_title_near(frame, (x, y, w, h)) or "Widget"
-            title_stub = _sanitize_filename(title)
-
-            base_filename = f"{platform}_{report_name}_{title_stub}_{idx:02d}.png"
-
-            # Quality score & suffix
-            qinfo = score_widget(
-                selector_kind=kind,
-                bbox_xywh=(px, py, pw_, ph_),  # correct (x, y, w, h)
-                title_present=bool((title or "").strip()),
-            )
-
-            widget_filename = append_quality_suffix(base_filename, qinfo["quality"])
-            local_path = outdir_widgets / widget_filename
-
-            # Crop via clip (consistent with your approach)
-            page.screenshot(path=str(local_path), clip={"x": px, "y": py, "width": pw_, "height": ph_})
-
-            # Upload
-            widget_key = f"{KDH_FOLDER_ROOT}/{session_folder}/widgets/{widget_filename}"
-            uploaded_w = _storage_upload_bytes(KDH_BUCKET, widget_key, local_path.read_bytes())
-
-            extraction_notes = {
-                "quality": qinfo["quality"],
-                "quality_score": qinfo["quality_score"],
-                "quality_reason": qinfo["quality_reason"],
-                "selector_kind": qinfo["selector_kind"],
-                "title_present": qinfo["title_present"],
-                "area_px": qinfo["area_px"],
-                "threshold": QUALITY_THRESHOLD,
-            }
-
-            widget_row = {
-                "widget_id": str(uuid.uuid4()),
-                "url": url,
-                "platform": platform,
-                "report_name": report_name,
-                "report_slug": report_slug,
-                "widget_title": title,
-                "widget_index": idx,
-                "bbox": [px, py, pw_, ph_],
-                "storage_path_widget": uploaded_w.get("key",""),
-                "public_url_widget": uploaded_w.get("public_url",""),
-                "captured_at": ts,
-                "session_folder": session_folder,
-                "extraction_notes": json.dumps(extraction_notes),
-            }
-            _db_insert(KDH_TABLE_WIDGETS, widget_row)
-
-            widgets_saved.append({
-                "idx": idx,
-                "title": title,
-                "bbox": [px,py,pw_,ph_],
-                "local_path": str(local_path),
-                "quality": qinfo["quality"],
-                "quality_score": qinfo["quality_score"],
-            })
-
-        # cleanup
+        pending = []
+        # exiting the block waits for every queued upload, including on an error
+        # in the crop loop, so no upload outlives this call
+        with ThreadPoolExecutor(max_workers=PBI_UPLOAD_WORKERS) as uploads:
+            buf = io.BytesIO()   # one encode buffer for every crop; getvalue() hands out a copy
+            for idx, (sel, (x, y, w, h), kind, inline_title) in enumerate(kept[:max_widgets], start=1):
+                px, py = max(0, int(x + off_x) - PAD), max(0, int(y + off_y) - PAD)
+                pw_, ph_ = max(1, w+2*PAD), max(1, h+2*PAD)
+
+                # the container's own header title when it has one, else the nearest heading
+                title = inline_title or _find_title_near((x, y, w, h), headings) or "Widget"
+                title_stub = _sanitize_filename(title)
+
+                base_filename = f"{platform}_{report_name}_{title_stub}_{idx:02d}.png"
+
+                # Quality score & suffix
+                qinfo = score_widget(
+                    selector_kind=kind,
+                    bbox_xywh=(px, py, pw_, ph_),  # correct (x, y, w, h)
+                    title_present=bool((title or "").strip()),
+                )
+
+                widget_filename = append_quality_suffix(base_filename, qinfo["quality"])
+                local_path = outdir_widgets / widget_filename if KEEP_LOCAL else None
+
+                # Same region page.screenshot(clip=...) would capture, clamped to the page
+                l, t = int(px * scale), int(py * scale)
+                r = min(full_img.width, int((px + pw_) * scale))
+                b = min(full_img.height, int((py + ph_) * scale))
+                buf.seek(0); buf.truncate(0)
+                # zlib level 1: a fraction of the default encode time for a slightly larger
+                # file; these are transient crops headed straight for the LLM extractor
+                full_img.crop((l, t, max(l + 1, r), max(t + 1, b))).save(buf, "PNG", compress_level=1)
+                widget_png = buf.getvalue()
+                if local_path is not None:
+                    local_path.write_bytes(widget_png)
+
+                widget_key = f"{KDH_FOLDER_ROOT}/{session_folder}/widgets/{widget_filename}"
+
+                extraction_notes = {
+                    "quality": qinfo["quality"],
+                    "quality_score": qinfo["quality_score"],
+                    "quality_reason": qinfo["quality_reason"],
+                    "selector_kind": qinfo["selector_kind"],
+                    "title_present": qinfo["title_present"],
+                    "area_px": qinfo["area_px"],
+                    "threshold": QUALITY_THRESHOLD,
+                }
+
+                widget_row = {
+                    "widget_id": str(uuid.uuid4()),
+                    "url": url,
+                    "platform": platform,
+                    "report_name": report_name,
+                    "report_slug": report_slug,
+                    "widget_title": title,
+                    "widget_index": idx,
+                    "bbox": [px, py, pw_, ph_],
+                    "captured_at": ts,
+                    "session_folder": session_folder,
+                    "extraction_notes": extraction_notes,   # dict → JSONB, encoded once with the row
+                }
+                # upload runs on the pool while the next widget is cropped
+                pending.append(uploads.submit(_upload_widget, widget_key, widget_png, widget_row))
+
+                widgets_saved.append({
+                    "idx": idx,
+                    "title": title,
+                    "bbox": [px,py,pw_,ph_],
+                    "local_path": str(local_path) if local_path is not None else None,
+                    "quality": qinfo["quality"],
+                    "quality_score": qinfo["quality_score"],
+                })
+
+            widget_rows = [f.result() for f in pending]
+        _db_insert_many(KDH_TABLE_WIDGETS, widget_rows)
+
+        # cleanup (the context is closed by the pool; the browser stays up)
         page.close()
-        ctx.close()
-        browser.close()
 
     return {
         "url": url,
@@ -472,6 +696,8 @@ def extract(url: str, session_folder: str, viewport=(1920,1080), scale=2.0, max_
         "session_folder": session_folder,
         "widgets_count": len(widgets_saved),
         "widgets": widgets_saved,
-        "full_path_local": str((Path("./screenshots")/session_folder/full_filename).resolve()),
+        "full_path_local": str(full_local_path.resolve()) if KEEP_LOCAL else None,
+        "screengrab_id": screengrab_row.get("screengrab_id"),
+        "screengrab_reused": bool(existing),
         "storage_prefix": f"{KDH_FOLDER_ROOT}/{session_folder}/",
     }
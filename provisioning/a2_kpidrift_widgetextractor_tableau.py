@@ -2,28 +2,46 @@
 from __future__ import annotations
 
 import os
-import json
+import threading
 import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
 from typing import Dict, Optional, Tuple
 
 # NOTE: This orchestrator does not launch Playwright itself.
 # Providers that use Playwright should call ensure_playwright_ready() inside.
 
-# Try Cloud (trial) and Public extractors
-try:
-    from provisioning.a2_kpidrift_capture.a2_kpidrift_widgetextractor_tableau_intrial import (
-        capture_tableau_api as _capture_tableau_cloud_api,
-    )
-except Exception:
-    _capture_tableau_cloud_api = None
+@lru_cache(maxsize=1)
+def _get_extractors():
+    """
+    (cloud, public) extractor callables, imported on first extract() call; either
+    is None when its module can't be imported. Keeps TSC / Playwright out of
+    plain imports of this module.
+    """
+    try:
+        from provisioning.a2_kpidrift_capture.a2_kpidrift_widgetextractor_tableau_intrial import (
+            capture_tableau_api as cloud,
+        )
+    except Exception:
+        cloud = None
+    try:
+        from provisioning.a2_kpidrift_capture.a2_kpidrift_widgetextractor_tableau_public import (
+            extract_tableau_public as public,
+        )
+    except Exception:
+        public = None
+    return cloud, public
+
+
+def _run_public(extract_public, **kwargs) -> Dict:
+    """Public on a long-lived browser thread (warm pooled Chromium, nothing leaked per call)."""
+    from provisioning.a2_kpidrift_capture.a2_kpidrift_engine import run_on_browser_thread
+    return run_on_browser_thread(extract_public, **kwargs)
 
-try:
-    from provisioning.a2_kpidrift_capture.a2_kpidrift_widgetextractor_tableau_public import (
-        extract_tableau_public as _extract_tableau_public,
-    )
-except Exception:
-    _extract_tableau_public = None
 
+# Device scale when the caller doesn't pass one (see engine.SCREENSHOT_SCALE)
+SCREENSHOT_SCALE = float(os.getenv("KDH_SCREENSHOT_SCALE", "1"))
 
 def _utcnow() -> dt.datetime:
     return dt.datetime.utcnow().replace(tzinfo=dt.timezone.utc)
@@ -67,11 +85,82 @@ def _parse_tableau_slugs(url: str):
     return _scan_for_views(frag_path)
 
 
+# ── Cloud / Public race ──────────────────────────────────────────────────────
+# TABLEAU_RACE=1 starts Public alongside Cloud instead of after it fails, and
+# returns whichever succeeds first. Costs a browser + a TSC session in parallel.
+TABLEAU_RACE = os.getenv("TABLEAU_RACE", "0").lower() in ("1", "true", "yes")
+
+@lru_cache(maxsize=1)
+def _race_executor() -> ThreadPoolExecutor:
+    # Cloud side only (TSC over HTTP, no browser); Public runs on a browser thread
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="kdh-tableau-cloud")
+
+def _run_cloud(capture_cloud, cloud_kwargs: Dict) -> Optional[Dict]:
+    """Cloud (trial) attempt → orchestrator manifest, or None (logged) on failure."""
+    try:
+        _log(f"[TABLEAU ORCH] Trying Cloud (trial). name={cloud_kwargs['workbook_name']!r} "
+             f"slug={cloud_kwargs['workbook_slug']!r} project={cloud_kwargs['project_name']!r}")
+        cloud_res = capture_cloud(**cloud_kwargs)
+        if cloud_res and isinstance(cloud_res, dict) and cloud_res.get("exported"):
+            _log(f"[TABLEAU ORCH] Cloud export OK. Exported {len(cloud_res['exported'])} view(s).")
+            return {
+                "mode": "cloud",
+                "platform": "tableau_cloud",
+                "workbook": cloud_res.get("workbook", ""),
+                "captured_at": cloud_res.get("captured_at"),
+                "session_folder": cloud_kwargs["session_folder"],
+                "widgets_count": len(cloud_res["exported"]),
+                "widgets": cloud_res["exported"],
+                "storage_prefix": cloud_res.get("session_prefix", ""),
+                "cloud_raw": cloud_res,
+            }
+        _log("[TABLEAU ORCH] Cloud returned no exports; falling back to Public.")
+    except Exception as e:
+        _log(f"[TABLEAU ORCH] Cloud failed: {e!r}; falling back to Public.")
+    return None
+
+def _race_cloud_public(capture_cloud, extract_public, cloud_kwargs: Dict, public_kwargs: Dict) -> Dict:
+    """
+    First successful result wins (Cloud on a tie). Cloud runs in the background
+    while Public runs on a browser thread; each side gets a cancel Event that the
+    other side's success sets, so the loser stops uploading into session_folder
+    (Public also deletes the files it already wrote).
+    """
+    _log("[TABLEAU ORCH] Racing Cloud and Public (TABLEAU_RACE=1)…")
+    cloud_cancel, public_cancel = threading.Event(), threading.Event()
+    cloud_f = _race_executor().submit(_run_cloud, capture_cloud, {**cloud_kwargs, "cancel": cloud_cancel})
+    # _run_cloud never raises; a truthy result is a Cloud win
+    cloud_f.add_done_callback(lambda f: f.result() and public_cancel.set())
+
+    public_res, public_err = None, None
+    try:
+        public_res = _run_public(extract_public, cancel=public_cancel, **public_kwargs)
+    except Exception as e:
+        public_err = e
+
+    if cloud_f.done() and cloud_f.result():
+        # Cloud finished after Public's last cancel check: drop Public's files too
+        for e in (public_res or {}).get("exported") or []:
+            if e.get("local_path"):
+                Path(e["local_path"]).unlink(missing_ok=True)
+        return cloud_f.result()
+    if (public_res or {}).get("exported"):
+        cloud_cancel.set()
+        _log("[TABLEAU ORCH] Public won the race.")
+        return public_res
+    cloud_res = cloud_f.result()
+    if cloud_res:
+        return cloud_res
+    if public_err is not None:
+        raise public_err
+    return public_res   # neither succeeded: Public's (empty) result
+
+
 def extract(
     url: str,
     session_folder: str,
     viewport: Tuple[int, int] = (1920, 1080),
-    scale: float = 2.0,
+    scale: float = SCREENSHOT_SCALE,
     max_widgets: int = 80,
     try_cloud_first: bool = True,
     workbook_name: Optional[str] = None,
@@ -84,6 +173,7 @@ def extract(
       - Parse workbook/view slugs from URL fragment (#) when needed.
       - Pass slug to Cloud extractor.
     """
+    _capture_tableau_cloud_api, _extract_tableau_public = _get_extractors()
     now = _utcnow()
     cutoff = _cutoff_from_env()
     use_cloud = try_cloud_first and (now < cutoff)
@@ -93,39 +183,29 @@ def extract(
     _log(f"[TABLEAU ORCH] workbook_slug={wb_slug!r} view_slug={view_slug!r}")
 
     if use_cloud and _capture_tableau_cloud_api is not None:
-        try:
-            effective_project = project_name or os.getenv("TABLEAU_DEFAULT_PROJECT", "default")
-            _log(f"[TABLEAU ORCH] Trying Cloud (trial). name={workbook_name!r} slug={wb_slug!r} project={effective_project!r}")
-            cloud_res = _capture_tableau_cloud_api(
-                workbook_name=workbook_name,
-                workbook_slug=wb_slug,
-                project_name=effective_project,
-                limit_views=limit_views,
-                session_folder=session_folder,
+        cloud_kwargs = dict(
+            workbook_name=workbook_name,
+            workbook_slug=wb_slug,
+            project_name=project_name or os.getenv("TABLEAU_DEFAULT_PROJECT", "default"),
+            limit_views=limit_views,
+            session_folder=session_folder,
+        )
+        if TABLEAU_RACE and _extract_tableau_public is not None:
+            return _race_cloud_public(
+                _capture_tableau_cloud_api, _extract_tableau_public, cloud_kwargs,
+                dict(url=url, session_folder=session_folder, viewport=viewport,
+                     scale=scale, max_widgets=max_widgets),
             )
-            if cloud_res and isinstance(cloud_res, dict) and cloud_res.get("exported"):
-                _log(f"[TABLEAU ORCH] Cloud export OK. Exported {len(cloud_res['exported'])} view(s).")
-                return {
-                    "mode": "cloud",
-                    "platform": "tableau_cloud",
-                    "workbook": cloud_res.get("workbook", ""),
-                    "captured_at": cloud_res.get("captured_at"),
-                    "session_folder": session_folder,
-                    "widgets_count": len(cloud_res["exported"]),
-                    "widgets": cloud_res["exported"],
-                    "storage_prefix": cloud_res.get("session_prefix", ""),
-                    "cloud_raw": cloud_res,
-                }
-            else:
-                _log("[TABLEAU ORCH] Cloud returned no exports; falling back to Public.")
-        except Exception as e:
-            _log(f"[TABLEAU ORCH] Cloud failed: {e!r}; falling back to Public.")
+        cloud_res = _run_cloud(_capture_tableau_cloud_api, cloud_kwargs)
+        if cloud_res:
+            return cloud_res
 
     if _extract_tableau_public is None:
         raise RuntimeError("Public extractor not available, and Cloud did not succeed.")
 
     _log("[TABLEAU ORCH] Running Tableau Public extractor…")
-    return _extract_tableau_public(
+    return _run_public(
+        _extract_tableau_public,
         url=url,
         session_folder=session_folder,
         viewport=viewport,
@@ -135,7 +215,7 @@ def extract(
 
 
 if __name__ == "__main__":
-    import argparse
+    import argparse, json
     ap = argparse.ArgumentParser(description="Tableau orchestrator (Cloud → Public).")
     ap.add_argument("--url", required=True)
     ap.add_argument("--session", required=True)
@@ -1,21 +1,87 @@
 from __future__ import annotations
 import os, sys, subprocess
+from pathlib import Path
+from typing import Dict, Optional
+
+_READY = False   # set once Chromium is known to launch; later calls are free
 
 def _run(cmd):
     r = subprocess.run(cmd, capture_output=True, text=True)
     return r.returncode, (r.stdout or "") + ("\n" + r.stderr if r.stderr else "")
 
+def _ready_marker() -> Path:
+    # Lives inside the browsers dir (wiped together with it) and is keyed on the
+    # playwright version, since an upgrade wants a different Chromium build.
+    try:
+        from importlib.metadata import version
+        ver = version("playwright")
+    except Exception:
+        ver = "unknown"
+    return Path(os.environ["PLAYWRIGHT_BROWSERS_PATH"]) / f".kdh_ready_{ver}"
+
+def _marker_ok() -> bool:
+    """A previous process launched Chromium from this install and it is still on disk."""
+    try:
+        exe = _ready_marker().read_text(encoding="utf-8").strip()
+        return bool(exe) and Path(exe).exists()
+    except Exception:
+        return False
+
+_BINARY_PATHS = (
+    "chromium-{chromium}/chrome-linux/chrome",
+    "chromium_headless_shell-{headless}/chrome-linux/headless_shell",
+    "chromium_headless_shell-{headless}/chrome-headless-shell-linux64/chrome-headless-shell",
+    "chromium-{chromium}/chrome-win/chrome.exe",
+    "chromium-{chromium}/chrome-mac/Chromium.app",
+)
+
+def _pinned_revisions() -> Optional[Dict[str, str]]:
+    """Chromium revisions the installed playwright wants (its driver's browsers.json), or None."""
+    try:
+        import json
+        import playwright
+        manifest = Path(playwright.__file__).parent / "driver" / "package" / "browsers.json"
+        revs = {b["name"]: str(b["revision"]) for b in json.loads(manifest.read_text(encoding="utf-8"))["browsers"]}
+        return {"chromium": revs["chromium"],
+                "headless": revs.get("chromium-headless-shell", revs["chromium"])}
+    except Exception:
+        return None
+
+def _binary_on_disk() -> bool:
+    """
+    The Chromium build this playwright version expects exists under
+    PLAYWRIGHT_BROWSERS_PATH (stat only). A build left by another version doesn't
+    count; without a readable browsers.json this says no and the test launch decides.
+    """
+    revs = _pinned_revisions()
+    if revs is None:
+        return False
+    cache = Path(os.environ["PLAYWRIGHT_BROWSERS_PATH"])
+    try:
+        return any((cache / pat.format(**revs)).exists() for pat in _BINARY_PATHS)
+    except Exception:
+        return False
+
 def _can_launch() -> bool:
     try:
         from playwright.sync_api import sync_playwright
         with sync_playwright() as p:
             b = p.chromium.launch(headless=True)
             b.close()
+            exe = p.chromium.executable_path
+        try:
+            _ready_marker().write_text(exe, encoding="utf-8")
+        except Exception:
+            pass
         return True
     except Exception:
         return False
 
 def ensure_playwright_ready():
+    global _READY
+    if _READY:
+        return
+
     # Use a cache path that works on Cloud
     os.environ.setdefault("PLAYWRIGHT_BROWSERS_PATH", os.path.expanduser("~/.cache/ms-playwright"))
 
@@ -24,7 +90,10 @@ def ensure_playwright_ready():
     except Exception:
         raise RuntimeError("Missing dependency: add 'playwright' to requirements.txt")
 
-    if _can_launch():
+    # warm start (new worker / Streamlit restart): a stat instead of spawning Chromium;
+    # the test launch only runs when this version's browser build isn't on disk
+    if _marker_ok() or _binary_on_disk() or _can_launch():
+        _READY = True
         return
 
     # Install using the SAME interpreter Streamlit runs
@@ -40,6 +109,7 @@ def ensure_playwright_ready():
 
     if not _can_launch():
         raise RuntimeError("Chromium installed but still cannot launch.")
+    _READY = True
 
 # Back-compat alias if some files still import the old name
 ensure_playwright_installed = ensure_playwright_ready
@@ -1,4 +1,6 @@
 import os, streamlit as st
+from dataclasses import dataclass
+from functools import lru_cache
 
 def sget(*keys, default=None):
     for k in keys:
@@ -11,3 +13,24 @@ def sget(*keys, default=None):
         if v:
             return v
     return default
+
+@dataclass(frozen=True, slots=True)
+class Secrets:
+    tableau_url: str
+    tableau_site: str
+    tableau_user: str
+    tableau_password: str
+    mistral_api_key: str
+    groq_api_key: str
+
+@lru_cache(maxsize=1)
+def secrets() -> Secrets:
+    """All service credentials, resolved once per process (secrets.toml, then env)."""
+    return Secrets(
+        tableau_url=sget("TABLEAU_SERVER_URL", default=""),
+        tableau_site=sget("TABLEAU_SITE_ID", default=""),
+        tableau_user=sget("TABLEAU_USERNAME", default=""),
+        tableau_password=sget("TABLEAU_PASSWORD", default=""),
+        mistral_api_key=sget("MISTRAL_API_KEY", default=""),
+        groq_api_key=sget("GROQ_API_KEY", default=""),
+    )
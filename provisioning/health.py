@@ -0,0 +1,143 @@
+# provisioning/health.py
+"""
+Shared Tableau / Mistral / Groq clients and a one-pass credentials check.
+
+The clients are process-wide (st.cache_resource) and their SDKs are imported
+inside the factories, so nothing heavy loads until a check or probe runs.
+validate_all_secrets() runs the three checks side by side and caches the
+combined result for 10 minutes.
+"""
+from __future__ import annotations
+
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, TypeVar
+
+import streamlit as st
+
+from provisioning.config import secrets
+
+PROBE = "Say 'ok'"
+
+T = TypeVar("T")
+
+# ── Clients ──────────────────────────────────────────────────────────────────
+def _sign_out(server) -> None:
+    try:
+        server.auth.sign_out()
+    except Exception:
+        pass
+
+# Re-sign-in well inside Tableau's session lifetime (Cloud idles sessions out at 2h)
+TABLEAU_SESSION_TTL_S = 60 * 60
+
+@st.cache_resource(ttl=TABLEAU_SESSION_TTL_S)
+def get_tableau_server():
+    """Signed-in server, shared across reruns for up to an hour; signed out at process exit."""
+    import tableauserverclient as TSC  # heavy; imported once, on first use
+    cfg = secrets()
+    server = TSC.Server(cfg.tableau_url, use_server_version=True)
+    server.auth.sign_in(TSC.TableauAuth(cfg.tableau_user, cfg.tableau_password, cfg.tableau_site))
+    atexit.register(_sign_out, server)
+    return server
+
+def _is_auth_error(e: Exception) -> bool:
+    import tableauserverclient as TSC
+    return isinstance(e, TSC.NotSignedInError) or str(getattr(e, "code", "")).startswith("401")
+
+def with_tableau(fn: Callable[[Any], T]) -> T:
+    """
+    fn(server) on the cached signed-in server. An expired/revoked session (401 or
+    NotSignedInError) drops the cached server and retries once with a fresh sign-in.
+    """
+    try:
+        return fn(get_tableau_server())
+    except Exception as e:
+        if not _is_auth_error(e):
+            raise
+    get_tableau_server.clear()
+    return fn(get_tableau_server())
+
+@st.cache_resource
+def shared_http():
+    """One keep-alive pool for both LLM providers; HTTP/2 when `h2` is installed."""
+    import httpx
+    try:
+        import h2  # noqa: F401  (httpx[http2])
+        http2 = True
+    except ImportError:
+        http2 = False
+    return httpx.Client(
+        http2=http2,
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=30),
+        timeout=httpx.Timeout(60.0, connect=10.0),
+    )
+
+@st.cache_resource
+def get_mistral():
+    from mistralai import Mistral
+    return Mistral(api_key=secrets().mistral_api_key, client=shared_http())
+
+@st.cache_resource
+def get_groq():
+    from langchain_groq import ChatGroq
+    return ChatGroq(model="llama-3.1-8b-instant", temperature=0.0, api_key=secrets().groq_api_key,
+                    http_client=shared_http())
+
+# ── Checks ───────────────────────────────────────────────────────────────────
+def _check_tableau() -> str:
+    import tableauserverclient as TSC
+    cfg = secrets()
+    if not (cfg.tableau_url and cfg.tableau_user and cfg.tableau_password):
+        raise RuntimeError("TABLEAU_* not configured")
+    views, _ = with_tableau(lambda server: server.views.get(TSC.RequestOptions(pagesize=1)))
+    return "signed in" + (f", e.g. {views[0].name}" if views else "")
+
+def _check_mistral() -> str:
+    if not secrets().mistral_api_key:
+        raise RuntimeError("MISTRAL_API_KEY not configured")
+    resp = get_mistral().chat.complete(model="mistral-small-latest",
+                                       messages=[{"role": "user", "content": PROBE}])
+    return (resp.choices[0].message.content or "")[:60]
+
+def _check_groq() -> str:
+    if not secrets().groq_api_key:
+        raise RuntimeError("GROQ_API_KEY not configured")
+    return (get_groq().invoke(PROBE).content or "")[:60]
+
+_CHECKS = {"tableau": _check_tableau, "mistral": _check_mistral, "groq": _check_groq}
+
+def _run_check(fn) -> Dict[str, object]:
+    try:
+        return {"ok": True, "detail": fn()}
+    except Exception as e:
+        return {"ok": False, "detail": f"{type(e).__name__}: {e}"}
+
+@st.cache_data(ttl=600, show_spinner=False)
+def validate_all_secrets() -> Dict[str, Dict[str, object]]:
+    """
+    {"tableau"|"mistral"|"groq": {"ok": bool, "detail": str}}.
+    The three round trips overlap (wall time ≈ the slowest one); failures are
+    reported per provider, never raised.
+    """
+    with ThreadPoolExecutor(max_workers=len(_CHECKS)) as ex:
+        futs = {name: ex.submit(_run_check, fn) for name, fn in _CHECKS.items()}
+        return {name: f.result() for name, f in futs.items()}
+
+def render_health_sidebar() -> None:
+    """Sidebar "System Health" expander; checks run on demand, then come from the cache."""
+    with st.sidebar.expander("System Health", expanded=False):
+        if st.button("Check keys", key="_health_check"):
+            st.session_state["_health_checked"] = True
+        if not st.session_state.get("_health_checked"):
+            st.caption("Tableau, Mistral and Groq credentials (cached 10 min).")
+            return
+        with st.spinner("Checking…"):
+            results = validate_all_secrets()
+        for name, r in results.items():
+            st.markdown(f"{'✅' if r['ok'] else '❌'} **{name.title()}** — {r['detail']}")
+
+__all__ = [
+    "get_tableau_server", "with_tableau", "shared_http", "get_mistral", "get_groq",
+    "validate_all_secrets", "render_health_sidebar",
+]
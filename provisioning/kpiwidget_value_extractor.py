@@ -1,18 +1,31 @@
 # provisioning/kdh_widget_value_extractor.py
 from __future__ import annotations
 
-import os, io, json, base64, re, uuid
+import os, io, json, base64, hashlib, logging, re, threading, time, uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
 
 from dotenv import load_dotenv
 from supabase import create_client, Client
 from mistralai import Mistral
+from PIL import Image, features
+
+from provisioning.llm_batch import run_batch
+
+try:  # optional fast JSON (C extension); stdlib json is the fallback
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Env & clients
 # ─────────────────────────────────────────────────────────────────────────────
 load_dotenv()
+logger = logging.getLogger(__name__)
 
 def _sget(*keys, default=None):
     for k in keys:
@@ -39,14 +52,88 @@ JSONS_ROOT    = "jsons_from_wigetsimages"  # per your requested spelling
 # tables
 TBL_WIDGETS   = _sget("KDH_TABLE_WIDGETS", default="kdh_widget_dim")
 TBL_XFACT     = _sget("KDH_TABLE_WIDGET_EXTRACT", default="kdh_widget_extract_fact")  # new fact table (see DDL below)
+# content-addressed model output: (image_sha256 text, model text, values jsonb, created_at timestamptz),
+# unique on (image_sha256, model); optional -- lookups are skipped if the table is missing
+TBL_XCACHE    = _sget("KDH_TABLE_WIDGET_EXTRACT_CACHE", default="kdh_widget_extract_cache")
 
 MISTRAL_API_KEY = _sget("MISTRAL_API_KEY")
 MISTRAL_MODEL   = _sget("MISTRAL_MODEL", default="pixtral-12b-2409")
 
+# Mistral Batch API: one async job per session instead of one chat call per widget
+# (no per-call rate limit, batch pricing). Jobs can queue for minutes, so it is off
+# by default (interactive pages); turn it on for backfills. Sessions below
+# BATCH_MIN widgets, or a failed/timed-out job (logged), fall back to the
+# per-image path.
+USE_BATCH        = _sget("KDH_MISTRAL_BATCH", default="0").lower() in ("1", "true", "yes")
+BATCH_MIN        = int(_sget("KDH_MISTRAL_BATCH_MIN", default="2"))
+BATCH_POLL_S     = float(_sget("KDH_MISTRAL_BATCH_POLL_S", default="5"))
+BATCH_TIMEOUT_S  = float(_sget("KDH_MISTRAL_BATCH_TIMEOUT_S", default="300"))
+
+# Widgets downloaded / persisted in parallel (Storage + PostgREST calls are I/O-bound)
+CONCURRENCY      = int(_sget("KDH_CONCURRENCY", default="16"))
+# Per-image Mistral calls retried on 429/5xx with exponential backoff
+LLM_RETRIES      = int(_sget("KDH_MISTRAL_RETRIES", default="5"))
+# Storage uploads retried on transient errors (5xx/429/network)
+STORAGE_RETRIES  = int(_sget("KDH_STORAGE_RETRIES", default="2"))
+# Fact rows per PostgREST insert; keeps payloads bounded
+DB_INSERT_CHUNK  = 500
+# Send images as raw multipart uploads referenced by signed URL instead of
+# base64 data URIs inlined in the JSON body (~33% fewer bytes, no JSON escaping)
+FILE_UPLOAD      = _sget("KDH_MISTRAL_FILE_UPLOAD", default="1").lower() in ("1", "true", "yes")
+SIGNED_URL_HOURS = int(_sget("KDH_MISTRAL_SIGNED_URL_HOURS", default="24"))
+# Pixtral resizes to ~1024px internally: longest side sent to the model (0 = as-is)
+# and the re-encode format (webp q85 is several times smaller than PNG for charts)
+LLM_IMAGE_MAX     = int(_sget("KDH_LLM_IMAGE_MAX", default="1280"))
+LLM_IMAGE_QUALITY = int(_sget("KDH_LLM_IMAGE_QUALITY", default="85"))
+
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise RuntimeError("Missing Supabase config (SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY).")
 
-sb: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+def _tuned_http_client():
+    """
+    One keep-alive httpx pool for every Storage/PostgREST call, sized for the
+    CONCURRENCY workers; HTTP/2 (if `h2` is installed) multiplexes the parallel
+    downloads/uploads over a few TLS sessions. None → supabase-py's default client.
+    """
+    try:
+        import httpx
+    except ImportError:
+        return None
+    try:
+        import h2  # noqa: F401  (httpx[http2])
+        http2 = True
+    except ImportError:
+        http2 = False
+    return httpx.Client(
+        http2=http2,
+        limits=httpx.Limits(max_connections=2 * CONCURRENCY,
+                            max_keepalive_connections=CONCURRENCY, keepalive_expiry=30),
+        timeout=httpx.Timeout(60.0, connect=10.0),
+        follow_redirects=True,
+    )
+
+def _create_sb() -> Client:
+    http_client = _tuned_http_client()
+    if http_client is not None:
+        try:
+            from supabase import ClientOptions
+            return create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(httpx_client=http_client))
+        except TypeError:
+            http_client.close()   # supabase-py without httpx_client injection
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
+
+@lru_cache(maxsize=1)
+def _get_sb() -> Client:
+    return _create_sb()
+
+@lru_cache(maxsize=1)
+def _get_mistral() -> Optional[Mistral]:
+    return Mistral(api_key=MISTRAL_API_KEY) if MISTRAL_API_KEY else None
+
+# one Supabase and one Mistral client (each with its keep-alive connection pool)
+# per process, shared by every call and worker thread
+sb: Client = _get_sb()
+_MISTRAL: Optional[Mistral] = _get_mistral()
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Helpers
@@ -54,31 +141,74 @@ sb: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 def _nowstamp_z() -> str:
     return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
 
+_SANI_RE = re.compile(r"[^\w\-. ]+")
+_WS_RE   = re.compile(r"\s+")
+
 def _sanitize_filename(s: str, max_len=160) -> str:
     s = (s or "").strip()
-    s = re.sub(r"[^\w\-. ]+", "_", s)
-    s = re.sub(r"\s+", "_", s)
+    s = _SANI_RE.sub("_", s)
+    s = _WS_RE.sub("_", s)
     return (s[:max_len] or "untitled").rstrip("._-")
 
+def _json_bytes(obj) -> bytes:
+    """Compact UTF-8 JSON; orjson returns bytes directly (no str → encode copy)."""
+    if _orjson is not None:
+        try:
+            return _orjson.dumps(obj)
+        except TypeError:
+            pass  # e.g. non-str keys / big ints → let stdlib handle it
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _json_loads(s):
+    return _orjson.loads(s) if _orjson is not None else json.loads(s)
+
 def _b64_from_bytes(b: bytes) -> str:
     return base64.b64encode(b).decode("utf-8")
 
+def _public_url(bucket: str, key: str) -> str:
+    """Storage's public object URL, built locally (same shape get_public_url returns)."""
+    return f"{SUPABASE_URL.rstrip('/')}/storage/v1/object/public/{bucket}/{quote(key, safe='/')}"
+
 def _storage_upload_bytes(bucket: str, key: str, data: bytes, content_type="application/json") -> Dict[str,str]:
     key = key.lstrip("/")
+    # x-upsert makes Storage overwrite in place: one request whether or not the
+    # object exists. Only transient failures (5xx/429/network) are retried; an
+    # existing object is never deleted on the way.
+    _with_backoff(
+        sb.storage.from_(bucket).upload, path=key, file=data,
+        file_options={"content-type": content_type, "upsert": "true", "cache-control": "3600"},
+        retries=STORAGE_RETRIES, base=0.5,
+    )
+    return {"key": key, "public_url": _public_url(bucket, key)}
+
+def _is_retryable(e: Exception) -> bool:
+    code = getattr(e, "status_code", None) or getattr(e, "status", None)
+    if code is None:
+        code = getattr(getattr(e, "response", None), "status_code", None)
+    if code is None and e.args and isinstance(e.args[0], dict):
+        code = e.args[0].get("statusCode")   # storage3 StorageException payload
     try:
-        sb.storage.from_(bucket).upload(path=key, file=data,
-                                        file_options={"content-type": content_type, "upsert": True})
-    except Exception:
-        try:
-            sb.storage.from_(bucket).remove([key])
-        except Exception:
-            pass
-        sb.storage.from_(bucket).upload(path=key, file=data, file_options={"content-type": content_type})
+        if code is not None:
+            return int(code) == 429 or int(code) >= 500
+    except (TypeError, ValueError):
+        pass
     try:
-        url = sb.storage.from_(bucket).get_public_url(key)
-    except Exception:
-        url = ""
-    return {"key": key, "public_url": url}
+        import httpx
+        if isinstance(e, httpx.TransportError):
+            return True
+    except ImportError:
+        pass
+    return "429" in str(e) or "rate limit" in str(e).lower()
+
+def _with_backoff(fn, *args, retries: int = LLM_RETRIES, base: float = 1.0, **kwargs):
+    """fn(*args, **kwargs), retrying rate-limit / server errors after 1s, 2s, 4s, ..."""
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt >= retries or not _is_retryable(e):
+                raise
+            time.sleep(min(base * (2 ** attempt), 30.0))
 
 def _storage_download_bytes(bucket: str, key: str) -> bytes:
     key = key.lstrip("/")
@@ -94,59 +224,248 @@ GRAPH_PROMPT = (
   "title, x_axis_label, y_axis_label, data_points (list of {x, y})."
 )
 
-def extract_graph_json_from_png_bytes(png_bytes: bytes) -> Dict:
-    if not MISTRAL_API_KEY:
-        raise RuntimeError("MISTRAL_API_KEY not configured.")
-    client = Mistral(api_key=MISTRAL_API_KEY)
+_WEBP_OK = features.check("webp")
+
+def _shrink_for_llm(png_bytes: bytes) -> Tuple[bytes, str]:
+    """
+    (bytes, mime) to send to the model: fit within LLM_IMAGE_MAX px and re-encode
+    as WEBP, keeping the original whenever that is not smaller (or fails).
+    Cache keys are hashed from the original PNG, so this never affects hits.
+    """
+    if LLM_IMAGE_MAX <= 0 or not _WEBP_OK:
+        return png_bytes, "image/png"
+    try:
+        with Image.open(io.BytesIO(png_bytes)) as im:
+            im = im.convert("RGBA" if "A" in im.getbands() else "RGB")
+            im.thumbnail((LLM_IMAGE_MAX, LLM_IMAGE_MAX), Image.LANCZOS)
+            buf = io.BytesIO()
+            im.save(buf, format="WEBP", quality=LLM_IMAGE_QUALITY, method=4)
+        out = buf.getvalue()
+        return (out, "image/webp") if len(out) < len(png_bytes) else (png_bytes, "image/png")
+    except Exception:
+        return png_bytes, "image/png"
+
+def _image_ref(client, png_bytes: bytes, name: str = "widget") -> Tuple[str, Optional[str]]:
+    """
+    (image_url, uploaded file id or None). Uploads the (shrunk) image to Mistral
+    files and returns a signed URL; falls back to an inline data URI.
+    """
+    data, mime = _shrink_for_llm(png_bytes)
+    if FILE_UPLOAD:
+        try:
+            fname = f"{name}.{mime.split('/')[1]}"
+            up = client.files.upload(file={"file_name": fname, "content": data}, purpose="ocr")
+            signed = client.files.get_signed_url(file_id=up.id, expiry=SIGNED_URL_HOURS)
+            return signed.url, up.id
+        except Exception:
+            pass
+    return f"data:{mime};base64," + _b64_from_bytes(data), None
+
+@lru_cache(maxsize=1)
+def _cleanup_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="kdh-mistral-cleanup")
 
-    encoded = _b64_from_bytes(png_bytes)
-    messages = [
+def _delete_files_later(client, file_ids) -> None:
+    """Drop uploaded images from Mistral storage off the request path (best effort)."""
+    def _rm():
+        for fid in file_ids:
+            try:
+                client.files.delete(file_id=fid)
+            except Exception:
+                pass
+    ids = [f for f in file_ids if f]
+    if ids:
+        _cleanup_pool().submit(_rm)
+
+def _graph_messages(image_url: str) -> List[Dict]:
+    return [
         {"role": "system", "content": GRAPH_PROMPT},
         {
             "role": "user",
             "content": [
                 {"type": "text", "text": "Extract data from this chart image."},
-                {"type": "image_url", "image_url": f"data:image/png;base64,{encoded}"}
+                {"type": "image_url", "image_url": image_url}
             ]
         }
     ]
-    resp = client.chat.complete(
-        model=MISTRAL_MODEL,
-        messages=messages,
-        response_format={"type": "json_object"}
-    )
-    raw = resp.choices[0].message.content
+
+def _parse_model_json(raw: str) -> Dict:
     try:
-        return json.loads(raw)
+        return _json_loads(raw)
     except Exception:
-        # if model wrapped JSON in text, try to strip
+        # json_object mode should make this unreachable; only a malformed reply
+        # pays for the slice-and-retry (the happy path is a single parse)
         start = raw.find("{"); end = raw.rfind("}")
-        return json.loads(raw[start:end+1])
+        if start < 0 or end <= start:
+            raise ValueError(f"Model returned no JSON object: {raw[:200]!r}")
+        return _json_loads(raw[start:end+1])
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Extraction cache (identical image bytes + model → same values)
+# L1: per-process LRU; L2: TBL_XCACHE, shared across sessions and re-scrapes
+# ─────────────────────────────────────────────────────────────────────────────
+L1_MAX = 1024
+_L1: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+_L1_LOCK = threading.Lock()
+# A missing cache table turns L2 off for the process; any other failure only
+# pauses it for L2_RETRY_S, so one network blip doesn't cost every later hit.
+L2_RETRY_S = float(_sget("KDH_XCACHE_RETRY_S", default="300"))
+_L2_MISSING_CODES = ("42P01", "PGRST205")   # undefined_table / table not in schema cache
+_L2_OK = True               # False once the table is known to be missing
+_L2_DOWN_UNTIL = 0.0        # monotonic end of the current failure pause
+
+def _l2_ready() -> bool:
+    return _L2_OK and time.monotonic() >= _L2_DOWN_UNTIL
+
+def _l2_failed(e: Exception) -> None:
+    global _L2_OK, _L2_DOWN_UNTIL
+    code = str(getattr(e, "code", "") or "")
+    if code in _L2_MISSING_CODES or any(c in str(e) for c in _L2_MISSING_CODES):
+        _L2_OK = False
+        logger.warning("%s is missing; extraction cache L2 disabled for this process: %s", TBL_XCACHE, e)
+    else:
+        _L2_DOWN_UNTIL = time.monotonic() + L2_RETRY_S
+        logger.warning("extraction cache L2 unavailable, retrying in %.0fs: %s", L2_RETRY_S, e)
+
+def _sha256(b: bytes) -> str:
+    return hashlib.sha256(b).hexdigest()
+
+def _cache_get_many(hashes) -> Dict[str, Dict]:
+    """sha256 -> cached values for the current MISTRAL_MODEL (one DB query for L1 misses)."""
+    out: Dict[str, Dict] = {}
+    with _L1_LOCK:
+        for h in hashes:
+            v = _L1.get((h, MISTRAL_MODEL))
+            if v is not None:
+                _L1.move_to_end((h, MISTRAL_MODEL))
+                out[h] = v
+    missing = [h for h in hashes if h not in out]
+    if missing and _l2_ready():
+        l2: Dict[str, Dict] = {}
+        try:
+            # hashes travel in the query string; 100 x 64 chars keeps URLs short
+            for c in range(0, len(missing), 100):
+                res = (sb.table(TBL_XCACHE).select("image_sha256,values")
+                         .eq("model", MISTRAL_MODEL).in_("image_sha256", missing[c:c + 100]).execute())
+                l2.update({row["image_sha256"]: row["values"] for row in (res.data or [])})
+        except Exception as e:
+            _l2_failed(e)
+        out.update(l2)
+        _l1_put(l2)
+    return out
+
+def _l1_put(entries: Dict[str, Dict]) -> None:
+    with _L1_LOCK:
+        for h, v in entries.items():
+            _L1[(h, MISTRAL_MODEL)] = v
+            _L1.move_to_end((h, MISTRAL_MODEL))
+        while len(_L1) > L1_MAX:
+            _L1.popitem(last=False)
+
+def _cache_put_many(entries: Dict[str, Dict]) -> None:
+    if not entries:
+        return
+    _l1_put(entries)
+    if not _l2_ready():
+        return
+    now = datetime.now(timezone.utc).isoformat()
+    rows = [{"image_sha256": h, "model": MISTRAL_MODEL, "values": v, "created_at": now}
+            for h, v in entries.items()]
+    try:
+        sb.table(TBL_XCACHE).upsert(rows, on_conflict="image_sha256,model").execute()
+    except Exception as e:
+        _l2_failed(e)
+
+def extract_graph_json_from_png_bytes(png_bytes: bytes, use_cache: bool = True) -> Dict:
+    h = _sha256(png_bytes) if use_cache else None
+    if h:
+        hit = _cache_get_many([h]).get(h)
+        if hit is not None:
+            return hit
+
+    if _MISTRAL is None:
+        raise RuntimeError("MISTRAL_API_KEY not configured.")
+    client = _MISTRAL
+
+    image_url, file_id = _image_ref(client, png_bytes)
+    try:
+        resp = client.chat.complete(
+            model=MISTRAL_MODEL,
+            messages=_graph_messages(image_url),
+            response_format={"type": "json_object"}
+        )
+    finally:
+        _delete_files_later(client, [file_id])
+    values = _parse_model_json(resp.choices[0].message.content)
+    if h:
+        _cache_put_many({h: values})
+    return values
+
+def extract_graph_json_batch(images: Dict[str, bytes]) -> Dict[str, Dict]:
+    """
+    Run many chart extractions as one Mistral batch job.
+    `images` maps a custom_id to PNG bytes; returns custom_id -> values for every
+    request that succeeded (callers retry the missing ones one by one).
+    Raises if the job cannot be created or does not finish within BATCH_TIMEOUT_S.
+    """
+    if _MISTRAL is None:
+        raise RuntimeError("MISTRAL_API_KEY not configured.")
+    client = _MISTRAL
+
+    # image uploads run in parallel; the JSONL then only carries signed URLs
+    cids = list(images)
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as ex:
+        refs = list(ex.map(lambda cid: _image_ref(client, images[cid]), cids))
+    file_ids = [fid for _, fid in refs]
+
+    bodies = {
+        cid: {"messages": _graph_messages(image_url), "response_format": {"type": "json_object"}}
+        for cid, (image_url, _) in zip(cids, refs)
+    }
+    try:
+        done = run_batch(client, bodies, model=MISTRAL_MODEL, poll_s=BATCH_POLL_S,
+                         timeout_s=BATCH_TIMEOUT_S, file_name="widgets.jsonl")
+    finally:
+        _delete_files_later(client, file_ids)
+
+    out: Dict[str, Dict] = {}
+    for cid, body in done.items():
+        try:
+            out[cid] = _parse_model_json(body["choices"][0]["message"]["content"])
+        except Exception:
+            continue
+    return out
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Core utility
 # ─────────────────────────────────────────────────────────────────────────────
-def list_widget_rows_for_session(session_folder: str) -> List[Dict]:
+# the only kdh_widget_dim columns process_session reads
+WIDGET_COLS = "widget_id,url,storage_path_widget,widget_index,screengrab_id"
+
+def list_widget_rows_for_session(session_folder: str, limit: Optional[int] = None) -> List[Dict]:
     """
     Pull the widget rows we created during extraction for this session.
-    We only process images ending with '_good.png'.
+    We only process images ending with '_good.png'. `limit` is applied server-side.
     """
     q = (
         sb.table(TBL_WIDGETS)
-          .select("*")
+          .select(WIDGET_COLS)
           .eq("session_folder", session_folder)
           .ilike("storage_path_widget", "%_good.png")
           .order("widget_index", desc=False)
-          .execute()
     )
-    return q.data or []
+    if limit is not None:
+        if int(limit) <= 0:
+            return []
+        q = q.range(0, int(limit) - 1)
+    return q.execute().data or []
 
-def storage_key_for_json(session_folder: str, image_name: str) -> str:
+def storage_key_for_json(session_folder: str, image_name: str, ts: Optional[str] = None) -> str:
     """
     kpidrifthunter/jsons_from_wigetsimages/{session}/{image_name}_{timestamp}.json
     NOTE: Storage uses '/' separators; keep Windows backslashes out of keys.
     """
-    ts = _nowstamp_z()
+    ts = ts or _nowstamp_z()
     base = _sanitize_filename(image_name.rsplit(".", 1)[0])
     return f"{JSONS_ROOT}/{session_folder}/{base}_{ts}.json"
 
@@ -156,30 +475,57 @@ def process_session(session_folder: str, limit: Optional[int] = None) -> Dict:
     extract values, save JSON file to Storage, and insert a fact row linking it all.
     Returns a manifest of processed items.
     """
-    rows = list_widget_rows_for_session(session_folder)
-    if limit is not None:
-        rows = rows[:int(limit)]
+    rows = list_widget_rows_for_session(session_folder, limit=limit)
 
-    processed = []
-    for r in rows:
+    # one run timestamp for the whole batch: formatted once, not twice per widget
+    run_at    = datetime.now(timezone.utc)
+    run_stamp = run_at.strftime("%Y%m%dT%H%M%SZ")
+    run_iso   = run_at.isoformat()
+
+    # Phase 1: download every PNG (concurrently) and extract values
+    # (one batch job when possible)
+    paths = [(r.get("storage_path_widget") or "").lstrip("/") for r in rows]  # e.g., widgetextractor/<session>/widgets/....
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as ex:
+        blobs = list(ex.map(lambda k: _storage_download_bytes(KDH_BUCKET, k), paths))
+
+    # identical images (re-scrapes, repeated widgets) are extracted once, and
+    # never again once cached; only unique cache misses reach the model
+    hashes = [_sha256(b) for b in blobs]
+    known = _cache_get_many(list(dict.fromkeys(hashes)))
+    todo = {h: b for h, b in zip(hashes, blobs) if h not in known}
+
+    fresh: Dict[str, Dict] = {}
+    if USE_BATCH and len(todo) >= BATCH_MIN:
+        try:
+            fresh = extract_graph_json_batch(todo)
+        except Exception:
+            logger.exception("Mistral batch extraction failed for %d images; extracting one by one", len(todo))
+            fresh = {}
+
+    # Phase 2: persist JSON per widget (parallel), then the fact rows in bulk
+    def _process_one(i: int) -> Tuple[Dict, Dict]:
+        r = rows[i]
         widget_id = r.get("widget_id")
         url       = r.get("url")
-        img_path  = (r.get("storage_path_widget") or "").lstrip("/")  # e.g., widgetextractor/<session>/widgets/....
+        img_path  = paths[i]
         image_name = img_path.split("/")[-1] or f"widget_{r.get('widget_index','')}"
 
-        # Download the PNG bytes
-        png_bytes = _storage_download_bytes(KDH_BUCKET, img_path)
-
-        # Run extraction
-        values = extract_graph_json_from_png_bytes(png_bytes)
+        # cache hit, else batch result, else (batch miss / off / too few widgets) per-image call
+        h = hashes[i]
+        values = known.get(h)
+        if values is None:
+            values = fresh.get(h)
+        if values is None:
+            values = _with_backoff(extract_graph_json_from_png_bytes, blobs[i], use_cache=False)
+            fresh[h] = values
 
         # Save JSON to Storage (audit-friendly)
-        json_key = storage_key_for_json(session_folder, image_name)
-        _ = _storage_upload_bytes(KDH_BUCKET, json_key, json.dumps(values).encode("utf-8"))
+        json_key = storage_key_for_json(session_folder, image_name, ts=run_stamp)
+        _ = _storage_upload_bytes(KDH_BUCKET, json_key, _json_bytes(values))
 
-        # Insert log row in the fact table
+        # Log row for the fact table (inserted in bulk below)
         payload = {
-            "extraction_id": str(uuid.uuid4()),
+            "extraction_id": uuid.uuid4().hex,
             "widget_id": widget_id,
             "url": url,
             "screengrab_id": r.get("screengrab_id"),   # may be NULL depending on your pbi extractor
@@ -187,16 +533,28 @@ def process_session(session_folder: str, limit: Optional[int] = None) -> Dict:
             "image_storage_path": img_path,
             "json_storage_path": json_key,
             "values": values,                           # JSONB column
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": run_iso
         }
-        res = sb.table(TBL_XFACT).insert(payload).execute()
+        return {"widget_id": widget_id, "image": img_path, "json": json_key}, payload
 
-        processed.append({
-            "widget_id": widget_id,
-            "image": img_path,
-            "json": json_key,
-            "insert_ok": bool(getattr(res, "data", None)),
-        })
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as ex:
+        done = list(ex.map(_process_one, range(len(rows))))
+    _cache_put_many(fresh)
+    processed = [item for item, _ in done]
+    payloads  = [payload for _, payload in done]
+
+    # one INSERT per DB_INSERT_CHUNK rows instead of one per widget; a failed
+    # chunk is flagged on its items without dropping the chunks after it
+    for c in range(0, len(payloads), DB_INSERT_CHUNK):
+        try:
+            res = sb.table(TBL_XFACT).insert(payloads[c:c + DB_INSERT_CHUNK]).execute()
+            ok, err = bool(getattr(res, "data", None)), None
+        except Exception as e:
+            ok, err = False, str(e)
+        for item in processed[c:c + DB_INSERT_CHUNK]:
+            item["insert_ok"] = ok
+            if err:
+                item["insert_error"] = err
 
     return {
         "session_folder": session_folder,
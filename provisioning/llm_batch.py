@@ -0,0 +1,116 @@
+# provisioning/llm_batch.py
+"""
+Mistral Batch API helpers for non-interactive prompt workloads.
+
+Many independent chat requests go up as one JSONL file and run as one batch
+job (no per-call rate limit, batch pricing) instead of N serial round trips.
+Jobs take from seconds to minutes, so this is for backfills and bulk
+extraction, not for anything a user is waiting on.
+"""
+from __future__ import annotations
+
+import io
+import json
+import time
+from typing import Dict, List, Optional
+
+try:  # optional fast JSON (C extension); stdlib json is the fallback
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+
+def _dumps(obj) -> bytes:
+    if _orjson is not None:
+        try:
+            return _orjson.dumps(obj)
+        except TypeError:
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _loads(s):
+    return _orjson.loads(s) if _orjson is not None else json.loads(s)
+
+def run_batch(
+    client,
+    bodies: Dict[str, Dict],
+    model: str,
+    endpoint: str = "/v1/chat/completions",
+    poll_s: float = 2.0,
+    max_poll_s: float = 30.0,
+    timeout_s: float = 1800.0,
+    file_name: str = "batch.jsonl",
+) -> Dict[str, Dict]:
+    """
+    Submit {custom_id: request body} as one batch job and wait for it.
+    Polls with exponential backoff (poll_s doubling up to max_poll_s).
+    Returns custom_id -> response body for every request that succeeded; failed
+    lines are left out so callers can retry them individually.
+    Raises if the job cannot be created, fails without output, or outlives timeout_s
+    (the job is cancelled first).
+    """
+    buf = io.BytesIO()
+    for cid, body in bodies.items():
+        buf.write(_dumps({"custom_id": cid, "body": body}))
+        buf.write(b"\n")
+    # the buffer goes to the multipart upload as-is (getvalue() would copy it)
+    buf.seek(0)
+    up = client.files.upload(file={"file_name": file_name, "content": buf}, purpose="batch")
+    job = client.batch.jobs.create(input_files=[up.id], endpoint=endpoint, model=model)
+
+    deadline = time.monotonic() + timeout_s
+    wait = poll_s
+    while job.status in ("QUEUED", "RUNNING"):
+        if time.monotonic() > deadline:
+            try:
+                client.batch.jobs.cancel(job_id=job.id)
+            except Exception:
+                pass
+            raise TimeoutError(f"Mistral batch job {job.id} still {job.status} after {timeout_s:.0f}s")
+        time.sleep(wait)
+        wait = min(wait * 2, max_poll_s)
+        job = client.batch.jobs.get(job_id=job.id)
+
+    if not job.output_file:
+        raise RuntimeError(f"Mistral batch job {job.id} ended {job.status} without output")
+
+    out: Dict[str, Dict] = {}
+    raw = client.files.download(file_id=job.output_file).read()
+    for line in raw.splitlines():
+        if not line.strip():
+            continue
+        try:
+            rec = _loads(line)
+            resp = rec.get("response") or {}
+            if rec.get("error") or int(resp.get("status_code") or 0) != 200:
+                continue
+            out[rec["custom_id"]] = resp["body"]
+        except Exception:
+            continue
+    return out
+
+def submit_batch(prompts: List[str], model: str = "mistral-small-latest", client=None,
+                 **kwargs) -> List[Optional[str]]:
+    """
+    Plain user prompts in, reply texts out (same order; None where a request failed).
+    `client` defaults to a Mistral client built from MISTRAL_API_KEY.
+    """
+    if client is None:
+        from provisioning.config import sget
+        from mistralai import Mistral
+        api_key = sget("MISTRAL_API_KEY")
+        if not api_key:
+            raise RuntimeError("MISTRAL_API_KEY not configured.")
+        client = Mistral(api_key=api_key)
+
+    bodies = {str(i): {"messages": [{"role": "user", "content": p}]} for i, p in enumerate(prompts)}
+    results = run_batch(client, bodies, model=model, **kwargs)
+    replies: List[Optional[str]] = []
+    for i in range(len(prompts)):
+        body = results.get(str(i))
+        try:
+            replies.append(body["choices"][0]["message"]["content"] if body else None)
+        except (KeyError, IndexError, TypeError):
+            replies.append(None)
+    return replies
+
+__all__ = ["run_batch", "submit_batch"]
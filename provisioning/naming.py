@@ -1,7 +1,9 @@
 import re
 
+_SLUG_RE = re.compile(r'[^a-z0-9_]+')  # input is lowercased first
+
 def slugify(s: str) -> str:
-    s = re.sub(r'[^a-zA-Z0-9_]+', '_', s.strip().lower())
+    s = _SLUG_RE.sub('_', s.strip().lower())
     return f"a_{s}" if not s or not s[0].isalpha() else s
 
 def team_env_slug(team_name: str, env_name: str) -> str:
@@ -0,0 +1,44 @@
+# provisioning/prewarm.py
+"""
+Warm the process before the first click: heavy SDK imports (pandas, supabase,
+mistralai, playwright) run on a daemon thread at server start, so the first
+visitor to a KPI Drift / Provision page doesn't pay for them.
+"""
+from __future__ import annotations
+
+import importlib
+import os
+import threading
+
+PREWARM = os.getenv("KDH_PREWARM", "1").lower() in ("1", "true", "yes")
+
+_MODULES = (
+    "pandas",
+    "supabase",
+    "mistralai",
+    "playwright.sync_api",
+    "provisioning.a2_kpidrift_capture.a2_kpidrift_pair_compare",
+)
+
+# Lives in an imported module, so it survives script reruns: set once per process
+_STARTED = threading.Event()
+_LOCK = threading.Lock()
+
+def _warm() -> None:
+    for name in _MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass  # a missing optional SDK just stays cold
+
+def prewarm() -> None:
+    """Start the warm-up thread (first call per process only; later calls are free)."""
+    if not PREWARM or _STARTED.is_set():
+        return
+    with _LOCK:  # two sessions can start at once
+        if _STARTED.is_set():
+            return
+        _STARTED.set()
+    threading.Thread(target=_warm, name="kdh-prewarm", daemon=True).start()
+
+__all__ = ["prewarm"]
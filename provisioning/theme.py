@@ -2,7 +2,7 @@
 from __future__ import annotations
 import streamlit as st
 import os 
-from provisioning.ui import inject_styles as base_styles, render_sidebar
+from provisioning.ui import inject_styles as base_styles, minify_css, render_sidebar
 from provisioning.autostart_api import ensure_fastapi
 
 # ---- Theme tokens (edit here to restyle the whole app) -----------------------
@@ -17,48 +17,50 @@ THEME = {
     "shadow": "0 4px 18px rgba(2, 6, 23, 0.06)",
 }
 
+# Design tokens & page primitives, rendered from THEME and minified once at import
+_THEME_CSS = minify_css(
+    f"""
+    <style>
+      :root {{
+        --pa-bg: {THEME['bg']};
+        --pa-panel: {THEME['panel']};
+        --pa-primary: {THEME['primary']};
+        --pa-text: {THEME['text']};
+        --pa-muted: {THEME['muted']};
+        --pa-radius: {THEME['radius']};
+        --pa-shadow: {THEME['shadow']};
+        --pa-font: {THEME['font_family']};
+      }}
+      html, body, [data-testid="stAppViewContainer"] {{
+        background: var(--pa-bg) !important;
+        color: var(--pa-text);
+        font-family: var(--pa-font);
+      }}
+      /* Primary buttons */
+      .stButton > button {{
+        background: var(--pa-primary);
+        color:#fff; border:0; border-radius: var(--pa-radius);
+        padding:.6rem 1rem; font-weight:600;
+      }}
+      /* Hero + headers (landing/page headers) */
+      .pa-hero h1 {{
+        font-size:3.2rem; line-height:1.05; font-weight:800; letter-spacing:.01em;
+        text-transform:uppercase; margin:0;
+      }}
+      .pa-hero .tagline {{ margin-top:.35rem; font-size:1.05rem; color:var(--pa-muted); }}
+      .pa-header h1 {{
+        font-size:2.0rem; line-height:1.1; font-weight:800; text-transform:uppercase;
+        margin:.25rem 0; word-break:keep-all; white-space:nowrap;
+      }}
+      .pa-header .tag {{ opacity:.75; margin-top:.15rem; }}
+    </style>
+    """
+)
+
 def _inject_theme_css() -> None:
     """Define global CSS variables + primitives, then load base component styles."""
     # 1) Design tokens & page primitives
-    st.markdown(
-        f"""
-        <style>
-          :root {{
-            --pa-bg: {THEME['bg']};
-            --pa-panel: {THEME['panel']};
-            --pa-primary: {THEME['primary']};
-            --pa-text: {THEME['text']};
-            --pa-muted: {THEME['muted']};
-            --pa-radius: {THEME['radius']};
-            --pa-shadow: {THEME['shadow']};
-            --pa-font: {THEME['font_family']};
-          }}
-          html, body, [data-testid="stAppViewContainer"] {{
-            background: var(--pa-bg) !important;
-            color: var(--pa-text);
-            font-family: var(--pa-font);
-          }}
-          /* Primary buttons */
-          .stButton > button {{
-            background: var(--pa-primary);
-            color:#fff; border:0; border-radius: var(--pa-radius);
-            padding:.6rem 1rem; font-weight:600;
-          }}
-          /* Hero + headers (landing/page headers) */
-          .pa-hero h1 {{
-            font-size:3.2rem; line-height:1.05; font-weight:800; letter-spacing:.01em;
-            text-transform:uppercase; margin:0;
-          }}
-          .pa-hero .tagline {{ margin-top:.35rem; font-size:1.05rem; color:var(--pa-muted); }}
-          .pa-header h1 {{
-            font-size:2.0rem; line-height:1.1; font-weight:800; text-transform:uppercase;
-            margin:.25rem 0; word-break:keep-all; white-space:nowrap;
-          }}
-          .pa-header .tag {{ opacity:.75; margin-top:.15rem; }}
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
+    st.markdown(_THEME_CSS, unsafe_allow_html=True)
     # 2) Shared component styles (cards, sidebar, links)
     base_styles()
 
@@ -1,13 +1,28 @@
 # provisioning/ui.py
 from __future__ import annotations
+import re
 import streamlit as st
+from collections import namedtuple
 from contextlib import contextmanager
+from functools import lru_cache
+from typing import Tuple
 from .menu import MENU
 
-def inject_styles() -> None:
-    """Base styles shared by all pages (sidebar + headers inside cards)."""
-    st.markdown(
-        """
+def minify_css(css: str) -> str:
+    """Drop comments and collapse whitespace (done once at import, not per rerun)."""
+    css = _RE_CSS_COMMENT.sub("", css)
+    css = _RE_CSS_WS.sub(" ", css)
+    return _RE_CSS_PUNCT.sub(r"\1", css).strip()
+
+_RE_CSS_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+_RE_CSS_WS      = re.compile(r"\s+")
+_RE_CSS_PUNCT   = re.compile(r"\s*([{};,>])\s*")
+
+# st.markdown re-sends and re-hashes its body on every rerun, so ship the
+# smallest equivalent string. (It has to be emitted on every run: Streamlit
+# drops elements that a rerun does not re-create, styles included.)
+_CSS = minify_css(
+    """
         <style>
           /* Card header/subtitle (the box is provided by st.container(border=True)) */
           .pa-card-header { font-weight: 700; margin: .15rem 0 .35rem; }
@@ -31,9 +46,12 @@ def inject_styles() -> None:
               opacity: 1 !important;
           }
         </style>
-        """,
-        unsafe_allow_html=True,
-    )
+    """
+)
+
+def inject_styles() -> None:
+    """Base styles shared by all pages (sidebar + headers inside cards)."""
+    st.markdown(_CSS, unsafe_allow_html=True)
 
 @contextmanager
 def card(title: str, subtitle: str | None = None, *, border: bool = True):
@@ -67,3 +85,80 @@ def render_sidebar(active: str) -> None:
             else:
                 # Top-level link (Home, Provision, Logout, etc.)
                 st.page_link(path, label=label, disabled=(active == label))
+
+# ── Landing pages ────────────────────────────────────────────────────────────
+# Static sections are composed once per process into a single HTML block: one
+# st.markdown (one delta, no markdown parsing) per rerun instead of column
+# containers plus a markdown element per card.
+_HOME_CSS = minify_css(
+    """
+    <style>
+      .pa-home-grid { display: grid; grid-template-columns: repeat(6, 1fr); gap: .5rem 1.5rem; margin: .5rem 0 1rem; }
+      .pa-home-grid .half  { grid-column: span 3; }
+      .pa-home-grid .third { grid-column: span 2; }
+      .pa-home-grid h3 { margin: .25rem 0 .5rem; padding: 0; }
+      .pa-home-grid ul { margin: 0; padding-left: 1.2rem; }
+      .pa-home-grid hr { grid-column: 1 / -1; width: 100%; margin: .5rem 0; }
+      @media (max-width: 640px) { .pa-home-grid .half, .pa-home-grid .third { grid-column: 1 / -1; } }
+    </style>
+    """
+)
+
+# One grid cell: `body` is HTML; span is "half" / "third", or "rule" for a divider row
+CardSpec = namedtuple("CardSpec", "title body icon span", defaults=("", "third"))
+RULE = CardSpec("", "", "", "rule")
+
+@lru_cache(maxsize=64)
+def grid_html(specs: Tuple[CardSpec, ...]) -> str:
+    """All cards as one CSS-grid block (cached per spec tuple)."""
+    cells = []
+    for c in specs:
+        if c.span == "rule":
+            cells.append("<hr/>")
+            continue
+        head = f"{c.icon} {c.title}" if c.icon else c.title
+        cells.append(f'<div class="{c.span}"><h3>{head}</h3>{c.body}</div>')
+    return _HOME_CSS + '<section class="pa-home-grid">' + "".join(cells) + "</section>"
+
+def render_grid(specs) -> None:
+    """One st.markdown (one delta message) for a whole card layout."""
+    st.markdown(grid_html(tuple(specs)), unsafe_allow_html=True)
+
+_PROVISION_HOME = (
+    CardSpec("Problem Statement",
+             "<ul><li>Multiple teams, fragmented stacks, manual provisioning</li>"
+             "<li>Lack of standardized governance and audit gaps</li>"
+             "<li>“It’s all in Docker” visibility needing a human-readable map</li></ul>",
+             span="half"),
+    CardSpec("What This Tool Solves",
+             "<ul><li>One-click standardized envs with pre-approved options</li>"
+             "<li>Built-in governance: policy packs, RBAC, audit trails</li></ul>",
+             span="half"),
+    RULE,
+    CardSpec("Rapid Deployment", "<p>From request to production in minutes.</p>", "🚀"),
+    CardSpec("Governance-Ready", "<p>Approvals, policy packs, auditability.</p>", "🛡️"),
+    CardSpec("Full Visibility", "<p>Track deployments by lean app status.</p>", "🌿"),
+)
+
+def home_html() -> str:
+    """Provision landing: problem/solution banners + feature tiles."""
+    return grid_html(_PROVISION_HOME)
+
+_KPIDRIFT_HOME = (
+    CardSpec("Problem Statement",
+             "<ul><li>Multiple teams, fragmented BI Platforms,Potentially different KPIs</li>"
+             "<li>Lack of clear view of KPI Definition Drifts</li>"
+             "<li>Compromised Single Version of Truth</li></ul>",
+             span="half"),
+    CardSpec("What This Tool Solves",
+             "<ul><li>One‑click Agentic AI that swims through BI ecosystems</li>"
+             "<li>Need for a unified tool to track and manage KPI drifts across platforms</li></ul>",
+             span="half"),
+    RULE,
+    CardSpec("Enterprise Grade", "<p>Ability to connect to multiple BI Ecosystems</p>", "🚀"),
+    CardSpec("Single Stop to see KPIs and their Drifts among BI Products", "", "🛡️"),
+)
+
+def kpidrift_home_html() -> str:
+    """KPI Drift Hunter landing: problem/solution banners + feature tiles."""
+    return grid_html(_KPIDRIFT_HOME)
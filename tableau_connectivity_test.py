@@ -1,17 +1,25 @@
+from itertools import islice
+from typing import Optional
+
 import streamlit as st
-import tableauserverclient as TSC
 
-# Read from .streamlit/secrets.toml
-server_url = st.secrets["TABLEAU_SERVER_URL"]
-site_id    = st.secrets["TABLEAU_SITE_ID"]
-username   = st.secrets["TABLEAU_USERNAME"]
-password   = st.secrets["TABLEAU_PASSWORD"]
+from provisioning.health import with_tableau
 
-server = TSC.Server(server_url, use_server_version=True)
-auth   = TSC.TableauAuth(username, password, site_id)
+@st.cache_data(ttl=300)
+def list_views(_server, limit: int = 5, project: Optional[str] = None):
+    """
+    (name, id) of the first `limit` views; `_server` is skipped by the cache key.
+    Pages are requested `limit` at a time and the pager stops after `limit`
+    results, so only what is printed comes over the wire. `project` filters
+    server-side by project name.
+    """
+    import tableauserverclient as TSC
+    opts = TSC.RequestOptions(pagesize=limit)
+    if project:
+        opts.filter.add(TSC.Filter(TSC.RequestOptions.Field.ProjectName,
+                                   TSC.RequestOptions.Operator.Equals, project))
+    return [(v.name, v.id) for v in islice(TSC.Pager(_server.views, opts), limit)]
 
-with server.auth.sign_in(auth):
-    views, _ = server.views.get()
-    print("Views you can export:")
-    for v in views[:5]:
-        print("-", v.name, v.id)
+print("Views you can export:")
+for name, view_id in with_tableau(list_views):
+    print("-", name, view_id)
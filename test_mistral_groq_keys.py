@@ -1,19 +1,45 @@
 # test_mistral_groq_keys.py
+import hashlib
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
-from mistralai import Mistral
-from langchain_groq import ChatGroq
-
-# --- Mistral test ---
-m_key = st.secrets["MISTRAL_API_KEY"]
-m_client = Mistral(api_key=m_key)
-resp = m_client.chat.complete(
-    model="mistral-small-latest",  # cheap + fast text-only model
-    messages=[{"role": "user", "content": "Say 'ok'"}]
-)
-print("Mistral OK:", resp.choices[0].message.content[:60])
-
-# --- Groq test ---
-g_key = st.secrets["GROQ_API_KEY"]
-llm = ChatGroq(model="llama-3.1-8b-instant", temperature=0.0)
-out = llm.invoke("Say 'ok'")
-print("Groq OK:", out.content)
+
+from provisioning.config import secrets
+from provisioning.health import PROBE, get_groq, get_mistral
+
+def _key_id(key: str) -> str:
+    """Short, non-reversible fingerprint of an API key (part of the cache key)."""
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:12]
+
+# Replies cached in memory per (prompt, model, key fingerprint) for a minute:
+# reruns don't re-spend quota, a changed key misses the cache, and nothing is
+# written to disk, so a revoked key fails the next check after the ttl.
+@st.cache_data(ttl=60)
+def mistral_say(prompt: str, model: str = "mistral-small-latest", key_id: str = "") -> str:  # cheap + fast text-only model
+    resp = get_mistral().chat.complete(model=model, messages=[{"role": "user", "content": prompt}])
+    return resp.choices[0].message.content
+
+@st.cache_data(ttl=60)
+def groq_say(prompt: str, key_id: str = "") -> str:
+    # Streamed: tokens are echoed as they arrive (time-to-first-token, not full
+    # generation time); the joined text is what gets cached
+    parts = []
+    for chunk in get_groq().stream(prompt):
+        sys.stdout.write(chunk.content)
+        sys.stdout.flush()
+        parts.append(chunk.content)
+    sys.stdout.write("\n")
+    return "".join(parts)
+
+# Both probes are independent HTTPS round trips: run them side by side so the
+# wall time is the slower of the two, not their sum
+with ThreadPoolExecutor(max_workers=2) as ex:
+    m_fut = ex.submit(mistral_say, PROBE, key_id=_key_id(secrets().mistral_api_key))
+    g_fut = ex.submit(groq_say, PROBE, key_id=_key_id(secrets().groq_api_key))
+
+    # --- Mistral test ---
+    print("Mistral OK:", m_fut.result()[:60])
+
+    # --- Groq test ---
+    print("Groq OK:", g_fut.result())